@@ -0,0 +1,777 @@
+"""
+Бенчмарк функций bot.database на заполненной временной базе SQLite
+
+Создаёт временный файл БД с реалистичным объёмом (по умолчанию 100k пользователей,
+50k ботов в каталоге, 200k покупок — у каждой свой проданный бот, 200k пополнений,
+50k платежей), замеряет каждую публичную функцию из bot.database и печатает p50/p95/p99.
+
+Использование:
+    python benchmark.py                          # замер, вывод таблицы
+    python benchmark.py --save baseline.json     # сохранить базовую линию
+    python benchmark.py --compare baseline.json  # сравнить с базовой линией (код выхода 1 при регрессии)
+    python benchmark.py --scale 0.1 --only user  # быстрый прогон части функций
+    python benchmark.py --fsm                    # хранилища FSM: memory, sql, redis (если доступен REDIS_URL)
+    python benchmark.py --routing                # маршрутизация нажатий по полному дереву роутеров
+    python benchmark.py --pragmas                # пачки записей: SQLite по умолчанию против профиля из конфига
+    python benchmark.py --catalog                # страница каталога на 1k, 10k и 100k ботов
+    python benchmark.py --start                  # /start повторных пользователей: прежний и новый путь
+    python benchmark.py --writes                 # 500 одновременных пополнений: по коммиту на каждое и очередь записи
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+
+@dataclass
+class Case:
+    """Замер одной функции: call(i) — измеряемый вызов, setup(i) — подготовка (не входит во время)"""
+    call: Callable[[int], Awaitable]
+    iterations: int = 200
+    setup: Callable[[int], Awaitable] | None = None
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def seed(scale: float, rng: random.Random) -> dict[str, int]:
+    """Заполнить пустую базу; вернуть объёмы"""
+    from sqlalchemy import insert
+    from bot.database import init_db, recompute_user_stats, rebuild_sales_daily
+    from bot.database.db import engine
+    from bot.database.models import User, Session, Bot, Purchase, Payment, Deposit
+
+    counts = {
+        "users": int(100_000 * scale),
+        "catalog_bots": int(50_000 * scale),
+        "purchases": int(200_000 * scale),
+        "deposits": int(200_000 * scale),
+        "payments": int(50_000 * scale),
+        "sessions": 20,
+    }
+    users, catalog, purchases = counts["users"], counts["catalog_bots"], counts["purchases"]
+    now = datetime.utcnow()
+
+    def ago(max_days: int) -> datetime:
+        return now - timedelta(seconds=rng.randint(0, max_days * 86400))
+
+    def chunks(rows, size: int = 10_000):
+        for start in range(0, len(rows), size):
+            yield rows[start:start + size]
+
+    await init_db()
+    async with engine.begin() as conn:
+        await conn.execute(insert(Session), [
+            {"id": i, "phone": f"+7900{i:07d}", "session_file": f"s{i}.session"} for i in range(1, 21)
+        ])
+        for rows in chunks([
+            {"id": i, "username": f"user{i}", "full_name": f"User {i}",
+             "balance": rng.choice((0.0, 5.0, 50.0, 500.0)), "created_at": ago(365)}
+            for i in range(1, users + 1)
+        ]):
+            await conn.execute(insert(User), rows)
+
+        # Боты 1..catalog — каталог (не проданы), дальше — по одному на каждую покупку
+        for rows in chunks([
+            {"id": i, "username": f"bot{i}", "token": f"{i}:token", "name": f"Bot {i}",
+             "price": rng.choice((1.0, 2.5, 5.0, 10.0, 25.0)), "currency": rng.choice(("USDT", "USDT", "TON")),
+             "is_sold": i > catalog, "session_id": rng.randint(1, 20), "created_at": ago(365)}
+            for i in range(1, catalog + purchases + 1)
+        ]):
+            await conn.execute(insert(Bot), rows)
+        for rows in chunks([
+            {"user_id": rng.randint(1, users), "bot_id": catalog + i, "invoice_id": f"seed_p{i}",
+             "paid_at": ago(365), "amount": 5.0, "currency": "USDT"}
+            for i in range(1, purchases + 1)
+        ]):
+            await conn.execute(insert(Purchase), rows)
+        for rows in chunks([
+            {"user_id": rng.randint(1, users), "amount": rng.choice((5.0, 10.0, 50.0)),
+             "method": rng.choice(("cryptobot", "lolz")), "invoice_id": f"seed_d{i}",
+             "status": rng.choice(("paid", "paid", "pending", "expired")), "created_at": ago(60)}
+            for i in range(1, counts["deposits"] + 1)
+        ]):
+            await conn.execute(insert(Deposit), rows)
+        for rows in chunks([
+            {"user_id": rng.randint(1, users), "bot_id": rng.randint(1, catalog + purchases),
+             "invoice_id": f"seed_pay{i}", "amount": 5.0, "currency": "USDT",
+             "status": rng.choice(("paid", "pending", "expired")), "created_at": ago(60)}
+            for i in range(1, counts["payments"] + 1)
+        ]):
+            await conn.execute(insert(Payment), rows)
+
+    await recompute_user_stats()
+    await rebuild_sales_daily()
+    return counts
+
+
+def build_cases(counts: dict[str, int], rng: random.Random) -> dict[str, Case]:
+    """Замеры для публичных функций bot.database (имя — как в bot.database.__all__)"""
+    import bot.database as db
+    from bot.database.models import Payment, Deposit
+
+    users, catalog = counts["users"], counts["catalog_bots"]
+    total_bots = catalog + counts["purchases"]
+    user = lambda: rng.randint(1, users)
+    bot = lambda: rng.randint(1, total_bots)
+    # Непроданные боты каталога раздаются по очереди функциям, которые их продают/удаляют
+    unsold = iter(range(catalog, 0, -1))
+    picked: dict[str, list[int]] = {}
+
+    def take(name: str):
+        async def setup(i: int):
+            picked.setdefault(name, []).append(next(unsold))
+        return setup
+
+    async def new_session(i: int):
+        picked.setdefault("delete_session", []).append(
+            (await db.add_session(f"+7999{i:07d}", f"bench{i}.session")).id
+        )
+
+    async def fresh_catalog(i: int):
+        db.catalog_cache.invalidate()
+
+    async def export(name: str):
+        async for _ in db.stream_table(name):
+            pass
+
+    old = datetime.utcnow() - timedelta(days=30)
+    return {
+        "get_or_create_user": Case(lambda i: db.get_or_create_user(user(), None, "Bench")),
+        "upsert_user": Case(lambda i: db.upsert_user(user(), f"renamed{i}", f"Renamed {i}")),
+        "get_user": Case(lambda i: db.get_user(user())),
+        "add_balance": Case(lambda i: db.add_balance(user(), 1.0)),
+        "set_balance": Case(lambda i: db.set_balance(user(), 100.0)),
+        "get_user_balance": Case(lambda i: db.get_user_balance(user())),
+        "add_session": Case(lambda i: db.add_session(f"+7888{i:07d}", f"bench_add{i}.session")),
+        "get_all_sessions": Case(lambda i: db.get_all_sessions()),
+        "get_session": Case(lambda i: db.get_session(rng.randint(1, 20))),
+        "delete_session": Case(lambda i: db.delete_session(picked["delete_session"][i]), setup=new_session),
+        "add_bot": Case(lambda i: db.add_bot(f"bench_bot{i}", f"b{i}:bench", "Bench", 5.0)),
+        "find_existing_bots": Case(lambda i: db.find_existing_bots(
+            [f"bot{bot()}" for _ in range(100)], [f"{bot()}:token" for _ in range(100)]
+        )),
+        "add_bots_bulk": Case(lambda i: db.add_bots_bulk([
+            {"username": f"bulk{i}_{k}", "token": f"bulk{i}_{k}:t", "name": "Bulk", "price": 1.0}
+            for k in range(100)
+        ]), iterations=20),
+        "get_available_bots": Case(lambda i: db.get_available_bots(), iterations=5),
+        "get_catalog_page": Case(lambda i: db.get_catalog_page(rng.randint(0, 50)), setup=fresh_catalog),
+        "get_bot_counts": Case(lambda i: db.get_bot_counts(), iterations=20, setup=fresh_catalog),
+        "get_bot": Case(lambda i: db.get_bot(bot())),
+        "get_bot_with_session": Case(lambda i: db.get_bot_with_session(bot())),
+        "mark_bot_sold": Case(lambda i: db.mark_bot_sold(picked["mark_bot_sold"][i]), setup=take("mark_bot_sold")),
+        "delete_bot": Case(lambda i: db.delete_bot(picked["delete_bot"][i]), setup=take("delete_bot")),
+        "get_all_bots": Case(lambda i: db.get_all_bots(), iterations=3),
+        "create_purchase": Case(
+            lambda i: db.create_purchase(user(), picked["create_purchase"][i], f"bench_cp{i}"),
+            setup=take("create_purchase")
+        ),
+        "checkout_with_balance": Case(
+            lambda i: db.checkout_with_balance(user(), picked["checkout_with_balance"][i]),
+            setup=take("checkout_with_balance")
+        ),
+        "get_user_purchases": Case(lambda i: db.get_user_purchases(user())),
+        "get_user_bots": Case(lambda i: db.get_user_bots(user())),
+        "create_payment": Case(lambda i: db.create_payment(user(), bot(), f"bench_pay{i}", 5.0, "USDT")),
+        "update_payment_status": Case(lambda i: db.update_payment_status(f"seed_pay{rng.randint(1, counts['payments'])}", "paid")),
+        "get_payment_by_invoice": Case(lambda i: db.get_payment_by_invoice(f"seed_pay{rng.randint(1, counts['payments'])}")),
+        "create_deposit": Case(lambda i: db.create_deposit(user(), 10.0, "cryptobot", f"bench_dep{i}")),
+        "get_deposit_by_invoice": Case(lambda i: db.get_deposit_by_invoice(f"seed_d{rng.randint(1, counts['deposits'])}")),
+        "update_deposit_status": Case(lambda i: db.update_deposit_status(f"seed_d{rng.randint(1, counts['deposits'])}", "paid")),
+        "get_user_deposits": Case(lambda i: db.get_user_deposits(user())),
+        "get_user_orders": Case(lambda i: db.get_user_orders(user())),
+        "get_user_total_orders": Case(lambda i: db.get_user_total_orders(user())),
+        "get_all_users": Case(lambda i: db.get_all_users(), iterations=3),
+        "get_shop_stats": Case(lambda i: db.get_shop_stats(), iterations=50),
+        "get_stale_pending": Case(lambda i: db.get_stale_pending(Payment, datetime.utcnow() - timedelta(hours=1)), iterations=20),
+        "expire_pending": Case(lambda i: db.expire_pending(Deposit, [rng.randint(1, counts["deposits"]) for _ in range(100)]), iterations=20),
+        "get_fsm_record": Case(lambda i: db.get_fsm_record(f"fsm:{user()}:{user()}:default")),
+        "save_fsm_records": Case(lambda i: db.save_fsm_records([
+            {"key": f"fsm:{k}:{k}:default", "state": "AddBot:price", "data": '{"price": 5}',
+             "updated_at": datetime.utcnow()}
+            for k in range(i * 100, i * 100 + 100)
+        ]), iterations=20),
+        "delete_stale_fsm_records": Case(lambda i: db.delete_stale_fsm_records(old), iterations=5),
+        "stream_table": Case(lambda i: export("deposits"), iterations=3),
+        # Дальше — тяжёлые операции над всей историей; меняют данные, поэтому в конце
+        "recompute_user_stats": Case(lambda i: db.recompute_user_stats(), iterations=3),
+        "rebuild_sales_daily": Case(lambda i: db.rebuild_sales_daily(), iterations=3),
+        "archive_terminal": Case(lambda i: db.archive_terminal(Deposit, old), iterations=5),
+        "incremental_vacuum": Case(lambda i: db.incremental_vacuum(1000), iterations=3),
+    }
+
+
+async def measure(cases: dict[str, Case], args) -> dict[str, dict]:
+    """Прогнать замеры (с фильтром --only) и напечатать строку на каждый"""
+    only = re.compile(args.only) if args.only else None
+    results = {}
+    for name, case in cases.items():
+        if only and not only.search(name):
+            continue
+        iterations = max(1, int(case.iterations * args.iterations))
+        samples = []
+        for i in range(iterations):
+            if case.setup:
+                await case.setup(i)
+            t = time.perf_counter()
+            await case.call(i)
+            samples.append((time.perf_counter() - t) * 1000)
+        results[name] = {
+            "n": iterations,
+            "p50_ms": round(percentile(samples, 0.50), 4),
+            "p95_ms": round(percentile(samples, 0.95), 4),
+            "p99_ms": round(percentile(samples, 0.99), 4),
+            "mean_ms": round(sum(samples) / len(samples), 4),
+        }
+        r = results[name]
+        print(f"{name:24} n={iterations:<4} p50 {r['p50_ms']:9.3f}  p95 {r['p95_ms']:9.3f}  p99 {r['p99_ms']:9.3f} мс")
+    return results
+
+
+async def fsm_storages() -> dict:
+    """Хранилища FSM для замера; redis — только если сервер по REDIS_URL отвечает"""
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from bot.config import config
+    from bot.fsm_storage import SQLStorage
+
+    # Фоновая запись в sql выключена — её стоимость меряется отдельно (flush)
+    storages = {"memory": MemoryStorage(), "sql": SQLStorage(flush_interval=3600)}
+    try:
+        from aiogram.fsm.storage.redis import RedisStorage
+        redis = RedisStorage.from_url(config.REDIS_URL)
+        await redis.redis.ping()
+        storages["redis"] = redis
+    except Exception as e:
+        print(f"⚠️ redis пропущен ({config.REDIS_URL}): {e}")
+    return storages
+
+
+FSM_DATA = {"username": "bench_bot", "token": "1:bench", "name": "Бенчмарк", "price": 5.0}
+
+
+def fsm_key(user_id: int):
+    from aiogram.fsm.storage.base import StorageKey
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+async def fsm_fill(storage, users: int = 1000):
+    """Пользователи 1..users посреди диалога AddBot"""
+    for user_id in range(1, users + 1):
+        await storage.set_state(fsm_key(user_id), "AddBot:price")
+        await storage.set_data(fsm_key(user_id), FSM_DATA)
+
+
+def build_fsm_cases(storages: dict, rng: random.Random) -> dict[str, Case]:
+    """get_state/set_state/set_data/get_data для каждого хранилища"""
+    key = fsm_key
+    active = lambda: key(rng.randint(1, 1000))
+    data = FSM_DATA
+    cold = iter(range(1_000_000, 2_000_000))
+
+    cases = {}
+    for name, storage in storages.items():
+        cases.update({
+            f"{name}.get_state": Case(lambda i, s=storage: s.get_state(active()), iterations=2000),
+            # Пользователь без состояния, которого хранилище ещё не видело (sql — запрос к БД)
+            f"{name}.get_state_new": Case(lambda i, s=storage: s.get_state(key(next(cold))), iterations=500),
+            f"{name}.set_state": Case(lambda i, s=storage: s.set_state(active(), "AddBot:name"), iterations=2000),
+            f"{name}.get_data": Case(lambda i, s=storage: s.get_data(active()), iterations=2000),
+            f"{name}.set_data": Case(lambda i, s=storage: s.set_data(active(), data), iterations=2000),
+            f"{name}.update_data": Case(lambda i, s=storage: s.update_data(active(), {"price": i}), iterations=1000),
+        })
+        if name == "sql":
+            # Пачка записи: 1000 изменённых ключей одной транзакцией
+            cases["sql.flush_1000"] = Case(
+                lambda i, s=storage: s.flush(), iterations=20, setup=lambda i, s=storage: fsm_fill(s)
+            )
+    return cases
+
+
+async def run_fsm(args) -> dict:
+    from bot.database import init_db
+
+    await init_db()
+    storages = await fsm_storages()
+    for storage in storages.values():
+        await fsm_fill(storage)
+    if "sql" in storages:
+        await storages["sql"].flush()
+    results = await measure(build_fsm_cases(storages, random.Random(args.seed)), args)
+    for storage in storages.values():
+        await storage.close()
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "mode": "fsm",
+            "scale": args.scale,
+            "backends": list(storages),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "results": results,
+    }
+
+
+ROUTING_ADMIN_ID = 1
+
+
+def routing_samples() -> dict[str, str]:
+    """Нажатие каждой кнопки бота: имя замера -> callback_data"""
+    from bot.keyboards import callbacks as cb
+
+    user = [
+        cb.StartCb(), cb.ProfileCb(), cb.DepositHistoryCb(), cb.OrderHistoryCb(), cb.FaqCb(), cb.SupportCb(),
+        cb.CatalogCb(), cb.CatalogPageCb(page=1), cb.BotCb(bot_id=5), cb.BuyCb(bot_id=5), cb.NotEnoughCb(),
+        cb.PayBalanceCb(bot_id=5), cb.PayCryptoCb(bot_id=5), cb.CheckPaymentCb(bot_id=5, invoice_id="123"),
+        cb.MyBotsCb(), cb.ManageCb(bot_id=5), cb.SettingsCb(bot_id=5), cb.ShowTokenCb(bot_id=5),
+        cb.ToggleCb(bot_id=5, action="inline"), cb.DoToggleCb(bot_id=5, action="inline", value="on"),
+        cb.ActionCb(bot_id=5, action="setname"), cb.ClearCb(bot_id=5, action="setname"),
+        cb.DepositCb(), cb.DepositMethodCb(method="cryptobot"), cb.DepositAmountCb(method="cryptobot", amount=10),
+        cb.DepositCustomCb(method="lolz"), cb.CheckDepositCb(method="cryptobot", invoice_id="123"),
+    ]
+    admin = [
+        cb.AdminMenuCb(), cb.AdminCb(action="stats"), cb.AdminExportCb(table="users"), cb.AdminCb(action="sessions"),
+        cb.AdminItemCb(action="session", id=3), cb.AdminItemCb(action="delete_bot", id=5),
+        cb.AdminCb(action="save_bot_no_session"), cb.AdminCb(action="broadcast"), cb.BroadcastCb(action="start"),
+    ]
+    samples = {f"user.{item.pack()}": item.pack() for item in user}
+    samples.update({f"admin.{item.pack()}": item.pack() for item in admin})
+    return samples
+
+
+async def run_routing(args) -> dict:
+    """Стоимость выбора хендлера для нажатия (фильтры и роутеры), без самого хендлера"""
+    from aiogram import Bot, Dispatcher
+    from aiogram.types import CallbackQuery, Chat, Message, User
+    from bot.handlers import get_main_router
+
+    dp = Dispatcher()
+    dp.include_router(get_main_router())
+    routed = {}
+
+    # Внутренний middleware срабатывает после выбора хендлера — дальше не идём
+    async def stop(handler, event, data):
+        routed[event.data] = data["handler"].callback.__name__
+
+    dp.callback_query.middleware(stop)
+    bot = Bot("1:bench")
+    message = Message(message_id=1, date=0, chat=Chat(id=1, type="private"))
+    user = User(id=7, is_bot=False, first_name="user")
+    admin = User(id=ROUTING_ADMIN_ID, is_bot=False, first_name="admin")
+
+    cases = {}
+    for name, data in routing_samples().items():
+        who = admin if name.startswith("admin.") else user
+        event = CallbackQuery(id="1", from_user=who, chat_instance="1", data=data, message=message)
+        kwargs = {"bot": bot, "event_from_user": who, "raw_state": None}
+        cases[name] = Case(lambda i, e=event, k=kwargs: dp.propagate_event("callback_query", e, **k), iterations=2000)
+
+    results = await measure(cases, args)
+    unrouted = [name for name, data in routing_samples().items() if data not in routed and name in results]
+    if unrouted:
+        print(f"⚠️ Не дошли до хендлера: {', '.join(unrouted)}")
+    await bot.session.close()
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "mode": "routing",
+            "scale": args.scale,
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+
+
+PRAGMA_BURST = 100
+
+
+def pragma_engines(workdir: str) -> dict:
+    """Два файла SQLite: настройки по умолчанию (NullPool, без PRAGMA) и профиль из конфига"""
+    from sqlalchemy import event, make_url
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from bot.database.db import _apply_sqlite_pragmas, _engine_options
+
+    engines = {}
+    for name in ("default", "tuned"):
+        url = make_url(f"sqlite+aiosqlite:///{os.path.join(workdir, f'pragmas_{name}.db')}")
+        if name == "default":
+            engines[name] = create_async_engine(url)
+        else:
+            engines[name] = create_async_engine(url, **_engine_options(url))
+            event.listen(engines[name].sync_engine, "connect", _apply_sqlite_pragmas)
+    return engines
+
+
+async def run_pragmas(args) -> dict:
+    """Пачки по PRAGMA_BURST одновременных покупок и пополнений (у каждой записи своя сессия, как в хендлерах)"""
+    from sqlalchemy import insert, text
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    import bot.database as db
+    from bot.database.db import sqlite_pragmas
+    from bot.database.migrations import run_migrations
+    from bot.database.models import Base, Bot, User
+
+    rng = random.Random(args.seed)
+    users = 1000
+    engines = pragma_engines(args.workdir)
+    cases = {}
+    # Записи, упавшие с ошибкой (например, «database is locked»), — по имени замера
+    errors: dict[str, int] = {}
+    for name, engine in engines.items():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(run_migrations)
+            await conn.execute(insert(User), [{"id": i, "full_name": f"User {i}"} for i in range(1, users + 1)])
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        unsold: list[int] = []
+
+        async def add_bots(i: int, name=name, engine=engine, unsold=unsold):
+            # Боты для следующей пачки покупок (не входит во время)
+            start = i * PRAGMA_BURST + 1
+            unsold[:] = range(start, start + PRAGMA_BURST)
+            async with engine.begin() as conn:
+                await conn.execute(insert(Bot), [
+                    {"id": k, "username": f"{name}_bot{k}", "token": f"{k}:{name}", "name": "Bench", "price": 5.0}
+                    for k in unsold
+                ])
+
+        async def purchase(i: int, k: int, sessions=sessions, unsold=unsold):
+            async with sessions() as session:
+                await db.create_purchase(rng.randint(1, users), unsold[k], f"burst_{i}_{k}", session=session)
+
+        async def deposit(i: int, k: int, sessions=sessions):
+            async with sessions() as session:
+                await db.create_deposit(rng.randint(1, users), 10.0, "cryptobot", f"burst_{i}_{k}", session=session)
+
+        async def burst(i: int, write, case: str) -> None:
+            results = await asyncio.gather(*(write(i, k) for k in range(PRAGMA_BURST)), return_exceptions=True)
+            errors[case] = errors.get(case, 0) + sum(isinstance(result, Exception) for result in results)
+
+        async with engine.connect() as conn:
+            journal = await conn.scalar(text("PRAGMA journal_mode"))
+            synchronous = await conn.scalar(text("PRAGMA synchronous"))
+        print(f"{name}: journal_mode={journal}, synchronous={synchronous}")
+        for case, write in ((f"{name}.purchase_burst", purchase), (f"{name}.deposit_burst", deposit)):
+            cases[case] = Case(
+                lambda i, w=write, c=case: burst(i, w, c),
+                iterations=20,
+                setup=add_bots if write is purchase else None
+            )
+
+    results = await measure(cases, args)
+    for case, count in errors.items():
+        results[case]["errors"] = count
+        if count:
+            print(f"⚠️ {case}: {count} из {results[case]['n'] * PRAGMA_BURST} записей с ошибкой")
+    for engine in engines.values():
+        await engine.dispose()
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "mode": "pragmas",
+            "scale": args.scale,
+            "burst": PRAGMA_BURST,
+            "pragmas": sqlite_pragmas(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "results": results,
+    }
+
+
+CATALOG_SIZES = (1_000, 10_000, 100_000)
+
+
+async def run_catalog(args) -> dict:
+    """
+    Стоимость одной страницы каталога (без кэша) по мере роста каталога.
+    all_bots — прежний путь: все непроданные боты, страница режется в Python.
+    """
+    from sqlalchemy import insert
+    import bot.database as db
+    from bot.database.db import engine
+    from bot.database.models import Bot
+
+    rng = random.Random(args.seed)
+    await db.init_db()
+
+    async def fresh_catalog(i: int):
+        db.catalog_cache.invalidate()
+
+    results = {}
+    added = 0
+    for size in (max(10, int(size * args.scale)) for size in CATALOG_SIZES):
+        async with engine.begin() as conn:
+            for start in range(added + 1, size + 1, 10_000):
+                await conn.execute(insert(Bot), [
+                    {"id": i, "username": f"bot{i}", "token": f"{i}:token", "name": f"Bot {i}",
+                     "description": "Описание бота " * 20, "price": rng.choice((1.0, 5.0, 10.0)),
+                     "created_at": datetime.utcnow() - timedelta(seconds=rng.randint(0, 365 * 86400))}
+                    for i in range(start, min(start + 10_000, size + 1))
+                ])
+        added = size
+        last_page = (size - 1) // 5
+        results.update(await measure({
+            f"catalog_{size}.first_page": Case(lambda i: db.get_catalog_page(0), setup=fresh_catalog),
+            f"catalog_{size}.page_20": Case(lambda i: db.get_catalog_page(min(20, last_page)), setup=fresh_catalog),
+            f"catalog_{size}.last_page": Case(lambda i: db.get_catalog_page(last_page), iterations=50, setup=fresh_catalog),
+            f"catalog_{size}.all_bots": Case(lambda i: db.get_available_bots(), iterations=5),
+        }, args))
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "mode": "catalog",
+            "scale": args.scale,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "results": results,
+    }
+
+
+START_USERS = 1000
+
+
+def start_update(i: int, user_id: int):
+    from aiogram.types import Update
+
+    return Update.model_validate({
+        "update_id": i,
+        "message": {
+            "message_id": i,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "User", "last_name": str(user_id),
+                     "username": f"user{user_id}"},
+            "text": "/start",
+        },
+    })
+
+
+async def run_start(args) -> dict:
+    """
+    /start пользователей, которых бот уже видел: get_or_create_user (прежний путь),
+    upsert_user (кэш известных пользователей) и весь хендлер через диспетчер.
+    """
+    from aiogram import Bot
+    import bot.database as db
+    from bot.database.db import known_users
+    from bot.main import create_dispatcher
+    from bot.middlewares import DbCommitMiddleware
+
+    await db.init_db()
+    # Первый /start каждого пользователя — регистрация (не замеряется)
+    for user_id in range(1, START_USERS + 1):
+        await db.upsert_user(user_id, f"user{user_id}", f"User {user_id}")
+
+    async def fake_api(make_request, bot, method):
+        return True
+
+    bot = Bot("1:bench")
+    bot.session.middleware(DbCommitMiddleware())
+    bot.session.middleware(fake_api)
+    dp = create_dispatcher()
+    # Пользователи по кругу — каждый жмёт /start реже лимита антифлуда
+    repeat = lambda i: i % START_USERS + 1
+
+    results = await measure({
+        "start.get_or_create_user": Case(
+            lambda i: db.get_or_create_user(repeat(i), f"user{repeat(i)}", f"User {repeat(i)}"), iterations=2000
+        ),
+        "start.upsert_user": Case(
+            lambda i: db.upsert_user(repeat(i), f"user{repeat(i)}", f"User {repeat(i)}"), iterations=2000
+        ),
+        "start.upsert_user_changed": Case(
+            lambda i: db.upsert_user(repeat(i), f"renamed{i}", f"User {repeat(i)}"), iterations=500
+        ),
+        "start.handler": Case(lambda i: dp.feed_update(bot, start_update(i, repeat(i))), iterations=2000),
+    }, args)
+    for name, result in results.items():
+        result["per_sec"] = round(1000 / result["mean_ms"])
+        print(f"{name:26} {result['per_sec']:>7} /start в секунду (один поток)")
+    await bot.session.close()
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "mode": "start",
+            "scale": args.scale,
+            "known_users": known_users.stats(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "results": results,
+    }
+
+
+WRITES_BURST = 500
+
+
+async def run_writes(args) -> dict:
+    """WRITES_BURST одновременных create_deposit: каждый в своей транзакции и через очередь записи"""
+    import bot.database as db
+
+    rng = random.Random(args.seed)
+    await db.init_db()
+    errors: dict[str, int] = {}
+
+    async def burst(i: int, case: str):
+        results = await asyncio.gather(*(
+            db.create_deposit(rng.randint(1, 100_000), 10.0, "cryptobot", f"{case}_{i}_{k}")
+            for k in range(WRITES_BURST)
+        ), return_exceptions=True)
+        errors[case] = errors.get(case, 0) + sum(isinstance(result, Exception) for result in results)
+
+    results = await measure({"deposits.direct": Case(lambda i: burst(i, "direct"), iterations=10)}, args)
+    db.write_queue.start()
+    results.update(await measure({"deposits.queue": Case(lambda i: burst(i, "queue"), iterations=10)}, args))
+    await db.write_queue.stop()
+
+    for name, result in results.items():
+        result["errors"] = errors[name.split(".")[1]]
+        result["per_sec"] = round(WRITES_BURST / result["mean_ms"] * 1000)
+        print(f"{name:24} {result['per_sec']:>7} пополнений в секунду, ошибок: {result['errors']}")
+    print(f"Очередь: {db.write_queue.ops} операций в {db.write_queue.batches} коммитах")
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "mode": "writes",
+            "scale": args.scale,
+            "burst": WRITES_BURST,
+            "queue_batches": db.write_queue.batches,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "results": results,
+    }
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    counts = await seed(args.scale, rng)
+    seed_seconds = time.perf_counter() - started
+    print(f"Заполнение базы: {seed_seconds:.1f} с {counts}")
+
+    import bot.database as db
+    cases = build_cases(counts, rng)
+    exported = [
+        name for name in db.__all__
+        if inspect.iscoroutinefunction(getattr(db, name)) or inspect.isasyncgenfunction(getattr(db, name))
+    ]
+    # Служебные функции без смысла для замера
+    missing = [name for name in exported if name not in cases and name not in ("init_db",)]
+    if missing:
+        print(f"⚠️ Нет замера для: {', '.join(missing)}")
+
+    results = await measure(cases, args)
+
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "scale": args.scale,
+            "seed": args.seed,
+            "counts": counts,
+            "seed_seconds": round(seed_seconds, 1),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_ms: float) -> list[str]:
+    """Регрессии: p50 или p95 выросли больше чем на threshold и больше чем на min_ms"""
+    if baseline["meta"].get("scale") != current["meta"]["scale"]:
+        print(f"⚠️ Разный масштаб: базовая линия {baseline['meta'].get('scale')}, сейчас {current['meta']['scale']}")
+
+    regressions = []
+    print(f"\n{'функция':24} {'p50 было':>10} {'стало':>10} {'p95 было':>10} {'стало':>10}")
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:24} (нет в базовой линии)")
+            continue
+        flags = []
+        for key in ("p50_ms", "p95_ms"):
+            if now[key] > before[key] * (1 + threshold) and now[key] - before[key] > min_ms:
+                flags.append(f"{key[:3]} +{(now[key] / before[key] - 1) * 100:.0f}%")
+        mark = f"  ❌ {', '.join(flags)}" if flags else ""
+        print(f"{name:24} {before['p50_ms']:10.3f} {now['p50_ms']:10.3f} "
+              f"{before['p95_ms']:10.3f} {now['p95_ms']:10.3f}{mark}")
+        if flags:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк bot.database")
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель объёма данных")
+    parser.add_argument("--iterations", type=float, default=1.0, help="множитель числа повторов")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fsm", action="store_true", help="замерить хранилища FSM вместо bot.database")
+    parser.add_argument("--routing", action="store_true", help="замерить маршрутизацию нажатий вместо bot.database")
+    parser.add_argument("--pragmas", action="store_true", help="сравнить SQLite по умолчанию и профиль PRAGMA из конфига")
+    parser.add_argument("--catalog", action="store_true", help="замерить страницу каталога на растущем каталоге")
+    parser.add_argument("--start", action="store_true", help="замерить /start повторных пользователей")
+    parser.add_argument("--writes", action="store_true", help="замерить одновременные пополнения без очереди и с ней")
+    parser.add_argument("--only", help="регулярное выражение по имени функции")
+    parser.add_argument("--save", metavar="JSON", help="записать результаты (базовую линию)")
+    parser.add_argument("--compare", metavar="JSON", help="сравнить с базовой линией")
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимый рост p50/p95 (доля)")
+    parser.add_argument("--min-ms", type=float, default=0.5, help="рост меньше этого не считается регрессией")
+    args = parser.parse_args()
+
+    # Своя временная база — до импорта bot.database, который читает конфиг при импорте
+    workdir = tempfile.mkdtemp(prefix="shop_bench_")
+    os.environ["DATABASE_PATH"] = os.path.join(workdir, "bench.db")
+    os.environ.pop("DATABASE_URL", None)
+    os.environ.pop("DATABASE_READ_URL", None)
+    os.environ["DB_WRITE_QUEUE"] = "false"
+    args.workdir = workdir
+
+    if args.routing:
+        os.environ["ADMIN_IDS"] = str(ROUTING_ADMIN_ID)
+        report = asyncio.run(run_routing(args))
+    elif args.pragmas:
+        report = asyncio.run(run_pragmas(args))
+    elif args.catalog:
+        report = asyncio.run(run_catalog(args))
+    elif args.start:
+        report = asyncio.run(run_start(args))
+    elif args.writes:
+        report = asyncio.run(run_writes(args))
+    else:
+        report = asyncio.run(run_fsm(args) if args.fsm else run(args))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты записаны в {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_ms)
+        if regressions:
+            print(f"\n❌ Регрессии: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ Регрессий нет")
+
+
+if __name__ == "__main__":
+    main()
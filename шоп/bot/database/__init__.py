@@ -1,6 +1,10 @@
 from bot.database.db import (
     init_db,
+    unit_of_work,
+    read_session,
+    write_queue,
     get_or_create_user,
+    upsert_user,
     get_user,
     add_balance,
     set_balance,
@@ -10,13 +14,21 @@ from bot.database.db import (
     get_session,
     delete_session,
     add_bot,
+    find_existing_bots,
+    add_bots_bulk,
     get_available_bots,
+    get_catalog_page,
+    get_bot_counts,
+    catalog_cache,
     get_bot,
     get_bot_with_session,
     mark_bot_sold,
     delete_bot,
     get_all_bots,
     create_purchase,
+    checkout_with_balance,
+    CheckoutResult,
+    CheckoutStatus,
     get_user_purchases,
     get_user_bots,
     create_payment,
@@ -28,12 +40,29 @@ from bot.database.db import (
     get_user_deposits,
     get_user_orders,
     get_user_total_orders,
+    recompute_user_stats,
+    rebuild_sales_daily,
     get_all_users,
+    get_stale_pending,
+    expire_pending,
+    archive_terminal,
+    incremental_vacuum,
+    get_fsm_record,
+    save_fsm_records,
+    delete_stale_fsm_records,
+    get_shop_stats,
+    stream_table,
+    EXPORT_TABLES,
 )
+from bot.database.instrumentation import query_stats
 
 __all__ = [
     "init_db",
+    "unit_of_work",
+    "read_session",
+    "write_queue",
     "get_or_create_user",
+    "upsert_user",
     "get_user",
     "add_balance",
     "set_balance",
@@ -43,13 +72,22 @@ __all__ = [
     "get_session",
     "delete_session",
     "add_bot",
+    "find_existing_bots",
+    "add_bots_bulk",
     "get_available_bots",
+    "get_catalog_page",
+    "get_bot_counts",
+    "catalog_cache",
+    "query_stats",
     "get_bot",
     "get_bot_with_session",
     "mark_bot_sold",
     "delete_bot",
     "get_all_bots",
     "create_purchase",
+    "checkout_with_balance",
+    "CheckoutResult",
+    "CheckoutStatus",
     "get_user_purchases",
     "get_user_bots",
     "create_payment",
@@ -61,5 +99,17 @@ __all__ = [
     "get_user_deposits",
     "get_user_orders",
     "get_user_total_orders",
+    "recompute_user_stats",
+    "rebuild_sales_daily",
     "get_all_users",
+    "get_stale_pending",
+    "expire_pending",
+    "archive_terminal",
+    "incremental_vacuum",
+    "get_fsm_record",
+    "save_fsm_records",
+    "delete_stale_fsm_records",
+    "get_shop_stats",
+    "stream_table",
+    "EXPORT_TABLES",
 ]
@@ -0,0 +1,91 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple
+
+
+class CatalogItem(NamedTuple):
+    """Бот в каталоге — только поля для кнопки (безопасно делить между сессиями)"""
+    id: int
+    username: str
+    price: float
+    currency: str
+
+
+class CatalogCache:
+    """
+    LRU-кэш страниц и счётчиков каталога с версионной инвалидацией.
+
+    Ключи живут в рамках текущей версии: любая запись в каталог увеличивает версию,
+    и все старые записи перестают находиться. Значение, прочитанное из БД до смены
+    версии, не сохраняется. Версия своя у каждого процесса, поэтому записи ещё и
+    живут не дольше ttl секунд — так изменения каталога из других процессов
+    (воркеры supervisor.py, скрипты) видны с задержкой не больше ttl.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[tuple[int, Hashable], tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        item = self._items.get((self.version, key))
+        if item is None or (self.ttl and item[0] <= time.monotonic()):
+            self.misses += 1
+            return None
+        self._items.move_to_end((self.version, key))
+        self.hits += 1
+        return item[1]
+
+    def set(self, version: int, key: Hashable, value: Any):
+        """Сохранить значение, прочитанное при версии version"""
+        if version != self.version:
+            return
+        self._items[(version, key)] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end((version, key))
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def invalidate(self):
+        self.version += 1
+        self._items.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "version": self.version,
+            "size": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class KnownUsersCache:
+    """LRU известных пользователей: id -> (username, full_name), как они записаны в БД"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict[int, tuple[str | None, str]] = OrderedDict()
+
+    def is_fresh(self, user_id: int, username: str | None, full_name: str) -> bool:
+        """Пользователь уже в БД с такими же данными"""
+        if self._items.get(user_id) == (username, full_name):
+            self._items.move_to_end(user_id)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def remember(self, user_id: int, username: str | None, full_name: str):
+        self._items[user_id] = (username, full_name)
+        self._items.move_to_end(user_id)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self._items), "hits": self.hits, "misses": self.misses}
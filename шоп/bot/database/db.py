@@ -1,101 +1,362 @@
-from sqlalchemy import select, update
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from enum import Enum
+from functools import wraps
+from typing import AsyncIterator
+
+from sqlalchemy import select, insert, update, delete, func, case, event, text, Row, URL, make_url
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import Session as OrmSession, joinedload
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from bot.config import config
-from bot.database.models import Base, User, Session, Bot, Purchase, Payment, Deposit
-
-
-engine = create_async_engine(f"sqlite+aiosqlite:///{config.DATABASE_PATH}", echo=False)
+from bot.database.cache import CatalogCache, CatalogItem, KnownUsersCache
+from bot.database.instrumentation import instrument
+from bot.database.migrations import run_migrations, sales_daily_rebuild, user_stats_recompute
+from bot.database.models import (
+    Base, User, Session, Bot, Purchase, Payment, Deposit, SalesDaily, PaymentArchive, DepositArchive, FsmRecord
+)
+from bot.database.writer import WriteQueue
+
+
+def _engine_options(url: URL) -> dict:
+    """Параметры пула под конкретный бэкенд"""
+    if url.get_backend_name() == "sqlite":
+        # aiosqlite по умолчанию работает на NullPool (новый поток и соединение на каждую сессию),
+        # поэтому держим небольшой пул постоянных соединений
+        return {
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": config.DB_POOL_SIZE,
+            "max_overflow": config.DB_MAX_OVERFLOW,
+        }
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "connect_args": {
+            "statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+        },
+    }
+
+
+def _read_url(url: URL) -> URL:
+    """URL для отчётов: DATABASE_READ_URL, для SQLite — тот же файл в режиме только чтения"""
+    if config.DATABASE_READ_URL:
+        return make_url(config.DATABASE_READ_URL)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        path = url.database if url.database.startswith("file:") else f"file:{url.database}"
+        return url.set(database=path, query={**url.query, "mode": "ro", "uri": "true"})
+    return url
+
+
+def _read_engine_options(url: URL) -> dict:
+    """Отдельный (меньший) пул для отчётов; на PostgreSQL ещё и read-only транзакции"""
+    options = _engine_options(url)
+    options["pool_size"] = config.DB_READ_POOL_SIZE
+    options["max_overflow"] = 0
+    if url.get_backend_name() == "postgresql":
+        options["connect_args"] = {
+            **options["connect_args"],
+            "server_settings": {"default_transaction_read_only": "on"},
+        }
+    return options
+
+
+database_url = make_url(config.DATABASE_URL)
+engine = create_async_engine(database_url, echo=False, **_engine_options(database_url))
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
+# Отчёты, статистика и экспорт — свой движок, чтобы долгие чтения не занимали пул покупок
+read_url = _read_url(database_url)
+read_engine = create_async_engine(read_url, echo=False, **_read_engine_options(read_url))
+read_session = async_sessionmaker(read_engine, expire_on_commit=False)
+
+if config.DB_QUERY_STATS or config.DB_NPLUS1_THRESHOLD > 0:
+    instrument(engine)
+    instrument(read_engine)
+
+
+def sqlite_pragmas() -> dict[str, str]:
+    """PRAGMA из конфига (пустые значения пропускаются)"""
+    pragmas = {
+        "journal_mode": config.SQLITE_JOURNAL_MODE,
+        "synchronous": config.SQLITE_SYNCHRONOUS,
+        "cache_size": config.SQLITE_CACHE_SIZE,
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "temp_store": config.SQLITE_TEMP_STORE,
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT,
+    }
+    return {name: value for name, value in pragmas.items() if value}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in sqlite_pragmas().items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def _apply_sqlite_read_pragmas(dbapi_connection, connection_record):
+    # journal_mode и synchronous задаёт пишущее соединение
+    cursor = dbapi_connection.cursor()
+    for name, value in sqlite_pragmas().items():
+        if name not in ("journal_mode", "synchronous"):
+            cursor.execute(f"PRAGMA {name}={value}")
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+if read_engine.dialect.name == "sqlite":
+    event.listen(read_engine.sync_engine, "connect", _apply_sqlite_read_pragmas)
+
+
+_AUTO_VACUUM_MODES = {"NONE": 0, "FULL": 1, "INCREMENTAL": 2}
+
+
+async def set_auto_vacuum(existing: bool = False) -> int | None:
+    """
+    Включить SQLITE_AUTO_VACUUM: режим меняется только через VACUUM и не в режиме WAL,
+    поэтому на время переключаемся в DELETE. По умолчанию — только для пустой базы
+    (existing=True переписывает и существующий файл). Возвращает итоговый режим.
+    """
+    mode = _AUTO_VACUUM_MODES.get(config.SQLITE_AUTO_VACUUM.upper())
+    if engine.dialect.name != "sqlite" or mode is None:
+        return None
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        current = await conn.scalar(text("PRAGMA auto_vacuum"))
+        has_tables = await conn.scalar(text("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'"))
+        if current == mode or (has_tables and not existing):
+            return current
+        await conn.execute(text("PRAGMA journal_mode=DELETE"))
+        await conn.execute(text(f"PRAGMA auto_vacuum={mode}"))
+        await conn.execute(text("VACUUM"))
+        if config.SQLITE_JOURNAL_MODE:
+            await conn.execute(text(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}"))
+        return await conn.scalar(text("PRAGMA auto_vacuum"))
+
 
 async def init_db():
+    await set_auto_vacuum()
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+
+
+# Размер пачки для IN (...) — с запасом под лимит параметров SQLite
+_IN_CHUNK = 500
+
+
+def _upsert_insert(session: AsyncSession):
+    """insert() диалекта сессии — с поддержкой ON CONFLICT"""
+    return sqlite_insert if session.get_bind().dialect.name == "sqlite" else postgresql_insert
+
+
+# ============ CACHES ============
+
+catalog_cache = CatalogCache(max_size=config.CATALOG_CACHE_SIZE, ttl=config.CATALOG_CACHE_TTL)
+known_users = KnownUsersCache(max_size=config.KNOWN_USERS_CACHE_SIZE)
+
+
+def _catalog_changed(session: AsyncSession):
+    """Пометить, что транзакция меняет каталог — кэш сбросится после коммита"""
+    session.info["catalog_changed"] = True
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _update_caches_after_commit(sync_session):
+    if sync_session.info.pop("catalog_changed", False):
+        catalog_cache.invalidate()
+    for user_id, (username, full_name) in sync_session.info.pop("upserted_users", {}).items():
+        known_users.remember(user_id, username, full_name)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _forget_cache_changes(sync_session):
+    sync_session.info.pop("catalog_changed", None)
+    sync_session.info.pop("upserted_users", None)
+
+
+# ============ UNIT OF WORK ============
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    """
+    Одна сессия и одна транзакция на весь апдейт (коммит при выходе, откат при ошибке).
+    Атомарность апдейта нарушают только явные коммиты: хендлер может закоммитить раньше
+    сам — например, перед долгим запросом к внешнему API, — а для хендлеров с флагом
+    commit_before_api это перед запросами к Bot API делает DbCommitMiddleware.
+    """
+    async with async_session(info={"unit_of_work": True}) as session:
+        try:
+            yield session
+        except BaseException:
+            await session.rollback()
+            raise
+        await session.commit()
+
+
+@asynccontextmanager
+async def _session_scope(session: AsyncSession | None) -> AsyncIterator[AsyncSession]:
+    """Сессия запроса, если передана, иначе — своя короткая сессия"""
+    if session is not None:
+        yield session
+        return
+    async with async_session() as own_session:
+        yield own_session
+
+
+@asynccontextmanager
+async def _read_scope(session: AsyncSession | None) -> AsyncIterator[AsyncSession]:
+    """Как _session_scope, но своя сессия открывается на движке отчётов"""
+    if session is not None:
+        yield session
+        return
+    async with read_session() as own_session:
+        yield own_session
+
+
+async def _commit(session: AsyncSession):
+    """Внутри unit of work только сбрасываем изменения — коммит делает владелец транзакции"""
+    if session.info.get("unit_of_work"):
+        await session.flush()
+    else:
+        await session.commit()
+
+
+# ============ WRITE QUEUE ============
+
+write_queue = WriteQueue(
+    async_session,
+    max_batch=config.DB_WRITE_BATCH,
+    max_delay=config.DB_WRITE_DELAY_MS / 1000
+)
+
+
+def _queued_write(func):
+    """Вызов без сессии при запущенной очереди записи уходит в групповой коммит"""
+    @wraps(func)
+    async def wrapper(*args, session: AsyncSession | None = None, **kwargs):
+        if session is None and write_queue.running:
+            return await write_queue.submit(func, *args, **kwargs)
+        return await func(*args, session=session, **kwargs)
+    return wrapper
 
 
 # ============ USERS ============
 
-async def get_or_create_user(user_id: int, username: str | None, full_name: str) -> User:
-    async with async_session() as session:
+async def get_or_create_user(user_id: int, username: str | None, full_name: str,
+                             session: AsyncSession | None = None) -> User:
+    async with _session_scope(session) as session:
         user = await session.get(User, user_id)
         if not user:
             user = User(id=user_id, username=username, full_name=full_name)
             session.add(user)
-            await session.commit()
+            await _commit(session)
         return user
 
 
-async def get_user(user_id: int) -> User | None:
-    async with async_session() as session:
+async def upsert_user(user_id: int, username: str | None, full_name: str,
+                      session: AsyncSession | None = None) -> bool:
+    """
+    Создать пользователя или обновить username/full_name одним INSERT ... ON CONFLICT.
+    Для знакомых пользователей с неизменными данными в БД не ходим.
+    Возвращает True, если был запрос к БД.
+    """
+    if known_users.is_fresh(user_id, username, full_name):
+        return False
+
+    async with _session_scope(session) as session:
+        stmt = _upsert_insert(session)(User).values(id=user_id, username=username, full_name=full_name)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.id],
+            set_={"username": stmt.excluded.username, "full_name": stmt.excluded.full_name}
+        )
+        await session.execute(stmt)
+        # Кэш обновится только после коммита (см. _update_caches_after_commit)
+        session.info.setdefault("upserted_users", {})[user_id] = (username, full_name)
+        await _commit(session)
+    return True
+
+
+async def get_user(user_id: int, session: AsyncSession | None = None) -> User | None:
+    async with _session_scope(session) as session:
         return await session.get(User, user_id)
 
 
-async def add_balance(user_id: int, amount: float) -> User | None:
+@_queued_write
+async def add_balance(user_id: int, amount: float, session: AsyncSession | None = None) -> User | None:
     """Начислить баланс пользователю"""
-    async with async_session() as session:
+    async with _session_scope(session) as session:
         user = await session.get(User, user_id)
         if user:
             user.balance += amount
-            await session.commit()
+            await _commit(session)
             await session.refresh(user)
         return user
 
 
-async def set_balance(user_id: int, amount: float) -> User | None:
+async def set_balance(user_id: int, amount: float, session: AsyncSession | None = None) -> User | None:
     """Установить баланс пользователю"""
-    async with async_session() as session:
+    async with _session_scope(session) as session:
         user = await session.get(User, user_id)
         if user:
             user.balance = amount
-            await session.commit()
+            await _commit(session)
             await session.refresh(user)
         return user
 
 
-async def get_user_balance(user_id: int) -> float:
+async def get_user_balance(user_id: int, session: AsyncSession | None = None) -> float:
     """Получить баланс пользователя"""
-    async with async_session() as session:
+    async with _session_scope(session) as session:
         user = await session.get(User, user_id)
         return user.balance if user else 0.0
 
 
 # ============ SESSIONS ============
 
-async def add_session(phone: str, session_file: str) -> Session:
-    async with async_session() as session:
+async def add_session(phone: str, session_file: str, session: AsyncSession | None = None) -> Session:
+    async with _session_scope(session) as session:
         tg_session = Session(phone=phone, session_file=session_file)
         session.add(tg_session)
-        await session.commit()
+        await _commit(session)
         await session.refresh(tg_session)
         return tg_session
 
 
-async def get_all_sessions() -> list[Session]:
-    async with async_session() as session:
+async def get_all_sessions(session: AsyncSession | None = None) -> list[Session]:
+    async with _session_scope(session) as session:
         result = await session.execute(select(Session).where(Session.is_active == True))
         return list(result.scalars().all())
 
 
-async def get_session(session_id: int) -> Session | None:
-    async with async_session() as session:
+async def get_session(session_id: int, session: AsyncSession | None = None) -> Session | None:
+    async with _session_scope(session) as session:
         return await session.get(Session, session_id)
 
 
-async def delete_session(session_id: int):
-    async with async_session() as session:
+async def delete_session(session_id: int, session: AsyncSession | None = None):
+    async with _session_scope(session) as session:
         tg_session = await session.get(Session, session_id)
         if tg_session:
             await session.delete(tg_session)
-            await session.commit()
+            await _commit(session)
 
 
 # ============ BOTS ============
 
 async def add_bot(username: str, token: str, name: str, price: float,
                   currency: str = "USDT", description: str = None,
-                  session_id: int = None) -> Bot:
-    async with async_session() as session:
+                  session_id: int = None,
+                  session: AsyncSession | None = None) -> Bot:
+    async with _session_scope(session) as session:
         bot = Bot(
             username=username,
             token=token,
@@ -106,104 +367,284 @@ async def add_bot(username: str, token: str, name: str, price: float,
             session_id=session_id
         )
         session.add(bot)
-        await session.commit()
+        _catalog_changed(session)
+        await _commit(session)
         await session.refresh(bot)
         return bot
 
 
-async def get_available_bots() -> list[Bot]:
-    async with async_session() as session:
+async def find_existing_bots(usernames: list[str], tokens: list[str],
+                             session: AsyncSession | None = None) -> tuple[set[str], set[str]]:
+    """Какие из username/token уже заняты (проверка пачками по уникальным колонкам)"""
+    taken_usernames, taken_tokens = set(), set()
+    async with _session_scope(session) as session:
+        for i in range(0, len(usernames), _IN_CHUNK):
+            result = await session.scalars(select(Bot.username).where(Bot.username.in_(usernames[i:i + _IN_CHUNK])))
+            taken_usernames.update(result)
+        for i in range(0, len(tokens), _IN_CHUNK):
+            result = await session.scalars(select(Bot.token).where(Bot.token.in_(tokens[i:i + _IN_CHUNK])))
+            taken_tokens.update(result)
+    return taken_usernames, taken_tokens
+
+
+async def add_bots_bulk(bots: list[dict], session: AsyncSession | None = None) -> int:
+    """Добавить много ботов одним пакетным INSERT в одной транзакции"""
+    if not bots:
+        return 0
+    async with _session_scope(session) as session:
+        # render_nulls: строки с None и без (session_id, description) идут одним executemany, а не группами
+        await session.execute(insert(Bot).execution_options(render_nulls=True), bots)
+        _catalog_changed(session)
+        await _commit(session)
+    return len(bots)
+
+
+async def get_available_bots(session: AsyncSession | None = None) -> list[Bot]:
+    async with _session_scope(session) as session:
         result = await session.execute(
             select(Bot).where(Bot.is_sold == False).order_by(Bot.created_at.desc())
         )
         return list(result.scalars().all())
 
 
-async def get_bot(bot_id: int) -> Bot | None:
-    async with async_session() as session:
+async def get_catalog_page(page: int = 0, per_page: int = 5,
+                           session: AsyncSession | None = None) -> tuple[list[CatalogItem], bool]:
+    """Страница каталога (только поля для кнопок) и флаг наличия следующей страницы"""
+    key = ("page", page, per_page)
+    cached = catalog_cache.get(key)
+    if cached is not None:
+        return cached
+
+    version = catalog_cache.version
+    async with _session_scope(session) as session:
+        result = await session.execute(
+            select(Bot.id, Bot.username, Bot.price, Bot.currency)
+            .where(Bot.is_sold == False)
+            .order_by(Bot.created_at.desc(), Bot.id.desc())
+            .offset(page * per_page)
+            .limit(per_page + 1)
+        )
+        bots = [CatalogItem(*row) for row in result.all()]
+        # Незакоммиченные изменения каталога этой же сессии в кэш не попадают
+        dirty = session.info.get("catalog_changed", False)
+
+    page_data = (bots[:per_page], len(bots) > per_page)
+    if not dirty:
+        catalog_cache.set(version, key, page_data)
+    return page_data
+
+
+async def get_bot_counts(session: AsyncSession | None = None) -> tuple[int, int]:
+    """Всего ботов и сколько из них продано"""
+    cached = catalog_cache.get("counts")
+    if cached is not None:
+        return cached
+
+    version = catalog_cache.version
+    async with _session_scope(session) as session:
+        total, sold = (await session.execute(
+            select(func.count(Bot.id), func.coalesce(func.sum(case((Bot.is_sold == True, 1), else_=0)), 0))
+        )).one()
+        dirty = session.info.get("catalog_changed", False)
+
+    if not dirty:
+        catalog_cache.set(version, "counts", (total, sold))
+    return total, sold
+
+
+async def get_bot(bot_id: int, session: AsyncSession | None = None) -> Bot | None:
+    async with _session_scope(session) as session:
         result = await session.execute(
             select(Bot).where(Bot.id == bot_id)
         )
         return result.scalar_one_or_none()
 
 
-async def get_bot_with_session(bot_id: int) -> Bot | None:
-    async with async_session() as session:
+async def get_bot_with_session(bot_id: int, session: AsyncSession | None = None) -> Bot | None:
+    async with _session_scope(session) as session:
         result = await session.execute(
-            select(Bot).where(Bot.id == bot_id)
+            select(Bot)
+            .options(joinedload(Bot.session))
+            .where(Bot.id == bot_id)
         )
-        bot = result.scalar_one_or_none()
-        if bot and bot.session_id:
-            await session.refresh(bot, ["session"])
-        return bot
+        return result.scalar_one_or_none()
 
 
-async def mark_bot_sold(bot_id: int):
-    async with async_session() as session:
+async def mark_bot_sold(bot_id: int, session: AsyncSession | None = None):
+    async with _session_scope(session) as session:
         await session.execute(
             update(Bot).where(Bot.id == bot_id).values(is_sold=True)
         )
-        await session.commit()
+        _catalog_changed(session)
+        await _commit(session)
 
 
-async def delete_bot(bot_id: int):
-    async with async_session() as session:
+async def delete_bot(bot_id: int, session: AsyncSession | None = None):
+    async with _session_scope(session) as session:
         bot = await session.get(Bot, bot_id)
         if bot:
             await session.delete(bot)
-            await session.commit()
+            _catalog_changed(session)
+            await _commit(session)
 
 
-async def get_all_bots() -> list[Bot]:
-    async with async_session() as session:
+async def get_all_bots(session: AsyncSession | None = None) -> list[Bot]:
+    async with _session_scope(session) as session:
         result = await session.execute(select(Bot).order_by(Bot.created_at.desc()))
         return list(result.scalars().all())
 
 
 # ============ PURCHASES ============
 
-async def create_purchase(user_id: int, bot_id: int, invoice_id: str = None) -> Purchase:
-    async with async_session() as session:
-        purchase = Purchase(user_id=user_id, bot_id=bot_id, invoice_id=invoice_id)
+async def _record_sale(session: AsyncSession, day: date, currency: str, price: float):
+    """+1 заказ и +price выручки в sales_daily за день (одним INSERT ... ON CONFLICT)"""
+    stmt = _upsert_insert(session)(SalesDaily).values(day=day, currency=currency, orders=1, revenue=price)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SalesDaily.day, SalesDaily.currency],
+        set_={
+            "orders": SalesDaily.orders + 1,
+            "revenue": SalesDaily.revenue + stmt.excluded.revenue,
+        }
+    )
+    await session.execute(stmt)
+
+
+async def create_purchase(user_id: int, bot_id: int, invoice_id: str = None,
+                          session: AsyncSession | None = None) -> Purchase:
+    async with _session_scope(session) as session:
+        paid_at = datetime.utcnow()
+        sold = (await session.execute(
+            update(Bot).where(Bot.id == bot_id).values(is_sold=True).returning(Bot.price, Bot.currency)
+        )).one_or_none()
+        price, currency = sold if sold else (0.0, None)
+        purchase = Purchase(
+            user_id=user_id,
+            bot_id=bot_id,
+            invoice_id=invoice_id,
+            paid_at=paid_at,
+            amount=price,
+            currency=currency or "USDT"
+        )
         session.add(purchase)
+        _catalog_changed(session)
+        # Счётчики пользователя и дневная сводка — в той же транзакции, что и покупка
         await session.execute(
-            update(Bot).where(Bot.id == bot_id).values(is_sold=True)
+            update(User)
+            .where(User.id == user_id)
+            .values(
+                total_spent=User.total_spent + price,
+                orders_count=User.orders_count + 1,
+                last_purchase_at=paid_at
+            )
         )
-        await session.commit()
+        if currency is not None:
+            await _record_sale(session, paid_at.date(), currency, price)
+        await _commit(session)
         await session.refresh(purchase)
         return purchase
 
 
-async def get_user_purchases(user_id: int) -> list[Purchase]:
-    async with async_session() as session:
+class CheckoutStatus(str, Enum):
+    OK = "ok"
+    NOT_FOUND = "not_found"
+    SOLD = "sold"
+    INSUFFICIENT_FUNDS = "insufficient_funds"
+
+
+@dataclass
+class CheckoutResult:
+    """Результат покупки с баланса"""
+    status: CheckoutStatus
+    bot: Bot | None = None
+    purchase: Purchase | None = None
+    balance: float | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status is CheckoutStatus.OK
+
+
+async def checkout_with_balance(user_id: int, bot_id: int,
+                                session: AsyncSession | None = None) -> CheckoutResult:
+    """
+    Атомарная покупка с баланса: бронь бота, списание и запись покупки в одной транзакции.
+    Условные UPDATE вместо проверки заранее — двойное списание и продажа
+    одного бота двоим невозможны даже при одновременных нажатиях.
+    """
+    async with _session_scope(session) as session:
+        # Бронируем бота: пройдёт только у первого покупателя
+        bot = await session.scalar(
+            update(Bot)
+            .where(Bot.id == bot_id, Bot.is_sold == False)
+            .values(is_sold=True)
+            .returning(Bot)
+        )
+        if bot is None:
+            exists = await session.scalar(select(Bot.id).where(Bot.id == bot_id))
+            return CheckoutResult(CheckoutStatus.SOLD if exists else CheckoutStatus.NOT_FOUND)
+
+        # Списываем, только если хватает средств (заодно обновляем счётчики)
+        paid_at = datetime.utcnow()
+        balance = await session.scalar(
+            update(User)
+            .where(User.id == user_id, User.balance >= bot.price)
+            .values(
+                balance=User.balance - bot.price,
+                total_spent=User.total_spent + bot.price,
+                orders_count=User.orders_count + 1,
+                last_purchase_at=paid_at
+            )
+            .returning(User.balance)
+        )
+        if balance is None:
+            # Снимаем бронь — изменение ещё не закоммичено и никому не видно
+            await session.execute(update(Bot).where(Bot.id == bot_id).values(is_sold=False))
+            await _commit(session)
+            return CheckoutResult(CheckoutStatus.INSUFFICIENT_FUNDS, bot=bot)
+
+        purchase = Purchase(
+            user_id=user_id,
+            bot_id=bot_id,
+            invoice_id=f"balance_{user_id}_{bot_id}",
+            paid_at=paid_at,
+            amount=bot.price,
+            currency=bot.currency
+        )
+        session.add(purchase)
+        _catalog_changed(session)
+        await _record_sale(session, paid_at.date(), bot.currency, bot.price)
+        await _commit(session)
+        return CheckoutResult(CheckoutStatus.OK, bot=bot, purchase=purchase, balance=balance)
+
+
+async def get_user_purchases(user_id: int, session: AsyncSession | None = None) -> list[Purchase]:
+    async with _session_scope(session) as session:
         result = await session.execute(
-            select(Purchase).where(Purchase.user_id == user_id)
+            select(Purchase)
+            .options(joinedload(Purchase.bot))
+            .where(Purchase.user_id == user_id)
         )
-        purchases = list(result.scalars().all())
-        for p in purchases:
-            await session.refresh(p, ["bot"])
-        return purchases
+        return list(result.scalars().all())
 
 
-async def get_user_bots(user_id: int) -> list[Bot]:
-    async with async_session() as session:
+async def get_user_bots(user_id: int, session: AsyncSession | None = None) -> list[Bot]:
+    async with _session_scope(session) as session:
         result = await session.execute(
             select(Bot)
             .join(Purchase)
+            .options(joinedload(Bot.session))
             .where(Purchase.user_id == user_id)
         )
-        bots = list(result.scalars().all())
-        for bot in bots:
-            if bot.session_id:
-                await session.refresh(bot, ["session"])
-        return bots
+        return list(result.scalars().all())
 
 
 # ============ PAYMENTS ============
 
+@_queued_write
 async def create_payment(user_id: int, bot_id: int, invoice_id: str,
-                         amount: float, currency: str) -> Payment:
-    async with async_session() as session:
+                         amount: float, currency: str,
+                         session: AsyncSession | None = None) -> Payment:
+    async with _session_scope(session) as session:
         payment = Payment(
             user_id=user_id,
             bot_id=bot_id,
@@ -212,20 +653,21 @@ async def create_payment(user_id: int, bot_id: int, invoice_id: str,
             currency=currency
         )
         session.add(payment)
-        await session.commit()
+        await _commit(session)
         return payment
 
 
-async def update_payment_status(invoice_id: str, status: str):
-    async with async_session() as session:
+@_queued_write
+async def update_payment_status(invoice_id: str, status: str, session: AsyncSession | None = None):
+    async with _session_scope(session) as session:
         await session.execute(
             update(Payment).where(Payment.invoice_id == invoice_id).values(status=status)
         )
-        await session.commit()
+        await _commit(session)
 
 
-async def get_payment_by_invoice(invoice_id: str) -> Payment | None:
-    async with async_session() as session:
+async def get_payment_by_invoice(invoice_id: str, session: AsyncSession | None = None) -> Payment | None:
+    async with _session_scope(session) as session:
         result = await session.execute(
             select(Payment).where(Payment.invoice_id == invoice_id)
         )
@@ -234,9 +676,11 @@ async def get_payment_by_invoice(invoice_id: str) -> Payment | None:
 
 # ============ DEPOSITS ============
 
-async def create_deposit(user_id: int, amount: float, method: str, invoice_id: str = None) -> Deposit:
+@_queued_write
+async def create_deposit(user_id: int, amount: float, method: str, invoice_id: str = None,
+                         session: AsyncSession | None = None) -> Deposit:
     """Создать запись о пополнении"""
-    async with async_session() as session:
+    async with _session_scope(session) as session:
         deposit = Deposit(
             user_id=user_id,
             amount=amount,
@@ -244,72 +688,254 @@ async def create_deposit(user_id: int, amount: float, method: str, invoice_id: s
             invoice_id=invoice_id
         )
         session.add(deposit)
-        await session.commit()
+        await _commit(session)
         await session.refresh(deposit)
         return deposit
 
 
-async def get_deposit_by_invoice(invoice_id: str) -> Deposit | None:
+async def get_deposit_by_invoice(invoice_id: str, session: AsyncSession | None = None) -> Deposit | None:
     """Получить депозит по invoice_id"""
-    async with async_session() as session:
+    async with _session_scope(session) as session:
         result = await session.execute(
             select(Deposit).where(Deposit.invoice_id == invoice_id)
         )
         return result.scalar_one_or_none()
 
 
-async def update_deposit_status(invoice_id: str, status: str):
+@_queued_write
+async def update_deposit_status(invoice_id: str, status: str, session: AsyncSession | None = None):
     """Обновить статус депозита"""
-    async with async_session() as session:
+    async with _session_scope(session) as session:
         await session.execute(
             update(Deposit).where(Deposit.invoice_id == invoice_id).values(status=status)
         )
-        await session.commit()
+        await _commit(session)
 
 
-async def get_user_deposits(user_id: int, limit: int = 10) -> list[Deposit]:
-    """Получить историю пополнений пользователя"""
-    async with async_session() as session:
+async def get_user_deposits(user_id: int, limit: int = 10,
+                            session: AsyncSession | None = None) -> list[Deposit | DepositArchive]:
+    """Получить историю пополнений пользователя (старые дочитываются из архива)"""
+    async with _session_scope(session) as session:
         result = await session.execute(
             select(Deposit)
             .where(Deposit.user_id == user_id, Deposit.status == "paid")
             .order_by(Deposit.created_at.desc())
             .limit(limit)
         )
-        return list(result.scalars().all())
-
-
-async def get_user_orders(user_id: int, limit: int = 10) -> list[Purchase]:
+        deposits = list(result.scalars().all())
+        if len(deposits) < limit:
+            archived = await session.execute(
+                select(DepositArchive)
+                .where(DepositArchive.user_id == user_id, DepositArchive.status == "paid")
+                .order_by(DepositArchive.created_at.desc())
+                .limit(limit - len(deposits))
+            )
+            deposits += archived.scalars().all()
+        return deposits
+
+
+async def get_user_orders(user_id: int, limit: int = 10, session: AsyncSession | None = None) -> list[Purchase]:
     """Получить историю заказов пользователя (последние N)"""
-    async with async_session() as session:
+    async with _session_scope(session) as session:
         result = await session.execute(
             select(Purchase)
+            .options(joinedload(Purchase.bot))
             .where(Purchase.user_id == user_id)
             .order_by(Purchase.paid_at.desc())
             .limit(limit)
         )
-        purchases = list(result.scalars().all())
-        for p in purchases:
-            await session.refresh(p, ["bot"])
-        return purchases
+        return list(result.scalars().all())
 
 
-async def get_user_total_orders(user_id: int) -> float:
+async def get_user_total_orders(user_id: int, session: AsyncSession | None = None) -> float:
     """Получить общую сумму заказов пользователя"""
-    async with async_session() as session:
-        purchases = await session.execute(
-            select(Purchase).where(Purchase.user_id == user_id)
-        )
-        total = 0.0
-        for p in purchases.scalars().all():
-            await session.refresh(p, ["bot"])
-            if p.bot:
-                total += p.bot.price
-        return total
+    async with _session_scope(session) as session:
+        user = await session.get(User, user_id)
+        return user.total_spent if user else 0.0
+
+
+async def recompute_user_stats(session: AsyncSession | None = None) -> int:
+    """Пересчитать счётчики покупок всех пользователей по истории (бэкфилл)"""
+    async with _session_scope(session) as session:
+        result = await session.execute(user_stats_recompute())
+        await _commit(session)
+        return result.rowcount
 
 
-async def get_all_users() -> list[User]:
-    """Получить всех пользователей"""
-    async with async_session() as session:
+async def rebuild_sales_daily(session: AsyncSession | None = None) -> int:
+    """Пересобрать sales_daily по истории покупок, вернуть число строк сводки"""
+    async with _session_scope(session) as session:
+        for stmt in sales_daily_rebuild():
+            await session.execute(stmt)
+        rows = await session.scalar(select(func.count()).select_from(SalesDaily))
+        await _commit(session)
+        return rows
+
+
+async def get_all_users(session: AsyncSession | None = None) -> list[User]:
+    """Получить всех пользователей (без сессии — через движок отчётов)"""
+    async with _read_scope(session) as session:
         result = await session.execute(select(User))
         return list(result.scalars().all())
+
+
+# ============ EXPIRY / ARCHIVE ============
+
+# Статусы, после которых запись больше не меняется
+TERMINAL_STATUSES = ("paid", "failed", "expired")
+ARCHIVES = {Payment: PaymentArchive, Deposit: DepositArchive}
+
+
+async def get_stale_pending(model: type[Payment] | type[Deposit], before: datetime, after_id: int = 0,
+                            limit: int = 500, session: AsyncSession | None = None) -> list[tuple[int, str]]:
+    """Неоплаченные счета CryptoBot, созданные раньше before: (id, invoice_id) по возрастанию id"""
+    stmt = (
+        select(model.id, model.invoice_id)
+        .where(model.status == "pending", model.created_at < before, model.id > after_id)
+        .order_by(model.id)
+        .limit(limit)
+    )
+    if model is Deposit:
+        stmt = stmt.where(Deposit.method == "cryptobot")
+    async with _session_scope(session) as session:
+        return [tuple(row) for row in await session.execute(stmt)]
+
+
+async def expire_pending(model: type[Payment] | type[Deposit], ids: list[int],
+                         session: AsyncSession | None = None) -> int:
+    """Пометить pending-записи как expired (уже изменённые другим запросом не трогаются)"""
+    if not ids:
+        return 0
+    async with _session_scope(session) as session:
+        result = await session.execute(
+            update(model).where(model.id.in_(ids), model.status == "pending").values(status="expired")
+        )
+        await _commit(session)
+        return result.rowcount
+
+
+async def archive_terminal(model: type[Payment] | type[Deposit], before: datetime, limit: int = 500,
+                           session: AsyncSession | None = None) -> int:
+    """Перенести до limit завершённых записей старше before в архив, вернуть сколько перенесено"""
+    archive = ARCHIVES[model]
+    columns = [column.name for column in model.__table__.columns]
+    async with _session_scope(session) as session:
+        ids = list(await session.scalars(
+            select(model.id)
+            .where(model.status.in_(TERMINAL_STATUSES), model.created_at < before)
+            .limit(limit)
+        ))
+        if not ids:
+            return 0
+        await session.execute(
+            insert(archive).from_select(
+                columns, select(*model.__table__.columns).where(model.id.in_(ids))
+            )
+        )
+        await session.execute(delete(model).where(model.id.in_(ids)))
+        await _commit(session)
+        return len(ids)
+
+
+async def incremental_vacuum(pages: int) -> int:
+    """Вернуть файлу SQLite до pages свободных страниц (только при auto_vacuum=INCREMENTAL)"""
+    if engine.dialect.name != "sqlite":
+        return 0
+    async with engine.connect() as conn:
+        if await conn.scalar(text("PRAGMA auto_vacuum")) != 2:
+            return 0
+        free_before = await conn.scalar(text("PRAGMA freelist_count"))
+        # execute() в sqlite3 делает один шаг (= одна страница), executescript — до конца
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        return free_before - await conn.scalar(text("PRAGMA freelist_count"))
+
+
+# ============ FSM ============
+
+async def get_fsm_record(key: str, session: AsyncSession | None = None) -> FsmRecord | None:
+    async with _session_scope(session) as session:
+        return await session.get(FsmRecord, key)
+
+
+async def save_fsm_records(records: list[dict], session: AsyncSession | None = None) -> int:
+    """
+    Записать пачку состояний FSM одной транзакцией (key, state, data, updated_at).
+    Пустые записи — без состояния и данных — удаляются.
+    """
+    empty = [record["key"] for record in records if record["state"] is None and record["data"] == "{}"]
+    filled = [record for record in records if record["state"] is not None or record["data"] != "{}"]
+    async with _session_scope(session) as session:
+        if filled:
+            stmt = _upsert_insert(session)(FsmRecord)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[FsmRecord.key],
+                set_={
+                    "state": stmt.excluded.state,
+                    "data": stmt.excluded.data,
+                    "updated_at": stmt.excluded.updated_at,
+                }
+            )
+            await session.execute(stmt, filled)
+        for start in range(0, len(empty), _IN_CHUNK):
+            await session.execute(delete(FsmRecord).where(FsmRecord.key.in_(empty[start:start + _IN_CHUNK])))
+        await _commit(session)
+    return len(records)
+
+
+async def delete_stale_fsm_records(before: datetime, session: AsyncSession | None = None) -> int:
+    """Удалить состояния FSM, не менявшиеся с before"""
+    async with _session_scope(session) as session:
+        result = await session.execute(delete(FsmRecord).where(FsmRecord.updated_at < before))
+        await _commit(session)
+        return result.rowcount
+
+
+# ============ EXPORT ============
+
+EXPORT_TABLES = {
+    "purchases": Purchase,
+    "deposits": Deposit,
+    "payments": Payment,
+    "users": User,
+}
+
+
+async def stream_table(name: str, chunk_size: int = 1000) -> AsyncIterator[list[Row]]:
+    """Построчно читать таблицу курсором на стороне сервера (пачками по chunk_size)"""
+    table = EXPORT_TABLES[name].__table__
+    async with read_engine.connect() as conn:
+        result = await conn.stream(
+            select(table)
+            .order_by(*table.primary_key.columns)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+
+# ============ STATS ============
+
+async def get_shop_stats(session: AsyncSession | None = None) -> dict:
+    """
+    Статистика магазина: пользователи, заказы и выручка (по валютам) за всё время и за сегодня.
+    Продажи читаются из sales_daily, без прохода по purchases. Без сессии — через движок отчётов.
+    """
+    today = datetime.utcnow().date()
+    totals = select(
+        SalesDaily.currency, func.sum(SalesDaily.orders), func.sum(SalesDaily.revenue)
+    ).group_by(SalesDaily.currency)
+    async with _read_scope(session) as session:
+        users_count = await session.scalar(select(func.count(User.id)))
+        all_time = (await session.execute(totals)).all()
+        today_rows = (await session.execute(
+            select(SalesDaily.currency, SalesDaily.orders, SalesDaily.revenue)
+            .where(SalesDaily.day == today)
+        )).all()
+    return {
+        "users_count": users_count,
+        "orders_all": sum(orders for _, orders, _ in all_time),
+        "revenue_all": {currency: float(revenue) for currency, _, revenue in all_time},
+        "orders_today": sum(orders for _, orders, _ in today_rows),
+        "revenue_today": {currency: float(revenue) for currency, _, revenue in today_rows},
+    }
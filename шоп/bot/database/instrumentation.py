@@ -0,0 +1,147 @@
+"""
+Замеры SQL-запросов
+
+Хуки before/after_cursor_execute записывают время и число строк каждого запроса
+в гистограммы по «форме» запроса (SQL с плейсхолдерами, IN (...) схлопнут) и
+хендлеру aiogram, который его вызвал. Для разработки — счётчик форм в рамках
+одного апдейта, чтобы ловить N+1 (refresh в цикле и т.п.).
+"""
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Верхние границы корзин гистограммы, мс (последняя корзина — всё, что дольше)
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Хендлер текущего апдейта и счётчик форм запросов в нём (ставит QueryStatsMiddleware)
+current_handler: ContextVar[str] = ContextVar("current_handler", default="-")
+update_queries: ContextVar[Counter | None] = ContextVar("update_queries", default=None)
+
+_IN_LIST = re.compile(r"IN \((?:\?|\$\d+|%s|%\(\w+\)s)(?:, (?:\?|\$\d+|%s|%\(\w+\)s))*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """SQL без лишних пробелов и с IN (?, ?, ...) -> IN (...)"""
+    return _IN_LIST.sub("IN (...)", _SPACES.sub(" ", statement).strip())
+
+
+def short_shape(shape: str, width: int = 160) -> str:
+    """Форма запроса для показа: длинный список колонок SELECT заменён на …"""
+    head, sep, rest = shape.partition(" FROM ")
+    if sep and head.startswith("SELECT ") and len(head) > 40:
+        shape = f"SELECT … FROM {rest}"
+    return shape if len(shape) <= width else shape[:width - 1] + "…"
+
+
+class StatementStats:
+    """Гистограмма времени и сумма строк для одной формы запроса"""
+    __slots__ = ("count", "total_ms", "max_ms", "rows", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms: float, rows: int):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.rows += max(rows, 0)
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def merge(self, other: "StatementStats"):
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.rows += other.rows
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def percentile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает q-й перцентиль (мс)"""
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+
+class QueryStats:
+    """Статистика запросов по парам (хендлер, форма запроса)"""
+
+    def __init__(self, max_keys: int = 2000):
+        self.max_keys = max_keys
+        self.started_at = time.time()
+        self._items: dict[tuple[str, str], StatementStats] = {}
+
+    def record(self, handler: str, shape: str, ms: float, rows: int):
+        key = (handler, shape)
+        stats = self._items.get(key)
+        if stats is None:
+            if len(self._items) >= self.max_keys:
+                key = (handler, "<прочие>")
+                stats = self._items.get(key)
+            if stats is None:
+                stats = self._items[key] = StatementStats()
+        stats.add(ms, rows)
+
+    def _grouped(self, by: int) -> list[tuple[str, StatementStats]]:
+        groups: dict[str, StatementStats] = {}
+        for key, stats in self._items.items():
+            groups.setdefault(key[by], StatementStats()).merge(stats)
+        return sorted(groups.items(), key=lambda item: item[1].total_ms, reverse=True)
+
+    def top_statements(self, limit: int = 10) -> list[tuple[str, StatementStats]]:
+        """Формы запросов по суммарному времени (все хендлеры вместе)"""
+        return self._grouped(1)[:limit]
+
+    def top_handlers(self, limit: int = 10) -> list[tuple[str, StatementStats]]:
+        """Хендлеры по суммарному времени в БД"""
+        return self._grouped(0)[:limit]
+
+    def reset(self):
+        self._items.clear()
+        self.started_at = time.time()
+
+
+query_stats = QueryStats()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    ms = (time.perf_counter() - context._query_started) * 1000
+    # Async-адаптеры (aiosqlite, asyncpg) уже выбрали строки SELECT в cursor._rows
+    rows = len(getattr(cursor, "_rows", ())) if cursor.description else cursor.rowcount
+    shape = statement_shape(statement)
+    query_stats.record(current_handler.get(), shape, ms, rows)
+
+    counter = update_queries.get()
+    if counter is not None:
+        counter[shape] += 1
+
+
+def instrument(engine: AsyncEngine):
+    """Подключить замеры к движку"""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
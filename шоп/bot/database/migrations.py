@@ -0,0 +1,200 @@
+"""
+Миграции схемы БД
+
+Версия схемы хранится в таблице schema_version. Каждый шаг выполняется один раз,
+по порядку, в той же транзакции, что и запись его версии. Шаги идемпотентны,
+поэтому на новой базе (после create_all) они просто ничего не меняют.
+"""
+from typing import Callable
+
+from sqlalchemy import Connection, Executable, Table, delete, func, insert, inspect, select, text, update
+
+from bot.database.models import (
+    User, Bot, Purchase, Payment, Deposit, SalesDaily, PaymentArchive, DepositArchive, FsmRecord
+)
+
+
+def _add_columns(conn: Connection, table: Table, names: list[str]):
+    """ALTER TABLE ADD COLUMN для недостающих колонок модели (тип — в диалекте соединения)"""
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        ddl = f"{name} {column.type.compile(dialect=conn.dialect)}"
+        if column.server_default is not None:
+            ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+
+def _add_user_counters(conn: Connection):
+    """Счётчики покупок пользователя (total_spent, orders_count, last_purchase_at)"""
+    _add_columns(conn, User.__table__, ["total_spent", "orders_count", "last_purchase_at"])
+
+
+def _add_hot_path_indexes(conn: Connection):
+    """Индексы под каталог, историю заказов, пополнений и платежей"""
+    for model in (Bot, Purchase, Deposit, Payment):
+        for index in model.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def sales_daily_rebuild() -> list[Executable]:
+    """Запросы полной пересборки sales_daily из purchases (выполнять в одной транзакции)"""
+    day = func.date(Purchase.paid_at)
+    return [
+        delete(SalesDaily),
+        insert(SalesDaily).from_select(
+            ["day", "currency", "orders", "revenue"],
+            select(day, Purchase.currency, func.count(Purchase.id), func.sum(Purchase.amount))
+            .group_by(day, Purchase.currency)
+        ),
+    ]
+
+
+def user_stats_recompute() -> Executable:
+    """UPDATE всех счётчиков покупок пользователей (total_spent, orders_count, last_purchase_at) по purchases"""
+    return update(User).values(
+        total_spent=select(func.coalesce(func.sum(Purchase.amount), 0.0))
+        .where(Purchase.user_id == User.id)
+        .scalar_subquery(),
+        orders_count=select(func.count(Purchase.id))
+        .where(Purchase.user_id == User.id)
+        .scalar_subquery(),
+        last_purchase_at=select(func.max(Purchase.paid_at))
+        .where(Purchase.user_id == User.id)
+        .scalar_subquery()
+    )
+
+
+def _add_sales_daily(conn: Connection):
+    """Дневная сводка продаж (заполняется по истории в шаге 4, когда у покупок появляется сумма)"""
+    SalesDaily.__table__.create(conn, checkfirst=True)
+
+
+def _add_purchase_amount(conn: Connection):
+    """
+    Сумма и валюта покупки: заполняем из bots, а для удалённых ботов — из payments
+    по invoice_id (оплата через CryptoBot). Остальные остаются с нулевой суммой.
+    Счётчики пользователей и дневную сводку пересобираем по новым суммам.
+    """
+    _add_columns(conn, Purchase.__table__, ["amount", "currency"])
+    conn.execute(text(
+        "UPDATE purchases SET "
+        "amount = (SELECT price FROM bots WHERE bots.id = purchases.bot_id), "
+        "currency = (SELECT currency FROM bots WHERE bots.id = purchases.bot_id) "
+        "WHERE EXISTS (SELECT 1 FROM bots WHERE bots.id = purchases.bot_id)"
+    ))
+    conn.execute(text(
+        "UPDATE purchases SET "
+        "amount = (SELECT amount FROM payments WHERE payments.invoice_id = purchases.invoice_id), "
+        "currency = (SELECT currency FROM payments WHERE payments.invoice_id = purchases.invoice_id) "
+        "WHERE NOT EXISTS (SELECT 1 FROM bots WHERE bots.id = purchases.bot_id) "
+        "AND EXISTS (SELECT 1 FROM payments WHERE payments.invoice_id = purchases.invoice_id)"
+    ))
+    conn.execute(text(
+        "UPDATE users SET total_spent = "
+        "(SELECT COALESCE(SUM(amount), 0) FROM purchases WHERE purchases.user_id = users.id)"
+    ))
+    for stmt in sales_daily_rebuild():
+        conn.execute(stmt)
+
+
+def _add_archive_tables(conn: Connection):
+    """Архивные таблицы платежей и пополнений, индексы для чистки и поиска пополнения по invoice_id"""
+    for model in (PaymentArchive, DepositArchive):
+        model.__table__.create(conn, checkfirst=True)
+    for model in (Payment, Deposit):
+        for index in model.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _add_fsm_states(conn: Connection):
+    """Таблица состояний FSM (FSM_STORAGE=sql)"""
+    FsmRecord.__table__.create(conn, checkfirst=True)
+
+
+def _backfill_user_counters(conn: Connection):
+    """
+    Шаг 4 пересчитал по истории только total_spent — orders_count и last_purchase_at
+    у старых пользователей остались 0/NULL. Пересчитываем все три счётчика.
+    """
+    conn.execute(user_stats_recompute())
+
+
+# (версия, описание, шаг) — строго по возрастанию версии
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "user purchase counters", _add_user_counters),
+    (2, "hot path indexes", _add_hot_path_indexes),
+    (3, "sales_daily rollup", _add_sales_daily),
+    (4, "purchase amount and currency", _add_purchase_amount),
+    (5, "payment/deposit archive", _add_archive_tables),
+    (6, "fsm states", _add_fsm_states),
+    (7, "user counters backfill", _backfill_user_counters),
+]
+
+
+def get_schema_version(conn: Connection) -> int:
+    """Текущая версия схемы (0 — миграции ещё не применялись)"""
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR(128) NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def run_migrations(conn: Connection) -> int:
+    """Применить все недостающие шаги, вернуть итоговую версию схемы"""
+    version = get_schema_version(conn)
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        step(conn)
+        conn.execute(
+            text("INSERT INTO schema_version (version, description) VALUES (:version, :description)"),
+            {"version": step_version, "description": description}
+        )
+        version = step_version
+    return version
+
+
+# ============ EXPLAIN ============
+
+# Горячие запросы (SQLite) и индекс, который каждый из них должен использовать
+HOT_QUERIES: dict[str, tuple[str, str]] = {
+    "catalog": (
+        "SELECT id, username, price, currency FROM bots WHERE is_sold = 0 "
+        "ORDER BY created_at DESC, id DESC LIMIT 6 OFFSET 5",
+        "ix_bots_unsold_created",
+    ),
+    "user_orders": (
+        "SELECT * FROM purchases WHERE user_id = 1 ORDER BY paid_at DESC LIMIT 10",
+        "ix_purchases_user_paid",
+    ),
+    "user_deposits": (
+        "SELECT * FROM deposits WHERE user_id = 1 AND status = 'paid' ORDER BY created_at DESC LIMIT 10",
+        "ix_deposits_user_status_created",
+    ),
+    "user_payments": (
+        "SELECT * FROM payments WHERE user_id = 1",
+        "ix_payments_user",
+    ),
+    "deposit_by_invoice": (
+        "SELECT * FROM deposits WHERE invoice_id = '1'",
+        "ix_deposits_invoice",
+    ),
+}
+
+
+def explain_hot_queries(conn: Connection) -> dict[str, tuple[bool, list[str]]]:
+    """EXPLAIN QUERY PLAN для горячих запросов: (индекс используется, строки плана)"""
+    report = {}
+    for name, (sql, index_name) in HOT_QUERIES.items():
+        plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+        uses_index = any(index_name in line for line in plan)
+        uses_temp_sort = any("TEMP B-TREE" in line for line in plan)
+        report[name] = (uses_index and not uses_temp_sort, plan)
+    return report
+
@@ -1,5 +1,5 @@
-from datetime import datetime
-from sqlalchemy import BigInteger, String, Float, Boolean, ForeignKey, DateTime, Text
+from datetime import date, datetime
+from sqlalchemy import BigInteger, Integer, String, Float, Boolean, ForeignKey, Date, DateTime, Text, Index, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -16,6 +16,11 @@ class User(Base):
     balance: Mapped[float] = mapped_column(Float, default=0.0)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    # Счётчики покупок (обновляются в create_purchase)
+    total_spent: Mapped[float] = mapped_column(Float, default=0.0, server_default="0")
+    orders_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    last_purchase_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
     purchases: Mapped[list["Purchase"]] = relationship(back_populates="user")
 
 
@@ -35,6 +40,14 @@ class Session(Base):
 class Bot(Base):
     """Бот на продажу"""
     __tablename__ = "bots"
+    __table_args__ = (
+        # Каталог: только непроданные, новые сверху
+        Index(
+            "ix_bots_unsold_created", "created_at", "id",
+            sqlite_where=text("is_sold = 0"),
+            postgresql_where=text("is_sold = false")
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     username: Mapped[str] = mapped_column(String(64), unique=True)
@@ -55,6 +68,9 @@ class Bot(Base):
 class Purchase(Base):
     """Покупка бота"""
     __tablename__ = "purchases"
+    __table_args__ = (
+        Index("ix_purchases_user_paid", "user_id", "paid_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
@@ -62,6 +78,10 @@ class Purchase(Base):
     invoice_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
     paid_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+    # Сколько заплачено на момент покупки (не зависит от последующих правок и удаления бота)
+    amount: Mapped[float] = mapped_column(Float, default=0.0, server_default="0")
+    currency: Mapped[str] = mapped_column(String(10), default="USDT", server_default=text("'USDT'"))
+
     user: Mapped["User"] = relationship(back_populates="purchases")
     bot: Mapped["Bot"] = relationship(back_populates="purchase")
 
@@ -69,6 +89,11 @@ class Purchase(Base):
 class Payment(Base):
     """История платежей"""
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_user", "user_id"),
+        # Поиск просроченных pending и старых завершённых (чистка)
+        Index("ix_payments_status_created", "status", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger)
@@ -83,11 +108,76 @@ class Payment(Base):
 class Deposit(Base):
     """История пополнений баланса"""
     __tablename__ = "deposits"
+    __table_args__ = (
+        Index("ix_deposits_user_status_created", "user_id", "status", "created_at"),
+        Index("ix_deposits_invoice", "invoice_id"),
+        Index("ix_deposits_status_created", "status", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger)
     amount: Mapped[float] = mapped_column(Float)
     method: Mapped[str] = mapped_column(String(20))  # cryptobot, lolz
     invoice_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
-    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending, paid, failed
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending, paid, failed, expired
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class PaymentArchive(Base):
+    """Завершённые платежи, вынесенные из payments (те же колонки + время переноса)"""
+    __tablename__ = "payments_archive"
+    __table_args__ = (
+        Index("ix_payments_archive_user", "user_id"),
+        Index("ix_payments_archive_invoice", "invoice_id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    bot_id: Mapped[int] = mapped_column(Integer)
+    invoice_id: Mapped[str] = mapped_column(String(64))
+    amount: Mapped[float] = mapped_column(Float)
+    currency: Mapped[str] = mapped_column(String(10))
+    status: Mapped[str] = mapped_column(String(20))
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class DepositArchive(Base):
+    """Завершённые пополнения, вынесенные из deposits (те же колонки + время переноса)"""
+    __tablename__ = "deposits_archive"
+    __table_args__ = (
+        Index("ix_deposits_archive_user_status_created", "user_id", "status", "created_at"),
+        Index("ix_deposits_archive_invoice", "invoice_id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    amount: Mapped[float] = mapped_column(Float)
+    method: Mapped[str] = mapped_column(String(20))
+    invoice_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    status: Mapped[str] = mapped_column(String(20))
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class SalesDaily(Base):
+    """Продажи за день по валютам (обновляются при каждой покупке, пересобираются из purchases)"""
+    __tablename__ = "sales_daily"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    currency: Mapped[str] = mapped_column(String(10), primary_key=True)
+    orders: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    revenue: Mapped[float] = mapped_column(Float, default=0.0, server_default="0")
+
+
+class FsmRecord(Base):
+    """Состояние FSM и данные диалога (ключ — DefaultKeyBuilder aiogram, data — JSON)"""
+    __tablename__ = "fsm_states"
+    __table_args__ = (
+        Index("ix_fsm_states_updated", "updated_at"),
+    )
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    data: Mapped[str] = mapped_column(Text, default="{}")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+# Операция записи: корутина, которая принимает session=... и не коммитит сама
+WriteOp = Callable[..., Awaitable[Any]]
+
+
+class WriteQueue:
+    """
+    Единственный писатель с групповым коммитом.
+
+    Хендлеры кладут операции в очередь и ждут свой результат. Задача-писатель
+    забирает до max_batch операций (подождав до max_delay секунд, пока соберётся
+    группа), выполняет их в одной транзакции и коммитит один раз. Если какая-то
+    операция падает, транзакция откатывается, и группа переигрывается по одной
+    операции на транзакцию — каждый вызывающий получает свой результат или исключение.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession],
+                 max_batch: int = 64, max_delay: float = 0.002):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.ops = 0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Дописать всё, что уже в очереди, и остановить писателя"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def submit(self, op: WriteOp, *args, **kwargs) -> Any:
+        """Выполнить op(*args, session=..., **kwargs) в очередной группе и вернуть её результат"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((op, args, kwargs, future))
+        return await future
+
+    async def _collect(self, first) -> tuple[list, bool]:
+        """Группа, начиная с first; второй элемент — встретился сигнал остановки"""
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch, stopping = await self._collect(first)
+            batch = [item for item in batch if not item[3].cancelled()]
+            if not batch:
+                continue
+            try:
+                await self._commit_batch(batch)
+            except Exception:
+                logging.exception("Ошибка группового коммита")
+            self.batches += 1
+            self.ops += len(batch)
+
+    async def _commit_batch(self, batch: list):
+        results = []
+        try:
+            async with self.session_factory(info={"unit_of_work": True}) as session:
+                for op, args, kwargs, _ in batch:
+                    results.append(await op(*args, session=session, **kwargs))
+                await session.commit()
+        except Exception:
+            # Кто-то из группы упал — переигрываем по одной, чтобы не уронить остальных
+            for item in batch:
+                await self._commit_one(item)
+            return
+
+        for (*_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _commit_one(self, item):
+        op, args, kwargs, future = item
+        try:
+            async with self.session_factory(info={"unit_of_work": True}) as session:
+                result = await op(*args, session=session, **kwargs)
+                await session.commit()
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            return
+        if not future.done():
+            future.set_result(result)
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, NamedTuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot.config import config
+from bot.database import get_fsm_record, save_fsm_records
+
+
+class FsmEntry(NamedTuple):
+    """Состояние в памяти: data — JSON-строка, updated_at — time.time() последнего изменения"""
+    state: str | None
+    data: str
+    updated_at: float
+
+
+class SQLStorage(BaseStorage):
+    """
+    FSM в таблице fsm_states.
+
+    Чтение — из LRU в памяти (в том числе «состояния нет»), промах — один запрос по ключу.
+    Запись сразу видна в памяти, а в БД уходит пачкой: через flush_interval после первого
+    изменения все изменённые ключи пишутся одной транзакцией, несколько set_state/set_data
+    одного ключа схлопываются в одну строку. close() дописывает остаток; при падении
+    процесса теряются изменения не старше flush_interval.
+
+    Кэш не согласуется между процессами: несколько воркеров допустимы, только если
+    апдейты одного пользователя всегда попадают в один и тот же процесс.
+    Состояние, не менявшееся дольше ttl секунд, считается пустым (строки удаляет чистка).
+    """
+
+    def __init__(self, ttl: int = 86400, flush_interval: float = 0.05, cache_size: int = 10000,
+                 key_builder: KeyBuilder | None = None):
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self.flushes = 0
+        self._items: OrderedDict[str, FsmEntry] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._flusher: asyncio.Task | None = None
+
+    async def _load(self, key: str) -> FsmEntry:
+        entry = self._items.get(key)
+        if entry is None:
+            record = await get_fsm_record(key)
+            # Пока шёл запрос, ключ мог измениться в памяти — тогда верна память
+            entry = self._items.get(key)
+            if entry is None:
+                entry = FsmEntry(None, "{}", time.time())
+                if record is not None:
+                    updated_at = record.updated_at.replace(tzinfo=timezone.utc).timestamp()
+                    entry = FsmEntry(record.state, record.data, updated_at)
+                self._remember(key, entry)
+        else:
+            self._items.move_to_end(key)
+        if time.time() - entry.updated_at > self.ttl:
+            return FsmEntry(None, "{}", entry.updated_at)
+        return entry
+
+    def _remember(self, key: str, entry: FsmEntry):
+        self._items[key] = entry
+        self._items.move_to_end(key)
+        # Вытесняем только уже записанные в БД ключи
+        for _ in range(len(self._items)):
+            if len(self._items) <= self.cache_size:
+                break
+            oldest, value = self._items.popitem(last=False)
+            if oldest in self._dirty:
+                self._items[oldest] = value
+
+    async def _store(self, key: str, state: str | None, data: str):
+        self._dirty.add(key)
+        self._remember(key, FsmEntry(state, data, time.time()))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        delay = self.flush_interval
+        while self._dirty:
+            await asyncio.sleep(delay)
+            try:
+                await self.flush()
+                delay = self.flush_interval
+            except Exception:
+                logging.exception("Не удалось записать состояния FSM")
+                delay = max(self.flush_interval, 1.0)
+
+    async def flush(self):
+        """Записать все изменённые ключи одной транзакцией"""
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        records = []
+        for key in keys:
+            entry = self._items[key]
+            records.append({
+                "key": key,
+                "state": entry.state,
+                "data": entry.data,
+                "updated_at": datetime.utcfromtimestamp(entry.updated_at),
+            })
+        try:
+            await save_fsm_records(records)
+        except BaseException:
+            # Ошибка или отмена — вернуть ключи в очередь (свежие значения уже в памяти)
+            self._dirty |= keys
+            raise
+        self.flushes += 1
+
+    async def set_state(self, key: StorageKey, state: StateType = None):
+        storage_key = self.key_builder.build(key)
+        entry = await self._load(storage_key)
+        state = state.state if isinstance(state, State) else state
+        await self._store(storage_key, state, entry.data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._load(self.key_builder.build(key))).state
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]):
+        storage_key = self.key_builder.build(key)
+        entry = await self._load(storage_key)
+        # Сериализуем сразу: несериализуемые данные — ошибка в хендлере, а не в фоновой записи
+        await self._store(storage_key, entry.state, json.dumps(data, ensure_ascii=False))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return json.loads((await self._load(self.key_builder.build(key))).data)
+
+    async def close(self):
+        if self._flusher is not None and not self._flusher.done():
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+
+def create_storage() -> BaseStorage:
+    """Хранилище FSM по FSM_STORAGE: memory, sql или redis"""
+    backend = config.FSM_STORAGE.lower()
+    if backend == "sql":
+        return SQLStorage(
+            ttl=config.FSM_STATE_TTL,
+            flush_interval=config.FSM_FLUSH_MS / 1000,
+            cache_size=config.FSM_CACHE_SIZE
+        )
+    if backend == "redis":
+        # Пакет redis нужен только для этого режима
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(
+            config.REDIS_URL,
+            key_builder=DefaultKeyBuilder(with_destiny=True),
+            state_ttl=config.FSM_STATE_TTL,
+            data_ttl=config.FSM_STATE_TTL
+        )
+    if backend != "memory":
+        logging.warning(f"Неизвестный FSM_STORAGE={config.FSM_STORAGE}, используется memory")
+    return MemoryStorage()
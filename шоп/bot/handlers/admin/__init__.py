@@ -1,9 +1,10 @@
 from aiogram import Router
 
+from bot.handlers.routing import CallbackRouter
 from bot.handlers.admin.panel import router as panel_router
 
 
 def get_admin_router() -> Router:
-    router = Router()
+    router = CallbackRouter()
     router.include_router(panel_router)
     return router
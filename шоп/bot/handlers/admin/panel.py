@@ -1,23 +1,33 @@
-from aiogram import Router, F
-from aiogram.types import CallbackQuery, Message
-from aiogram.filters import Filter, Command
+import os
+from datetime import datetime
+
+from aiogram import F
+from aiogram.types import CallbackQuery, Message, BufferedInputFile, FSInputFile
+from aiogram.utils.text_decorations import html_decoration as html
+from aiogram.filters import Filter, Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.config import config
 from bot.database import (
     get_all_sessions, get_session, delete_session, add_session,
     get_all_bots, get_bot, delete_bot, add_bot,
-    add_balance, get_user, get_user_balance, get_all_users
+    add_balance, get_user, get_user_balance, get_all_users,
+    get_shop_stats, get_bot_counts, EXPORT_TABLES, query_stats
 )
 from bot.keyboards import (
     admin_menu_kb, admin_sessions_kb, admin_session_detail_kb,
     admin_all_bots_kb, admin_bot_detail_kb, select_session_kb,
-    back_kb, confirm_kb, cancel_kb, broadcast_photo_kb, broadcast_confirm_kb
+    back_kb, confirm_kb, cancel_kb, broadcast_photo_kb, broadcast_confirm_kb,
+    admin_export_kb,
+    AdminMenuCb, AdminCb, AdminItemCb, AdminExportCb, BroadcastCb
 )
-from bot.services import session_manager
+from bot.database.instrumentation import short_shape
+from bot.handlers.routing import CallbackRouter
+from bot.services import session_manager, bot_import_service, export_service
 
-router = Router()
+router = CallbackRouter()
 
 
 class AdminFilter(Filter):
@@ -40,6 +50,10 @@ class AddBot(StatesGroup):
     session = State()
 
 
+class ImportBots(StatesGroup):
+    file = State()
+
+
 class AddBalance(StatesGroup):
     user_id = State()
     amount = State()
@@ -59,37 +73,35 @@ router.message.filter(AdminFilter())
 # ============ АДМИН МЕНЮ ============
 
 @router.message(Command("admin"))
-async def cmd_admin(message: Message, state: FSMContext):
+async def cmd_admin(message: Message, state: FSMContext, db_session: AsyncSession):
     """Команда /admin"""
     await state.clear()
 
-    sessions = await get_all_sessions()
-    bots = await get_all_bots()
-    sold = sum(1 for b in bots if b.is_sold)
+    sessions = await get_all_sessions(session=db_session)
+    bots_count, sold = await get_bot_counts(session=db_session)
 
     text = (
         "⚙️ <b>Админ-панель</b>\n\n"
         f"📱 Сессий: {len(sessions)}\n"
-        f"🤖 Ботов: {len(bots)} (продано: {sold})\n\n"
+        f"🤖 Ботов: {bots_count} (продано: {sold})\n\n"
         "Выберите действие:"
     )
 
     await message.answer(text, reply_markup=admin_menu_kb(), parse_mode="HTML")
 
 
-@router.callback_query(F.data == "admin")
-async def callback_admin(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(AdminMenuCb.filter())
+async def callback_admin(callback: CallbackQuery, state: FSMContext, db_session: AsyncSession):
     """Админ панель"""
     await state.clear()
 
-    sessions = await get_all_sessions()
-    bots = await get_all_bots()
-    sold = sum(1 for b in bots if b.is_sold)
+    sessions = await get_all_sessions(session=db_session)
+    bots_count, sold = await get_bot_counts(session=db_session)
 
     text = (
         "⚙️ <b>Админ-панель</b>\n\n"
         f"📱 Сессий: {len(sessions)}\n"
-        f"🤖 Ботов: {len(bots)} (продано: {sold})\n\n"
+        f"🤖 Ботов: {bots_count} (продано: {sold})\n\n"
         "Выберите действие:"
     )
 
@@ -99,64 +111,117 @@ async def callback_admin(callback: CallbackQuery, state: FSMContext):
 
 # ============ СТАТИСТИКА ============
 
-@router.callback_query(F.data == "admin:stats")
-async def callback_admin_stats(callback: CallbackQuery):
-    """Статистика"""
-    from bot.database.db import async_session
-    from sqlalchemy import select, func
-    from bot.database.models import User, Purchase, Bot
-    from datetime import datetime, timedelta
-
-    async with async_session() as session:
-        # Кол-во пользователей
-        users_count = await session.scalar(select(func.count(User.id)))
-
-        # Покупки за всё время
-        purchases_all = await session.execute(select(Purchase))
-        purchases_list = list(purchases_all.scalars().all())
-
-        # Продажи за сегодня
-        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        purchases_today = await session.execute(
-            select(Purchase).where(Purchase.paid_at >= today)
-        )
-        purchases_today_list = list(purchases_today.scalars().all())
+def _format_revenue(revenue: dict[str, float]) -> str:
+    """Выручка по валютам одной строкой"""
+    if not revenue:
+        return "0.00 USDT"
+    return ", ".join(f"{amount:.2f} {currency}" for currency, amount in sorted(revenue.items()))
 
-        # Считаем сумму продаж
-        total_revenue = 0.0
-        for p in purchases_list:
-            await session.refresh(p, ["bot"])
-            if p.bot:
-                total_revenue += p.bot.price
 
-        today_revenue = 0.0
-        for p in purchases_today_list:
-            await session.refresh(p, ["bot"])
-            if p.bot:
-                today_revenue += p.bot.price
+@router.callback_query(AdminCb.filter(F.action == "stats"))
+async def callback_admin_stats(callback: CallbackQuery):
+    """Статистика"""
+    stats = await get_shop_stats()
 
     text = (
         "📊 <b>Статистика магазина</b>\n\n"
-        f"👥 Пользователей: {users_count}\n\n"
+        f"👥 Пользователей: {stats['users_count']}\n\n"
         f"<b>Продажи за всё время:</b>\n"
-        f"📦 Заказов: {len(purchases_list)}\n"
-        f"💵 Сумма: {total_revenue:.2f} USDT\n\n"
+        f"📦 Заказов: {stats['orders_all']}\n"
+        f"💵 Сумма: {_format_revenue(stats['revenue_all'])}\n\n"
         f"<b>Продажи за сегодня:</b>\n"
-        f"📦 Заказов: {len(purchases_today_list)}\n"
-        f"💵 Сумма: {today_revenue:.2f} USDT"
+        f"📦 Заказов: {stats['orders_today']}\n"
+        f"💵 Сумма: {_format_revenue(stats['revenue_today'])}"
     )
 
-    await callback.message.edit_text(text, reply_markup=back_kb("admin"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=back_kb(AdminMenuCb()), parse_mode="HTML")
+    await callback.answer()
+
+
+# ============ ЗАПРОСЫ К БД ============
+
+@router.message(Command("dbstats"))
+async def cmd_dbstats(message: Message, command: CommandObject):
+    """Сводка замеров SQL: /dbstats — показать, /dbstats reset — сбросить"""
+    if (command.args or "").strip() == "reset":
+        query_stats.reset()
+        await message.answer("🗄 Статистика запросов сброшена")
+        return
+
+    handlers = query_stats.top_handlers(8)
+    if not handlers:
+        await message.answer("🗄 Запросов пока не было (или DB_QUERY_STATS выключен)")
+        return
+
+    since = datetime.fromtimestamp(query_stats.started_at).strftime("%d.%m %H:%M")
+    text = f"🗄 <b>Запросы к БД</b> с {since}\n\n<b>Хендлеры</b> (время в БД · запросов · p95):\n"
+    for name, stats in handlers:
+        text += f"• {html.quote(name)} — {stats.total_ms:.0f} мс · {stats.count} · ≤{stats.percentile(0.95):g} мс\n"
+
+    text += "\n<b>Запросы</b> (всего · раз · avg · p95 · строк/раз):\n"
+    for shape, stats in query_stats.top_statements(8):
+        text += (
+            f"• {stats.total_ms:.0f} мс · {stats.count}× · {stats.avg_ms:.2f} · "
+            f"≤{stats.percentile(0.95):g} мс · {stats.rows / stats.count:.1f}\n"
+            f"<code>{html.quote(short_shape(shape))}</code>\n"
+        )
+
+    await message.answer(text, parse_mode="HTML")
+
+
+# ============ ЭКСПОРТ ============
+
+async def _send_export(message: Message, table: str):
+    """Выгрузить таблицу в CSV и отправить документом"""
+    path, count = await export_service.export_csv(table)
+    try:
+        await message.answer_document(
+            FSInputFile(path, filename=f"{table}.csv"),
+            caption=f"📤 {table}: {count} строк"
+        )
+    finally:
+        os.remove(path)
+
+
+@router.callback_query(AdminCb.filter(F.action == "export"))
+async def callback_admin_export(callback: CallbackQuery):
+    """Выбор таблицы для экспорта"""
+    text = "📤 <b>Экспорт в CSV</b>\n\nВыберите таблицу:"
+
+    await callback.message.edit_text(text, reply_markup=admin_export_kb(), parse_mode="HTML")
     await callback.answer()
 
 
+@router.callback_query(AdminExportCb.filter())
+async def callback_admin_export_table(callback: CallbackQuery, callback_data: AdminExportCb):
+    """Экспорт выбранной таблицы"""
+    table = callback_data.table
+    if table not in EXPORT_TABLES:
+        await callback.answer("Неизвестная таблица", show_alert=True)
+        return
+
+    await callback.answer("⏳ Готовлю файл...")
+    await _send_export(callback.message, table)
+
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, command: CommandObject):
+    """Команда /export <purchases|deposits|payments|users>"""
+    table = (command.args or "").strip()
+    if table not in EXPORT_TABLES:
+        await message.answer(f"Использование: /export {'|'.join(EXPORT_TABLES)}")
+        return
+
+    await _send_export(message, table)
+
+
 # ============ СЕССИИ ============
 
-@router.callback_query(F.data == "admin:sessions")
-async def callback_admin_sessions(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(AdminCb.filter(F.action == "sessions"))
+async def callback_admin_sessions(callback: CallbackQuery, state: FSMContext, db_session: AsyncSession):
     """Список сессий"""
     await state.clear()
-    sessions = await get_all_sessions()
+    sessions = await get_all_sessions(session=db_session)
 
     text = "📱 <b>Telegram сессии</b>\n\nСессии используются для управления ботами через BotFather."
 
@@ -164,21 +229,22 @@ async def callback_admin_sessions(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin:session:"))
-async def callback_session_detail(callback: CallbackQuery):
+@router.callback_query(AdminItemCb.filter(F.action == "session"))
+async def callback_session_detail(callback: CallbackQuery, callback_data: AdminItemCb, db_session: AsyncSession):
     """Детали сессии"""
-    session_id = int(callback.data.split(":")[2])
-    session = await get_session(session_id)
+    session_id = callback_data.id
+    session = await get_session(session_id, session=db_session)
 
     if not session:
         await callback.answer("Сессия не найдена", show_alert=True)
         return
 
-    # Проверяем активность
-    client = await session_manager.load_session(session.session_file)
-    status = "✅ Активна" if client else "❌ Неактивна"
-    if client:
-        await client.disconnect()
+    # Проверяем активность (под локом — файлом сессии может пользоваться другой воркер)
+    async with session_manager.get_lock(session.session_file):
+        client = await session_manager.load_session(session.session_file)
+        status = "✅ Активна" if client else "❌ Неактивна"
+        if client:
+            await client.disconnect()
 
     text = (
         f"📱 <b>Сессия</b>\n\n"
@@ -191,22 +257,22 @@ async def callback_session_detail(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin:delete_session:"))
-async def callback_delete_session(callback: CallbackQuery):
+@router.callback_query(AdminItemCb.filter(F.action == "delete_session"))
+async def callback_delete_session(callback: CallbackQuery, callback_data: AdminItemCb, db_session: AsyncSession):
     """Удаление сессии"""
-    session_id = int(callback.data.split(":")[2])
-    await delete_session(session_id)
+    session_id = callback_data.id
+    await delete_session(session_id, session=db_session)
     await callback.answer("✅ Сессия удалена", show_alert=True)
 
     # Возврат к списку
-    sessions = await get_all_sessions()
+    sessions = await get_all_sessions(session=db_session)
     text = "📱 <b>Telegram сессии</b>"
     await callback.message.edit_text(text, reply_markup=admin_sessions_kb(sessions), parse_mode="HTML")
 
 
 # ============ ДОБАВЛЕНИЕ СЕССИИ ============
 
-@router.callback_query(F.data == "admin:add_session")
+@router.callback_query(AdminCb.filter(F.action == "add_session"))
 async def callback_add_session(callback: CallbackQuery, state: FSMContext):
     """Начать добавление сессии"""
     await state.set_state(AddSession.phone)
@@ -217,7 +283,7 @@ async def callback_add_session(callback: CallbackQuery, state: FSMContext):
         "Например: +79001234567"
     )
 
-    await callback.message.edit_text(text, reply_markup=cancel_kb("admin:sessions"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=cancel_kb(AdminCb(action="sessions")), parse_mode="HTML")
     await callback.answer()
 
 
@@ -238,15 +304,15 @@ async def process_session_phone(message: Message, state: FSMContext):
 
         await message.answer(
             f"✅ Код отправлен на {phone}\n\nВведите код из Telegram:",
-            reply_markup=cancel_kb("admin:sessions")
+            reply_markup=cancel_kb(AdminCb(action="sessions"))
         )
     except Exception as e:
-        await message.answer(f"❌ Ошибка: {e}", reply_markup=back_kb("admin:sessions"))
+        await message.answer(f"❌ Ошибка: {e}", reply_markup=back_kb(AdminCb(action="sessions")))
         await state.clear()
 
 
 @router.message(AddSession.code)
-async def process_session_code(message: Message, state: FSMContext):
+async def process_session_code(message: Message, state: FSMContext, db_session: AsyncSession):
     """Получение кода подтверждения"""
     code = message.text.strip().replace(" ", "").replace("-", "")
     data = await state.get_data()
@@ -260,26 +326,26 @@ async def process_session_code(message: Message, state: FSMContext):
         await state.set_state(AddSession.password)
         await message.answer(
             "🔐 Требуется пароль двухфакторной аутентификации.\n\nВведите пароль:",
-            reply_markup=cancel_kb("admin:sessions")
+            reply_markup=cancel_kb(AdminCb(action="sessions"))
         )
         return
 
     if success:
         # Сохраняем в БД
-        await add_session(phone, result)
+        await add_session(phone, result, session=db_session)
         await message.answer(
             f"✅ Сессия успешно добавлена!\n\nФайл: <code>{result}</code>",
-            reply_markup=back_kb("admin:sessions"),
+            reply_markup=back_kb(AdminCb(action="sessions")),
             parse_mode="HTML"
         )
         await state.clear()
     else:
-        await message.answer(f"❌ Ошибка: {result}", reply_markup=back_kb("admin:sessions"))
+        await message.answer(f"❌ Ошибка: {result}", reply_markup=back_kb(AdminCb(action="sessions")))
         await state.clear()
 
 
 @router.message(AddSession.password)
-async def process_session_password(message: Message, state: FSMContext):
+async def process_session_password(message: Message, state: FSMContext, db_session: AsyncSession):
     """Получение пароля 2FA"""
     password = message.text.strip()
     data = await state.get_data()
@@ -288,25 +354,25 @@ async def process_session_password(message: Message, state: FSMContext):
     success, result = await session_manager.sign_in_2fa(phone, password)
 
     if success:
-        await add_session(phone, result)
+        await add_session(phone, result, session=db_session)
         await message.answer(
             f"✅ Сессия успешно добавлена!\n\nФайл: <code>{result}</code>",
-            reply_markup=back_kb("admin:sessions"),
+            reply_markup=back_kb(AdminCb(action="sessions")),
             parse_mode="HTML"
         )
     else:
-        await message.answer(f"❌ Ошибка: {result}", reply_markup=back_kb("admin:sessions"))
+        await message.answer(f"❌ Ошибка: {result}", reply_markup=back_kb(AdminCb(action="sessions")))
 
     await state.clear()
 
 
 # ============ БОТЫ ============
 
-@router.callback_query(F.data == "admin:all_bots")
-async def callback_admin_bots(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(AdminCb.filter(F.action == "all_bots"))
+async def callback_admin_bots(callback: CallbackQuery, state: FSMContext, db_session: AsyncSession):
     """Все боты"""
     await state.clear()
-    bots = await get_all_bots()
+    bots = await get_all_bots(session=db_session)
 
     text = "🤖 <b>Все боты</b>\n\n✅ — доступен, 💰 — продан"
 
@@ -314,11 +380,11 @@ async def callback_admin_bots(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin:bot:"))
-async def callback_admin_bot_detail(callback: CallbackQuery):
+@router.callback_query(AdminItemCb.filter(F.action == "bot"))
+async def callback_admin_bot_detail(callback: CallbackQuery, callback_data: AdminItemCb, db_session: AsyncSession):
     """Детали бота (админ)"""
-    bot_id = int(callback.data.split(":")[2])
-    bot = await get_bot(bot_id)
+    bot_id = callback_data.id
+    bot = await get_bot(bot_id, session=db_session)
 
     if not bot:
         await callback.answer("Бот не найден", show_alert=True)
@@ -340,21 +406,21 @@ async def callback_admin_bot_detail(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("admin:delete_bot:"))
-async def callback_admin_delete_bot(callback: CallbackQuery):
+@router.callback_query(AdminItemCb.filter(F.action == "delete_bot"))
+async def callback_admin_delete_bot(callback: CallbackQuery, callback_data: AdminItemCb, db_session: AsyncSession):
     """Удаление бота"""
-    bot_id = int(callback.data.split(":")[2])
-    await delete_bot(bot_id)
+    bot_id = callback_data.id
+    await delete_bot(bot_id, session=db_session)
     await callback.answer("✅ Бот удалён", show_alert=True)
 
-    bots = await get_all_bots()
+    bots = await get_all_bots(session=db_session)
     text = "🤖 <b>Все боты</b>"
     await callback.message.edit_text(text, reply_markup=admin_all_bots_kb(bots), parse_mode="HTML")
 
 
 # ============ ДОБАВЛЕНИЕ БОТА ============
 
-@router.callback_query(F.data == "admin:add_bot")
+@router.callback_query(AdminCb.filter(F.action == "add_bot"))
 async def callback_add_bot(callback: CallbackQuery, state: FSMContext):
     """Начать добавление бота"""
     await state.set_state(AddBot.username)
@@ -365,7 +431,7 @@ async def callback_add_bot(callback: CallbackQuery, state: FSMContext):
         "Например: my_cool_bot"
     )
 
-    await callback.message.edit_text(text, reply_markup=cancel_kb("admin"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=cancel_kb(AdminMenuCb()), parse_mode="HTML")
     await callback.answer()
 
 
@@ -378,7 +444,7 @@ async def process_bot_username(message: Message, state: FSMContext):
 
     await message.answer(
         "🔑 Введите токен бота:",
-        reply_markup=cancel_kb("admin")
+        reply_markup=cancel_kb(AdminMenuCb())
     )
 
 
@@ -397,7 +463,7 @@ async def process_bot_token(message: Message, state: FSMContext):
 
     await message.answer(
         "📝 Введите название бота (для каталога):",
-        reply_markup=cancel_kb("admin")
+        reply_markup=cancel_kb(AdminMenuCb())
     )
 
 
@@ -410,12 +476,12 @@ async def process_bot_name(message: Message, state: FSMContext):
 
     await message.answer(
         "💰 Введите цену в USDT:",
-        reply_markup=cancel_kb("admin")
+        reply_markup=cancel_kb(AdminMenuCb())
     )
 
 
 @router.message(AddBot.price)
-async def process_bot_price(message: Message, state: FSMContext):
+async def process_bot_price(message: Message, state: FSMContext, db_session: AsyncSession):
     """Цена бота"""
     try:
         price = float(message.text.strip().replace(",", "."))
@@ -427,22 +493,23 @@ async def process_bot_price(message: Message, state: FSMContext):
     await state.set_state(AddBot.session)
 
     # Показываем выбор сессии
-    sessions = await get_all_sessions()
+    sessions = await get_all_sessions(session=db_session)
 
     if sessions:
         text = "📱 Выберите сессию для управления ботом:"
         kb = select_session_kb(sessions)
     else:
         text = "⚠️ Нет доступных сессий. Сначала добавьте сессию.\n\nБот будет добавлен без привязки к сессии."
-        kb = confirm_kb("admin:save_bot_no_session", "admin")
+        kb = confirm_kb(AdminCb(action="save_bot_no_session"), AdminMenuCb())
 
     await message.answer(text, reply_markup=kb)
 
 
-@router.callback_query(F.data.startswith("admin:select_session:"))
-async def callback_select_session_for_bot(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(AdminItemCb.filter(F.action == "select_session"))
+async def callback_select_session_for_bot(callback: CallbackQuery, callback_data: AdminItemCb, state: FSMContext,
+                                          db_session: AsyncSession):
     """Выбор сессии для бота"""
-    session_id = int(callback.data.split(":")[2])
+    session_id = callback_data.id
     data = await state.get_data()
 
     # Сохраняем бота
@@ -451,7 +518,8 @@ async def callback_select_session_for_bot(callback: CallbackQuery, state: FSMCon
         token=data["token"],
         name=data["name"],
         price=data["price"],
-        session_id=session_id
+        session_id=session_id,
+        session=db_session
     )
 
     await state.clear()
@@ -463,12 +531,12 @@ async def callback_select_session_for_bot(callback: CallbackQuery, state: FSMCon
         f"Сессия: #{session_id}"
     )
 
-    await callback.message.edit_text(text, reply_markup=back_kb("admin:all_bots"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=back_kb(AdminCb(action="all_bots")), parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data == "admin:save_bot_no_session")
-async def callback_save_bot_no_session(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(AdminCb.filter(F.action == "save_bot_no_session"))
+async def callback_save_bot_no_session(callback: CallbackQuery, state: FSMContext, db_session: AsyncSession):
     """Сохранить бота без сессии"""
     data = await state.get_data()
 
@@ -476,7 +544,8 @@ async def callback_save_bot_no_session(callback: CallbackQuery, state: FSMContex
         username=data["username"],
         token=data["token"],
         name=data["name"],
-        price=data["price"]
+        price=data["price"],
+        session=db_session
     )
 
     await state.clear()
@@ -488,11 +557,72 @@ async def callback_save_bot_no_session(callback: CallbackQuery, state: FSMContex
         f"⚠️ Сессия не привязана"
     )
 
-    await callback.message.edit_text(text, reply_markup=back_kb("admin:all_bots"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=back_kb(AdminCb(action="all_bots")), parse_mode="HTML")
     await callback.answer()
+
+
+# ============ ИМПОРТ БОТОВ ============
+
+@router.callback_query(AdminCb.filter(F.action == "import_bots"))
+async def callback_import_bots(callback: CallbackQuery, state: FSMContext):
+    """Начать импорт ботов из файла"""
+    await state.set_state(ImportBots.file)
+
+    text = (
+        "📥 <b>Импорт ботов</b>\n\n"
+        "Отправьте CSV или JSON файл.\n\n"
+        "<b>CSV:</b> заголовок <code>username,token,name,price</code>\n"
+        "и необязательные <code>currency,description,session_id</code>\n\n"
+        "<b>JSON:</b> список объектов с теми же полями"
+    )
+
+    await callback.message.edit_text(text, reply_markup=cancel_kb(AdminMenuCb()), parse_mode="HTML")
+    await callback.answer()
+
+
+@router.message(ImportBots.file, F.document)
+async def process_import_file(message: Message, state: FSMContext, db_session: AsyncSession):
+    """Получение файла с ботами"""
+    document = message.document
+    if not document.file_name.lower().endswith((".csv", ".json")):
+        await message.answer("❌ Нужен файл .csv или .json", reply_markup=cancel_kb(AdminMenuCb()))
+        return
+
+    await message.answer("⏳ Импортирую...")
+
+    content = await message.bot.download(document)
+    report = await bot_import_service.import_file(document.file_name, content.read(), session=db_session)
+
+    await state.clear()
+
+    text = (
+        f"✅ <b>Импорт завершён</b>\n\n"
+        f"📄 Строк в файле: {report.total}\n"
+        f"🤖 Добавлено: {report.added}\n"
+        f"❌ Ошибок: {len(report.errors)}"
+    )
+
+    if report.errors:
+        lines = [f"строка {line}: {reason}" if line else reason for line, reason in report.errors]
+        text += "\n\n" + html.quote("\n".join(lines[:20]))
+        if len(lines) > 20:
+            text += f"\n... и ещё {len(lines) - 20} (полный отчёт в файле)"
+            await message.answer_document(
+                BufferedInputFile("\n".join(lines).encode(), filename="import_errors.txt")
+            )
+
+    await message.answer(text, reply_markup=back_kb(AdminCb(action="all_bots")), parse_mode="HTML")
+
+
+@router.message(ImportBots.file)
+async def process_import_invalid(message: Message):
+    """Ожидали файл"""
+    await message.answer("❌ Отправьте файл .csv или .json", reply_markup=cancel_kb(AdminMenuCb()))
+
+
 # ============ НАЧИСЛЕНИЕ БАЛАНСА ============
 
-@router.callback_query(F.data == "admin:add_balance")
+@router.callback_query(AdminCb.filter(F.action == "add_balance"))
 async def callback_add_balance(callback: CallbackQuery, state: FSMContext):
     """Начать начисление баланса"""
     await state.set_state(AddBalance.user_id)
@@ -503,12 +633,12 @@ async def callback_add_balance(callback: CallbackQuery, state: FSMContext):
         "(можно узнать у @userinfobot)"
     )
 
-    await callback.message.edit_text(text, reply_markup=cancel_kb("admin"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=cancel_kb(AdminMenuCb()), parse_mode="HTML")
     await callback.answer()
 
 
 @router.message(AddBalance.user_id)
-async def process_balance_user_id(message: Message, state: FSMContext):
+async def process_balance_user_id(message: Message, state: FSMContext, db_session: AsyncSession):
     """Получение ID пользователя"""
     try:
         user_id = int(message.text.strip())
@@ -516,17 +646,17 @@ async def process_balance_user_id(message: Message, state: FSMContext):
         await message.answer("❌ Введите корректный ID (число)")
         return
 
-    user = await get_user(user_id)
+    user = await get_user(user_id, session=db_session)
     if not user:
         await message.answer(
             f"❌ Пользователь с ID {user_id} не найден в базе.\n"
             "Он должен сначала написать /start боту.",
-            reply_markup=back_kb("admin")
+            reply_markup=back_kb(AdminMenuCb())
         )
         await state.clear()
         return
 
-    current_balance = await get_user_balance(user_id)
+    current_balance = await get_user_balance(user_id, session=db_session)
     await state.update_data(user_id=user_id, username=user.username, current_balance=current_balance)
     await state.set_state(AddBalance.amount)
 
@@ -539,11 +669,11 @@ async def process_balance_user_id(message: Message, state: FSMContext):
         "Введите сумму для начисления:"
     )
 
-    await message.answer(text, reply_markup=cancel_kb("admin"), parse_mode="HTML")
+    await message.answer(text, reply_markup=cancel_kb(AdminMenuCb()), parse_mode="HTML")
 
 
 @router.message(AddBalance.amount)
-async def process_balance_amount(message: Message, state: FSMContext):
+async def process_balance_amount(message: Message, state: FSMContext, db_session: AsyncSession):
     """Получение суммы"""
     try:
         amount = float(message.text.strip().replace(",", "."))
@@ -556,7 +686,7 @@ async def process_balance_amount(message: Message, state: FSMContext):
     username = data.get("username")
     old_balance = data["current_balance"]
 
-    user = await add_balance(user_id, amount)
+    user = await add_balance(user_id, amount, session=db_session)
     new_balance = user.balance if user else old_balance + amount
 
     await state.clear()
@@ -569,12 +699,12 @@ async def process_balance_amount(message: Message, state: FSMContext):
         f"📊 Стало: {new_balance:.2f} USDT"
     )
 
-    await message.answer(text, reply_markup=back_kb("admin"), parse_mode="HTML")
+    await message.answer(text, reply_markup=back_kb(AdminMenuCb()), parse_mode="HTML")
 
 
 # ============ РАССЫЛКА ============
 
-@router.callback_query(F.data == "admin:broadcast")
+@router.callback_query(AdminCb.filter(F.action == "broadcast"))
 async def callback_broadcast(callback: CallbackQuery, state: FSMContext):
     """Начать рассылку"""
     await state.set_state(Broadcast.message)
@@ -585,14 +715,16 @@ async def callback_broadcast(callback: CallbackQuery, state: FSMContext):
         "Поддерживается HTML разметка."
     )
 
-    await callback.message.edit_text(text, reply_markup=cancel_kb("admin"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=cancel_kb(AdminMenuCb()), parse_mode="HTML")
     await callback.answer()
 
 
 @router.message(Broadcast.message)
 async def process_broadcast_message(message: Message, state: FSMContext):
     """Получение текста рассылки"""
-    await state.update_data(message_text=message.text, message_entities=message.entities)
+    # Данные FSM должны сериализоваться в JSON (хранилище sql/redis) — сущности храним словарями
+    entities = [entity.model_dump(exclude_none=True) for entity in message.entities or []]
+    await state.update_data(message_text=message.text, message_entities=entities)
     await state.set_state(Broadcast.photo)
 
     text = (
@@ -626,7 +758,7 @@ async def process_broadcast_photo(message: Message, state: FSMContext):
     await message.answer(preview_text, reply_markup=broadcast_confirm_kb(), parse_mode="HTML")
 
 
-@router.callback_query(F.data == "broadcast:skip_photo", Broadcast.photo)
+@router.callback_query(BroadcastCb.filter(F.action == "skip_photo"), Broadcast.photo)
 async def callback_skip_photo(callback: CallbackQuery, state: FSMContext):
     """Пропустить добавление фото"""
     await state.update_data(photo_id=None)
@@ -649,7 +781,7 @@ async def callback_skip_photo(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data == "broadcast:start")
+@router.callback_query(BroadcastCb.filter(F.action == "start"))
 async def callback_start_broadcast(callback: CallbackQuery, state: FSMContext):
     """Запуск рассылки"""
     data = await state.get_data()
@@ -696,4 +828,4 @@ async def callback_start_broadcast(callback: CallbackQuery, state: FSMContext):
         f"❌ Не доставлено: {failed}"
     )
 
-    await callback.message.answer(result_text, reply_markup=back_kb("admin"), parse_mode="HTML")
+    await callback.message.answer(result_text, reply_markup=back_kb(AdminMenuCb()), parse_mode="HTML")
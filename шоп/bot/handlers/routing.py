@@ -0,0 +1,132 @@
+from typing import Any, Optional
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.filters.callback_data import CallbackQueryFilter
+from aiogram.types import CallbackQuery, TelegramObject
+
+ANY = None  # хендлер без фильтра по CallbackData — проверяется для любого префикса
+
+
+def callback_prefix(data: str | None) -> str:
+    """Ключ маршрутизации — часть callback_data до первого «:» (префикс CallbackData)"""
+    return (data or "").split(":", 1)[0]
+
+
+def handler_prefix(handler: HandlerObject) -> str | None:
+    """Префикс CallbackData из фильтров хендлера (SomeCb.filter()), иначе ANY"""
+    for filter_object in handler.filters or ():
+        if isinstance(filter_object.callback, CallbackQueryFilter):
+            return filter_object.callback.callback_data.__prefix__
+    return ANY
+
+
+class CallbackQueryObserver(TelegramEventObserver):
+    """
+    callback_query с индексом хендлеров по префиксу CallbackData.
+
+    Для нажатия проверяются только хендлеры его префикса и хендлеры без CallbackData,
+    в порядке регистрации — тот же результат, что у обычного перебора, но без
+    проверки фильтров всех остальных кнопок.
+    """
+
+    def __init__(self, router: Router, event_name: str = "callback_query"):
+        super().__init__(router=router, event_name=event_name)
+        self._index: dict[str, list[HandlerObject]] | None = None
+        self._any: list[HandlerObject] = []
+
+    def register(self, callback, *filters, flags=None, **kwargs):
+        result = super().register(callback, *filters, flags=flags, **kwargs)
+        self.reset_index()
+        self.router.reset_index()
+        return result
+
+    def _build_index(self) -> dict[str, list[HandlerObject]]:
+        keys = {handler_prefix(handler) for handler in self.handlers} - {ANY}
+        self._any = [handler for handler in self.handlers if handler_prefix(handler) is ANY]
+        return {
+            key: [handler for handler in self.handlers if handler_prefix(handler) in (key, ANY)]
+            for key in keys
+        }
+
+    def reset_index(self):
+        self._index = None
+
+    def prefixes(self) -> set[str | None]:
+        """Префиксы, которые могут обработать хендлеры этого роутера (ANY — любой)"""
+        if self._index is None:
+            self._index = self._build_index()
+        return set(self._index) | ({ANY} if self._any else set())
+
+    def candidates(self, prefix: str) -> list[HandlerObject]:
+        if self._index is None:
+            self._index = self._build_index()
+        return self._index.get(prefix, self._any)
+
+    async def trigger(self, event: TelegramObject, **kwargs: Any) -> Any:
+        # Тело TelegramEventObserver.trigger, но по кандидатам вместо всех хендлеров
+        handlers = self.candidates(callback_prefix(event.data)) if isinstance(event, CallbackQuery) else self.handlers
+        for handler in handlers:
+            kwargs["handler"] = handler
+            result, data = await handler.check(event, **kwargs)
+            if result:
+                kwargs.update(data)
+                try:
+                    wrapped_inner = self.outer_middleware.wrap_middlewares(
+                        self._resolve_middlewares(),
+                        handler.call,
+                    )
+                    return await wrapped_inner(event, kwargs)
+                except SkipHandler:
+                    continue
+
+        return UNHANDLED
+
+
+class CallbackRouter(Router):
+    """
+    Router, который не заходит в ветку дерева, где ни один хендлер не ждёт префикс нажатия.
+
+    Фильтры роутера (например, AdminFilter) и вложенные роутеры для чужих префиксов не
+    проверяются вовсе: нажатие «bot:5» проходит мимо админки одной проверкой по множеству.
+    Вложенные обычные Router считаются принимающими любой префикс: они не сообщают
+    о новых хендлерах, поэтому их ветка проверяется всегда.
+    """
+
+    def __init__(self, *, name: Optional[str] = None):
+        super().__init__(name=name)
+        self.callback_query = self.observers["callback_query"] = CallbackQueryObserver(router=self)
+        self._prefixes: set[str | None] | None = None
+
+    def reset_index(self):
+        """Сбросить кэш префиксов у себя и у всех роутеров выше (после регистрации хендлера)"""
+        for router in self.chain_head:
+            if isinstance(router, CallbackRouter):
+                router._prefixes = None
+
+    def include_router(self, router: Router) -> Router:
+        result = super().include_router(router)
+        self.reset_index()
+        return result
+
+    def prefixes(self) -> set[str | None]:
+        """Префиксы нажатий, которые может обработать эта ветка (ANY — любой)"""
+        if self._prefixes is None:
+            prefixes = set()
+            for router in self.chain_tail:
+                observer = router.callback_query
+                if isinstance(observer, CallbackQueryObserver):
+                    prefixes |= observer.prefixes()
+                else:
+                    prefixes.add(ANY)
+            self._prefixes = prefixes
+        return self._prefixes
+
+    async def propagate_event(self, update_type: str, event: TelegramObject, **kwargs: Any) -> Any:
+        if update_type == "callback_query":
+            prefixes = self.prefixes()
+            if ANY not in prefixes and callback_prefix(event.data) not in prefixes:
+                return UNHANDLED
+        return await super().propagate_event(update_type, event, **kwargs)
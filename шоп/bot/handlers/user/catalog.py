@@ -1,22 +1,29 @@
-from aiogram import Router, F
 from aiogram.types import CallbackQuery
-
-from bot.database import get_available_bots, get_bot, create_payment, get_payment_by_invoice, create_purchase, get_user_balance, add_balance
-from bot.keyboards import catalog_kb, bot_detail_kb, payment_kb, back_kb, payment_options_kb
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database import (
+    get_catalog_page, get_bot, create_payment, get_payment_by_invoice, create_purchase,
+    get_user_balance, checkout_with_balance, CheckoutStatus
+)
+from bot.handlers.routing import CallbackRouter
+from bot.keyboards import (
+    catalog_kb, bot_detail_kb, payment_kb, back_kb, payment_options_kb,
+    StartCb, CatalogCb, CatalogPageCb, BotCb, BuyCb, NotEnoughCb, PayBalanceCb, PayCryptoCb, CheckPaymentCb, MyBotsCb
+)
 from bot.services import cryptobot_service
 
-router = Router()
+router = CallbackRouter()
 
 
-@router.callback_query(F.data == "catalog")
-async def callback_catalog(callback: CallbackQuery):
+@router.callback_query(CatalogCb.filter())
+async def callback_catalog(callback: CallbackQuery, db_session: AsyncSession):
     """Каталог ботов"""
-    bots = await get_available_bots()
+    bots, has_next = await get_catalog_page(0, session=db_session)
 
     if not bots:
         await callback.message.edit_text(
             "😔 <b>Каталог пуст</b>\n\nПока нет доступных ботов для покупки.",
-            reply_markup=back_kb("start"),
+            reply_markup=back_kb(StartCb()),
             parse_mode="HTML"
         )
         await callback.answer()
@@ -24,27 +31,26 @@ async def callback_catalog(callback: CallbackQuery):
 
     text = "🛒 <b>Каталог ботов</b>\n\nВыберите бота для просмотра:"
 
-    await callback.message.edit_text(text, reply_markup=catalog_kb(bots), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=catalog_kb(bots, 0, has_next), parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("catalog:"))
-async def callback_catalog_page(callback: CallbackQuery):
+@router.callback_query(CatalogPageCb.filter())
+async def callback_catalog_page(callback: CallbackQuery, callback_data: CatalogPageCb, db_session: AsyncSession):
     """Пагинация каталога"""
-    page = int(callback.data.split(":")[1])
-    bots = await get_available_bots()
+    page = callback_data.page
+    bots, has_next = await get_catalog_page(page, session=db_session)
 
     text = "🛒 <b>Каталог ботов</b>\n\nВыберите бота для просмотра:"
 
-    await callback.message.edit_text(text, reply_markup=catalog_kb(bots, page), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=catalog_kb(bots, page, has_next), parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("bot:"))
-async def callback_bot_detail(callback: CallbackQuery):
+@router.callback_query(BotCb.filter())
+async def callback_bot_detail(callback: CallbackQuery, callback_data: BotCb, db_session: AsyncSession):
     """Детали бота"""
-    bot_id = int(callback.data.split(":")[1])
-    bot = await get_bot(bot_id)
+    bot = await get_bot(callback_data.bot_id, session=db_session)
 
     if not bot or bot.is_sold:
         await callback.answer("Бот уже продан или не найден", show_alert=True)
@@ -64,17 +70,17 @@ async def callback_bot_detail(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("buy:"))
-async def callback_buy_bot(callback: CallbackQuery):
+@router.callback_query(BuyCb.filter())
+async def callback_buy_bot(callback: CallbackQuery, callback_data: BuyCb, db_session: AsyncSession):
     """Покупка бота - выбор способа оплаты"""
-    bot_id = int(callback.data.split(":")[1])
-    bot = await get_bot(bot_id)
+    bot_id = callback_data.bot_id
+    bot = await get_bot(bot_id, session=db_session)
 
     if not bot or bot.is_sold:
         await callback.answer("Бот уже продан или не найден", show_alert=True)
         return
 
-    balance = await get_user_balance(callback.from_user.id)
+    balance = await get_user_balance(callback.from_user.id, session=db_session)
 
     text = (
         f"💳 <b>Оплата</b>\n\n"
@@ -91,37 +97,31 @@ async def callback_buy_bot(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data == "not_enough")
+@router.callback_query(NotEnoughCb.filter())
 async def callback_not_enough(callback: CallbackQuery):
     """Недостаточно средств"""
     await callback.answer("Недостаточно средств на балансе. Пополните баланс или оплатите через CryptoBot.", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("pay_balance:"))
-async def callback_pay_balance(callback: CallbackQuery):
+@router.callback_query(PayBalanceCb.filter())
+async def callback_pay_balance(callback: CallbackQuery, callback_data: PayBalanceCb, db_session: AsyncSession):
     """Оплата с баланса"""
-    bot_id = int(callback.data.split(":")[1])
-    bot = await get_bot(bot_id)
+    bot_id = callback_data.bot_id
 
-    if not bot or bot.is_sold:
+    # Бронь бота, списание и покупка — одна транзакция с условными UPDATE
+    result = await checkout_with_balance(callback.from_user.id, bot_id, session=db_session)
+
+    if result.status in (CheckoutStatus.NOT_FOUND, CheckoutStatus.SOLD):
         await callback.answer("Бот уже продан или не найден", show_alert=True)
         return
 
-    balance = await get_user_balance(callback.from_user.id)
-
-    if balance < bot.price:
+    if result.status is CheckoutStatus.INSUFFICIENT_FUNDS:
         await callback.answer("Недостаточно средств на балансе!", show_alert=True)
         return
 
-    # Списываем с баланса
-    await add_balance(callback.from_user.id, -bot.price)
-
-    # Создаём покупку
-    await create_purchase(
-        user_id=callback.from_user.id,
-        bot_id=bot_id,
-        invoice_id=f"balance_{callback.from_user.id}_{bot_id}"
-    )
+    bot = result.bot
+    # Фиксируем покупку до ответа в Telegram, чтобы не держать блокировку записи
+    await db_session.commit()
 
     text = (
         f"✅ <b>Оплата прошла успешно!</b>\n\n"
@@ -131,20 +131,23 @@ async def callback_pay_balance(callback: CallbackQuery):
         f"Теперь вы можете управлять им в разделе «Мои боты»"
     )
 
-    await callback.message.edit_text(text, reply_markup=back_kb("my_bots"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=back_kb(MyBotsCb()), parse_mode="HTML")
     await callback.answer("Оплата с баланса успешна!", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("pay_crypto:"))
-async def callback_pay_crypto(callback: CallbackQuery):
+@router.callback_query(PayCryptoCb.filter())
+async def callback_pay_crypto(callback: CallbackQuery, callback_data: PayCryptoCb, db_session: AsyncSession):
     """Оплата через CryptoBot"""
-    bot_id = int(callback.data.split(":")[1])
-    bot = await get_bot(bot_id)
+    bot_id = callback_data.bot_id
+    bot = await get_bot(bot_id, session=db_session)
 
     if not bot or bot.is_sold:
         await callback.answer("Бот уже продан или не найден", show_alert=True)
         return
 
+    # Возвращаем соединение в пул на время запроса к CryptoBot
+    await db_session.commit()
+
     # Создаём счёт в CryptoBot
     try:
         invoice = await cryptobot_service.create_invoice(
@@ -164,7 +167,8 @@ async def callback_pay_crypto(callback: CallbackQuery):
             bot_id=bot_id,
             invoice_id=invoice_id,
             amount=bot.price,
-            currency=bot.currency
+            currency=bot.currency,
+            session=db_session
         )
 
         text = (
@@ -185,14 +189,13 @@ async def callback_pay_crypto(callback: CallbackQuery):
         await callback.answer(f"Ошибка создания счёта: {e}", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("check_payment:"))
-async def callback_check_payment(callback: CallbackQuery):
+@router.callback_query(CheckPaymentCb.filter())
+async def callback_check_payment(callback: CallbackQuery, callback_data: CheckPaymentCb, db_session: AsyncSession):
     """Проверка оплаты"""
-    parts = callback.data.split(":")
-    bot_id = int(parts[1])
-    invoice_id = parts[2]
+    bot_id = callback_data.bot_id
+    invoice_id = callback_data.invoice_id
 
-    bot = await get_bot(bot_id)
+    bot = await get_bot(bot_id, session=db_session)
     if not bot:
         await callback.answer("Бот не найден", show_alert=True)
         return
@@ -201,17 +204,21 @@ async def callback_check_payment(callback: CallbackQuery):
         await callback.answer("Бот уже продан", show_alert=True)
         return
 
+    # Возвращаем соединение в пул на время запроса к CryptoBot
+    await db_session.commit()
+
     try:
         is_paid = await cryptobot_service.check_invoice_paid(int(invoice_id))
 
         if is_paid:
             # Создаём покупку
             from bot.database import update_payment_status
-            await update_payment_status(invoice_id, "paid")
+            await update_payment_status(invoice_id, "paid", session=db_session)
             await create_purchase(
                 user_id=callback.from_user.id,
                 bot_id=bot_id,
-                invoice_id=invoice_id
+                invoice_id=invoice_id,
+                session=db_session
             )
 
             text = (
@@ -221,7 +228,7 @@ async def callback_check_payment(callback: CallbackQuery):
                 f"Теперь вы можете управлять им в разделе «Мои боты»"
             )
 
-            await callback.message.edit_text(text, reply_markup=back_kb("my_bots"), parse_mode="HTML")
+            await callback.message.edit_text(text, reply_markup=back_kb(MyBotsCb()), parse_mode="HTML")
             await callback.answer("Оплата подтверждена!", show_alert=True)
         else:
             await callback.answer("Оплата ещё не получена. Попробуйте позже.", show_alert=True)
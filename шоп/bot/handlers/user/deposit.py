@@ -1,15 +1,20 @@
-from aiogram import Router, F
+from aiogram import F
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.database import (
     create_deposit, get_deposit_by_invoice, update_deposit_status, add_balance
 )
-from bot.keyboards import deposit_kb, deposit_amount_kb, check_deposit_kb, back_kb
+from bot.handlers.routing import CallbackRouter
+from bot.keyboards import (
+    deposit_kb, deposit_amount_kb, check_deposit_kb, back_kb,
+    ProfileCb, DepositCb, DepositMethodCb, DepositAmountCb, DepositCustomCb, CheckDepositCb
+)
 from bot.services.cryptobot import cryptobot_service
 
-router = Router()
+router = CallbackRouter()
 
 
 class DepositState(StatesGroup):
@@ -18,7 +23,7 @@ class DepositState(StatesGroup):
 
 # ============ ВЫБОР МЕТОДА ============
 
-@router.callback_query(F.data == "deposit")
+@router.callback_query(DepositCb.filter())
 async def callback_deposit(callback: CallbackQuery, state: FSMContext):
     """Выбор способа пополнения"""
     await state.clear()
@@ -34,7 +39,7 @@ async def callback_deposit(callback: CallbackQuery, state: FSMContext):
 
 # ============ CRYPTOBOT ============
 
-@router.callback_query(F.data == "deposit:cryptobot")
+@router.callback_query(DepositMethodCb.filter(F.method == "cryptobot"))
 async def callback_deposit_cryptobot(callback: CallbackQuery, state: FSMContext):
     """Пополнение через CryptoBot - выбор суммы"""
     await state.clear()
@@ -48,10 +53,10 @@ async def callback_deposit_cryptobot(callback: CallbackQuery, state: FSMContext)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("deposit_amount:cryptobot:"))
-async def callback_deposit_amount_cryptobot(callback: CallbackQuery):
+@router.callback_query(DepositAmountCb.filter(F.method == "cryptobot"))
+async def callback_deposit_amount_cryptobot(callback: CallbackQuery, callback_data: DepositAmountCb):
     """Создание счёта CryptoBot с выбранной суммой"""
-    amount = float(callback.data.split(":")[2])
+    amount = callback_data.amount
     user_id = callback.from_user.id
 
     await callback.message.edit_text("⏳ Создаю счёт...", parse_mode="HTML")
@@ -68,7 +73,8 @@ async def callback_deposit_amount_cryptobot(callback: CallbackQuery):
         invoice_id = str(invoice["invoice_id"])
         pay_url = cryptobot_service.get_invoice_url(invoice)
 
-        # Создаём запись о пополнении
+        # Создаём запись о пополнении — отдельно от сессии апдейта,
+        # чтобы при DB_WRITE_QUEUE она ушла в групповой коммит
         await create_deposit(
             user_id=user_id,
             amount=amount,
@@ -91,14 +97,14 @@ async def callback_deposit_amount_cryptobot(callback: CallbackQuery):
     except Exception as e:
         await callback.message.edit_text(
             f"❌ Ошибка создания счёта: {e}",
-            reply_markup=back_kb("deposit"),
+            reply_markup=back_kb(DepositCb()),
             parse_mode="HTML"
         )
 
     await callback.answer()
 
 
-@router.callback_query(F.data == "deposit_custom:cryptobot")
+@router.callback_query(DepositCustomCb.filter(F.method == "cryptobot"))
 async def callback_deposit_custom_cryptobot(callback: CallbackQuery, state: FSMContext):
     """Ввод своей суммы для CryptoBot"""
     await state.set_state(DepositState.amount)
@@ -110,14 +116,15 @@ async def callback_deposit_custom_cryptobot(callback: CallbackQuery, state: FSMC
         "Пример: 15.5"
     )
 
-    await callback.message.edit_text(text, reply_markup=back_kb("deposit:cryptobot"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=back_kb(DepositMethodCb(method="cryptobot")), parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("check_deposit:cryptobot:"))
-async def callback_check_deposit_cryptobot(callback: CallbackQuery):
+@router.callback_query(CheckDepositCb.filter(F.method == "cryptobot"))
+async def callback_check_deposit_cryptobot(callback: CallbackQuery, callback_data: CheckDepositCb,
+                                           db_session: AsyncSession):
     """Проверка оплаты CryptoBot"""
-    invoice_id = callback.data.split(":")[2]
+    invoice_id = callback_data.invoice_id
     user_id = callback.from_user.id
 
     try:
@@ -125,16 +132,16 @@ async def callback_check_deposit_cryptobot(callback: CallbackQuery):
 
         if is_paid:
             # Получаем депозит и начисляем баланс
-            deposit = await get_deposit_by_invoice(invoice_id)
+            deposit = await get_deposit_by_invoice(invoice_id, session=db_session)
             if deposit and deposit.status == "pending":
-                await update_deposit_status(invoice_id, "paid")
-                await add_balance(user_id, deposit.amount)
+                await update_deposit_status(invoice_id, "paid", session=db_session)
+                await add_balance(user_id, deposit.amount, session=db_session)
 
                 await callback.message.edit_text(
                     f"✅ <b>Оплата получена!</b>\n\n"
                     f"💵 Зачислено: <b>{deposit.amount} USDT</b>\n\n"
                     f"Баланс обновлён.",
-                    reply_markup=back_kb("profile"),
+                    reply_markup=back_kb(ProfileCb()),
                     parse_mode="HTML"
                 )
             else:
@@ -148,7 +155,7 @@ async def callback_check_deposit_cryptobot(callback: CallbackQuery):
 
 # ============ LOLZ ============
 
-@router.callback_query(F.data == "deposit:lolz")
+@router.callback_query(DepositMethodCb.filter(F.method == "lolz"))
 async def callback_deposit_lolz(callback: CallbackQuery, state: FSMContext):
     """Пополнение через Lolz - выбор суммы"""
     await state.clear()
@@ -162,10 +169,10 @@ async def callback_deposit_lolz(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("deposit_amount:lolz:"))
-async def callback_deposit_amount_lolz(callback: CallbackQuery):
+@router.callback_query(DepositAmountCb.filter(F.method == "lolz"))
+async def callback_deposit_amount_lolz(callback: CallbackQuery, callback_data: DepositAmountCb):
     """Создание ссылки для пополнения через Lolz"""
-    amount = float(callback.data.split(":")[2])
+    amount = callback_data.amount
     user_id = callback.from_user.id
 
     # Генерируем уникальный ID для платежа
@@ -204,7 +211,7 @@ async def callback_deposit_amount_lolz(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data == "deposit_custom:lolz")
+@router.callback_query(DepositCustomCb.filter(F.method == "lolz"))
 async def callback_deposit_custom_lolz(callback: CallbackQuery, state: FSMContext):
     """Ввод своей суммы для Lolz"""
     await state.set_state(DepositState.amount)
@@ -216,16 +223,17 @@ async def callback_deposit_custom_lolz(callback: CallbackQuery, state: FSMContex
         "Пример: 15.5"
     )
 
-    await callback.message.edit_text(text, reply_markup=back_kb("deposit:lolz"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=back_kb(DepositMethodCb(method="lolz")), parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("check_deposit:lolz:"))
-async def callback_check_deposit_lolz(callback: CallbackQuery):
+@router.callback_query(CheckDepositCb.filter(F.method == "lolz"))
+async def callback_check_deposit_lolz(callback: CallbackQuery, callback_data: CheckDepositCb,
+                                      db_session: AsyncSession):
     """Проверка оплаты Lolz (ручная проверка админом)"""
-    invoice_id = callback.data.split(":")[2]
+    invoice_id = callback_data.invoice_id
 
-    deposit = await get_deposit_by_invoice(invoice_id)
+    deposit = await get_deposit_by_invoice(invoice_id, session=db_session)
     if deposit and deposit.status == "pending":
         await callback.answer(
             "⏳ Ожидает подтверждения администратором.\n"
@@ -298,7 +306,7 @@ async def process_deposit_amount(message: Message, state: FSMContext):
         except Exception as e:
             await message.answer(
                 f"❌ Ошибка создания счёта: {e}",
-                reply_markup=back_kb("deposit"),
+                reply_markup=back_kb(DepositCb()),
                 parse_mode="HTML"
             )
     else:
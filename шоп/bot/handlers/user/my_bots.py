@@ -1,17 +1,20 @@
 import os
-from aiogram import Router, F, Bot
+from aiogram import F, Bot
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.database import get_user_bots, get_bot_with_session
+from bot.handlers.routing import CallbackRouter
 from bot.keyboards import (
     my_bots_kb, bot_manage_kb, bot_settings_kb, toggle_kb,
-    back_kb, skip_kb
+    back_kb, skip_kb,
+    StartCb, MyBotsCb, ManageCb, SettingsCb, ShowTokenCb, ToggleCb, DoToggleCb, ActionCb, ClearCb
 )
 from bot.services import botfather_service
 
-router = Router()
+router = CallbackRouter()
 
 
 class BotAction(StatesGroup):
@@ -21,17 +24,17 @@ class BotAction(StatesGroup):
 
 # ============ СПИСОК БОТОВ ============
 
-@router.callback_query(F.data == "my_bots")
-async def callback_my_bots(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(MyBotsCb.filter())
+async def callback_my_bots(callback: CallbackQuery, state: FSMContext, db_session: AsyncSession):
     """Мои боты"""
     await state.clear()
 
-    bots = await get_user_bots(callback.from_user.id)
+    bots = await get_user_bots(callback.from_user.id, session=db_session)
 
     if not bots:
         await callback.message.edit_text(
             "😔 <b>У вас нет ботов</b>\n\nПриобретите бота в каталоге!",
-            reply_markup=back_kb("start"),
+            reply_markup=back_kb(StartCb()),
             parse_mode="HTML"
         )
         await callback.answer()
@@ -45,13 +48,14 @@ async def callback_my_bots(callback: CallbackQuery, state: FSMContext):
 
 # ============ УПРАВЛЕНИЕ БОТОМ ============
 
-@router.callback_query(F.data.startswith("manage:"))
-async def callback_manage_bot(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(ManageCb.filter())
+async def callback_manage_bot(callback: CallbackQuery, callback_data: ManageCb, state: FSMContext,
+                              db_session: AsyncSession):
     """Меню управления ботом"""
     await state.clear()
 
-    bot_id = int(callback.data.split(":")[1])
-    bot = await get_bot_with_session(bot_id)
+    bot_id = callback_data.bot_id
+    bot = await get_bot_with_session(bot_id, session=db_session)
 
     if not bot:
         await callback.answer("Бот не найден", show_alert=True)
@@ -70,10 +74,10 @@ async def callback_manage_bot(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("settings:"))
-async def callback_bot_settings(callback: CallbackQuery):
+@router.callback_query(SettingsCb.filter())
+async def callback_bot_settings(callback: CallbackQuery, callback_data: SettingsCb):
     """Настройки бота"""
-    bot_id = int(callback.data.split(":")[1])
+    bot_id = callback_data.bot_id
 
     text = "⚙️ <b>Настройки бота</b>\n\nВыберите параметр:"
 
@@ -83,11 +87,11 @@ async def callback_bot_settings(callback: CallbackQuery):
 
 # ============ ПОКАЗАТЬ ТОКЕН ============
 
-@router.callback_query(F.data.startswith("show_token:"))
-async def callback_show_token(callback: CallbackQuery):
+@router.callback_query(ShowTokenCb.filter())
+async def callback_show_token(callback: CallbackQuery, callback_data: ShowTokenCb, db_session: AsyncSession):
     """Показать токен"""
-    bot_id = int(callback.data.split(":")[1])
-    bot = await get_bot_with_session(bot_id)
+    bot_id = callback_data.bot_id
+    bot = await get_bot_with_session(bot_id, session=db_session)
 
     if not bot:
         await callback.answer("Бот не найден", show_alert=True)
@@ -99,18 +103,17 @@ async def callback_show_token(callback: CallbackQuery):
         "⚠️ Не передавайте токен третьим лицам!"
     )
 
-    await callback.message.edit_text(text, reply_markup=back_kb(f"manage:{bot_id}"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=back_kb(ManageCb(bot_id=bot_id)), parse_mode="HTML")
     await callback.answer()
 
 
 # ============ TOGGLE ACTIONS ============
 
-@router.callback_query(F.data.startswith("toggle:"))
-async def callback_toggle(callback: CallbackQuery):
+@router.callback_query(ToggleCb.filter())
+async def callback_toggle(callback: CallbackQuery, callback_data: ToggleCb):
     """Переключатель настроек"""
-    parts = callback.data.split(":")
-    bot_id = int(parts[1])
-    action = parts[2]
+    bot_id = callback_data.bot_id
+    action = callback_data.action
 
     action_names = {
         "inline": "Inline Mode",
@@ -126,15 +129,14 @@ async def callback_toggle(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("do_toggle:"))
-async def callback_do_toggle(callback: CallbackQuery):
+@router.callback_query(DoToggleCb.filter())
+async def callback_do_toggle(callback: CallbackQuery, callback_data: DoToggleCb, db_session: AsyncSession):
     """Выполнить toggle"""
-    parts = callback.data.split(":")
-    bot_id = int(parts[1])
-    action = parts[2]
-    value = parts[3] == "on"
+    bot_id = callback_data.bot_id
+    action = callback_data.action
+    value = callback_data.value == "on"
 
-    bot = await get_bot_with_session(bot_id)
+    bot = await get_bot_with_session(bot_id, session=db_session)
     if not bot or not bot.session:
         await callback.answer("Сессия не подключена!", show_alert=True)
         return
@@ -158,19 +160,20 @@ async def callback_do_toggle(callback: CallbackQuery):
         await callback.answer("Действие не поддерживается", show_alert=True)
 
     # Возвращаемся к настройкам
-    await callback_bot_settings(callback)
+    await callback_bot_settings(callback, SettingsCb(bot_id=bot_id))
 
 
 # ============ TEXT/PHOTO ACTIONS ============
 
-@router.callback_query(F.data.startswith("action:"))
-async def callback_action(callback: CallbackQuery, state: FSMContext):
+# revoke: новый токен уже выдан BotFather — пишем его в БД до ответа в Telegram
+@router.callback_query(ActionCb.filter(), flags={"commit_before_api": True})
+async def callback_action(callback: CallbackQuery, callback_data: ActionCb, state: FSMContext,
+                          db_session: AsyncSession):
     """Действие требующее ввода"""
-    parts = callback.data.split(":")
-    bot_id = int(parts[1])
-    action = parts[2]
+    bot_id = callback_data.bot_id
+    action = callback_data.action
 
-    bot = await get_bot_with_session(bot_id)
+    bot = await get_bot_with_session(bot_id, session=db_session)
     if not bot:
         await callback.answer("Бот не найден", show_alert=True)
         return
@@ -203,22 +206,19 @@ async def callback_action(callback: CallbackQuery, state: FSMContext):
         success, new_token = await botfather_service.revoke_token(bot.session.session_file, bot.username)
 
         if success and ":" in new_token:
-            # Обновляем токен в БД
-            from bot.database.db import async_session
+            # Обновляем токен в БД (коммит — перед ответом в Telegram, флаг commit_before_api)
             from sqlalchemy import update
             from bot.database.models import Bot as BotModel
 
-            async with async_session() as session:
-                await session.execute(
-                    update(BotModel).where(BotModel.id == bot_id).values(token=new_token)
-                )
-                await session.commit()
+            await db_session.execute(
+                update(BotModel).where(BotModel.id == bot_id).values(token=new_token)
+            )
 
             text = f"✅ <b>Новый токен:</b>\n\n<code>{new_token}</code>"
         else:
             text = f"❌ Ошибка: {new_token}"
 
-        await callback.message.edit_text(text, reply_markup=back_kb(f"manage:{bot_id}"), parse_mode="HTML")
+        await callback.message.edit_text(text, reply_markup=back_kb(ManageCb(bot_id=bot_id)), parse_mode="HTML")
         return
 
     await state.set_state(BotAction.waiting_photo if action in photo_actions else BotAction.waiting_value)
@@ -232,14 +232,14 @@ async def callback_action(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("clear:"))
-async def callback_clear_action(callback: CallbackQuery, state: FSMContext):
+@router.callback_query(ClearCb.filter())
+async def callback_clear_action(callback: CallbackQuery, callback_data: ClearCb, state: FSMContext,
+                                db_session: AsyncSession):
     """Очистить значение"""
-    parts = callback.data.split(":")
-    bot_id = int(parts[1])
-    action = parts[2]
+    bot_id = callback_data.bot_id
+    action = callback_data.action
 
-    bot = await get_bot_with_session(bot_id)
+    bot = await get_bot_with_session(bot_id, session=db_session)
     if not bot or not bot.session:
         await callback.answer("Ошибка", show_alert=True)
         return
@@ -259,19 +259,19 @@ async def callback_clear_action(callback: CallbackQuery, state: FSMContext):
         await callback.answer(f"❌ Ошибка: {result}", show_alert=True)
 
     # Возвращаемся
-    await callback_manage_bot(callback, state)
+    await callback_manage_bot(callback, ManageCb(bot_id=bot_id), state, db_session)
 
 
 # ============ ОБРАБОТКА ВВОДА ============
 
 @router.message(BotAction.waiting_value)
-async def process_text_value(message: Message, state: FSMContext, bot: Bot):
+async def process_text_value(message: Message, state: FSMContext, bot: Bot, db_session: AsyncSession):
     """Обработка текстового значения"""
     data = await state.get_data()
     bot_id = data.get("bot_id")
     action = data.get("action")
 
-    db_bot = await get_bot_with_session(bot_id)
+    db_bot = await get_bot_with_session(bot_id, session=db_session)
     if not db_bot or not db_bot.session:
         await message.answer("❌ Ошибка: сессия не найдена")
         await state.clear()
@@ -291,17 +291,17 @@ async def process_text_value(message: Message, state: FSMContext, bot: Bot):
         text = f"❌ <b>Ошибка:</b> {result}"
 
     from bot.keyboards import back_kb
-    await message.answer(text, reply_markup=back_kb(f"manage:{bot_id}"), parse_mode="HTML")
+    await message.answer(text, reply_markup=back_kb(ManageCb(bot_id=bot_id)), parse_mode="HTML")
 
 
 @router.message(BotAction.waiting_photo, F.photo)
-async def process_photo_value(message: Message, state: FSMContext, bot: Bot):
+async def process_photo_value(message: Message, state: FSMContext, bot: Bot, db_session: AsyncSession):
     """Обработка фото"""
     data = await state.get_data()
     bot_id = data.get("bot_id")
     action = data.get("action")
 
-    db_bot = await get_bot_with_session(bot_id)
+    db_bot = await get_bot_with_session(bot_id, session=db_session)
     if not db_bot or not db_bot.session:
         await message.answer("❌ Ошибка: сессия не найдена")
         await state.clear()
@@ -333,7 +333,7 @@ async def process_photo_value(message: Message, state: FSMContext, bot: Bot):
     await state.clear()
 
     from bot.keyboards import back_kb
-    await message.answer(text, reply_markup=back_kb(f"manage:{bot_id}"), parse_mode="HTML")
+    await message.answer(text, reply_markup=back_kb(ManageCb(bot_id=bot_id)), parse_mode="HTML")
 
 
 @router.message(BotAction.waiting_photo)
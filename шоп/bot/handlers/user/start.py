@@ -1,25 +1,29 @@
-from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import CommandStart
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.config import config
-from bot.database import (
-    get_or_create_user, get_user_balance, get_user_purchases,
-    get_user_deposits, get_user_orders, get_user_total_orders
+from bot.database import upsert_user, get_user, get_user_deposits, get_user_orders
+from bot.handlers.routing import CallbackRouter
+from bot.keyboards import (
+    main_menu_kb, admin_menu_kb, back_kb, profile_kb,
+    StartCb, ProfileCb, DepositHistoryCb, OrderHistoryCb, FaqCb, SupportCb, AdminMenuCb
 )
-from bot.keyboards import main_menu_kb, admin_menu_kb, back_kb, profile_kb
 
-router = Router()
+router = CallbackRouter()
 
 
 @router.message(CommandStart())
-async def cmd_start(message: Message):
+async def cmd_start(message: Message, db_session: AsyncSession):
     """Стартовая команда"""
-    await get_or_create_user(
+    await upsert_user(
         user_id=message.from_user.id,
         username=message.from_user.username,
-        full_name=message.from_user.full_name
+        full_name=message.from_user.full_name,
+        session=db_session
     )
+    # Фиксируем до ответа в Telegram, чтобы не держать блокировку записи (другие воркеры ждут её)
+    await db_session.commit()
 
     text = (
         "🤖 <b>Магазин Telegram ботов</b>\n\n"
@@ -37,13 +41,13 @@ async def cmd_start(message: Message):
 
         builder = InlineKeyboardBuilder()
         builder.attach(InlineKeyboardBuilder.from_markup(kb))
-        builder.row(InlineKeyboardButton(text="⚙️ Админ-панель", callback_data="admin"))
+        builder.row(InlineKeyboardButton(text="⚙️ Админ-панель", callback_data=AdminMenuCb().pack()))
         kb = builder.as_markup()
 
     await message.answer(text, reply_markup=kb, parse_mode="HTML")
 
 
-@router.callback_query(F.data == "start")
+@router.callback_query(StartCb.filter())
 async def callback_start(callback: CallbackQuery):
     """Возврат в главное меню"""
     text = (
@@ -61,20 +65,21 @@ async def callback_start(callback: CallbackQuery):
 
         builder = InlineKeyboardBuilder()
         builder.attach(InlineKeyboardBuilder.from_markup(kb))
-        builder.row(InlineKeyboardButton(text="⚙️ Админ-панель", callback_data="admin"))
+        builder.row(InlineKeyboardButton(text="⚙️ Админ-панель", callback_data=AdminMenuCb().pack()))
         kb = builder.as_markup()
 
     await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data == "profile")
-async def callback_profile(callback: CallbackQuery):
+@router.callback_query(ProfileCb.filter())
+async def callback_profile(callback: CallbackQuery, db_session: AsyncSession):
     """Профиль пользователя"""
     user_id = callback.from_user.id
     username = callback.from_user.username or "не указан"
-    balance = await get_user_balance(user_id)
-    total_orders = await get_user_total_orders(user_id)
+    user = await get_user(user_id, session=db_session)
+    balance = user.balance if user else 0.0
+    total_orders = user.total_spent if user else 0.0
 
     text = (
         f"👤 <b>Ваш профиль</b>\n\n"
@@ -88,11 +93,11 @@ async def callback_profile(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data == "deposit_history")
-async def callback_deposit_history(callback: CallbackQuery):
+@router.callback_query(DepositHistoryCb.filter())
+async def callback_deposit_history(callback: CallbackQuery, db_session: AsyncSession):
     """История пополнений"""
     user_id = callback.from_user.id
-    deposits = await get_user_deposits(user_id, limit=10)
+    deposits = await get_user_deposits(user_id, limit=10, session=db_session)
 
     if not deposits:
         text = "📥 <b>История пополнений</b>\n\nУ вас пока нет пополнений."
@@ -103,15 +108,15 @@ async def callback_deposit_history(callback: CallbackQuery):
             method = "CryptoBot" if dep.method == "cryptobot" else "Lolz"
             text += f"• <b>{dep.amount:.2f} USDT</b> — {method}\n  {date}\n"
 
-    await callback.message.edit_text(text, reply_markup=back_kb("profile"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=back_kb(ProfileCb()), parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data == "order_history")
-async def callback_order_history(callback: CallbackQuery):
+@router.callback_query(OrderHistoryCb.filter())
+async def callback_order_history(callback: CallbackQuery, db_session: AsyncSession):
     """История заказов"""
     user_id = callback.from_user.id
-    orders = await get_user_orders(user_id, limit=10)
+    orders = await get_user_orders(user_id, limit=10, session=db_session)
 
     if not orders:
         text = "📦 <b>История заказов</b>\n\nУ вас пока нет заказов."
@@ -120,14 +125,13 @@ async def callback_order_history(callback: CallbackQuery):
         for order in orders:
             date = order.paid_at.strftime("%d.%m.%Y %H:%M")
             bot_name = f"@{order.bot.username}" if order.bot else "Удалён"
-            price = order.bot.price if order.bot else 0
-            text += f"• <b>{bot_name}</b> — {price:.2f} USDT\n  {date}\n"
+            text += f"• <b>{bot_name}</b> — {order.amount:.2f} {order.currency}\n  {date}\n"
 
-    await callback.message.edit_text(text, reply_markup=back_kb("profile"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=back_kb(ProfileCb()), parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data == "faq")
+@router.callback_query(FaqCb.filter())
 async def callback_faq(callback: CallbackQuery):
     """FAQ"""
     text = (
@@ -135,11 +139,11 @@ async def callback_faq(callback: CallbackQuery):
         "Текст будет добавлен позже..."
     )
 
-    await callback.message.edit_text(text, reply_markup=back_kb("start"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=back_kb(StartCb()), parse_mode="HTML")
     await callback.answer()
 
 
-@router.callback_query(F.data == "support")
+@router.callback_query(SupportCb.filter())
 async def callback_support(callback: CallbackQuery):
     """Поддержка"""
     text = (
@@ -147,5 +151,5 @@ async def callback_support(callback: CallbackQuery):
         "Текст будет добавлен позже..."
     )
 
-    await callback.message.edit_text(text, reply_markup=back_kb("start"), parse_mode="HTML")
+    await callback.message.edit_text(text, reply_markup=back_kb(StartCb()), parse_mode="HTML")
     await callback.answer()
@@ -1 +1,2 @@
 from bot.keyboards.inline import *
+from bot.keyboards.callbacks import *
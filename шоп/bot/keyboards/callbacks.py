@@ -0,0 +1,156 @@
+from typing import Literal
+
+from aiogram.filters.callback_data import CallbackData
+
+# Формат строк совпадает с прежним ручным ("bot:5", "admin:session:3"), чтобы кнопки
+# в уже отправленных сообщениях продолжали работать. Префикс — ключ маршрутизации
+# CallbackRouter, поэтому он у каждого класса — первая часть строки до «:».
+
+
+# ============ ГЛАВНОЕ МЕНЮ ============
+
+class StartCb(CallbackData, prefix="start"):
+    pass
+
+
+class ProfileCb(CallbackData, prefix="profile"):
+    pass
+
+
+class DepositHistoryCb(CallbackData, prefix="deposit_history"):
+    pass
+
+
+class OrderHistoryCb(CallbackData, prefix="order_history"):
+    pass
+
+
+class FaqCb(CallbackData, prefix="faq"):
+    pass
+
+
+class SupportCb(CallbackData, prefix="support"):
+    pass
+
+
+# ============ КАТАЛОГ ============
+
+class CatalogCb(CallbackData, prefix="catalog"):
+    pass
+
+
+class CatalogPageCb(CallbackData, prefix="catalog"):
+    page: int
+
+
+class BotCb(CallbackData, prefix="bot"):
+    bot_id: int
+
+
+class BuyCb(CallbackData, prefix="buy"):
+    bot_id: int
+
+
+class NotEnoughCb(CallbackData, prefix="not_enough"):
+    pass
+
+
+class PayBalanceCb(CallbackData, prefix="pay_balance"):
+    bot_id: int
+
+
+class PayCryptoCb(CallbackData, prefix="pay_crypto"):
+    bot_id: int
+
+
+class CheckPaymentCb(CallbackData, prefix="check_payment"):
+    bot_id: int
+    invoice_id: str
+
+
+# ============ МОИ БОТЫ ============
+
+class MyBotsCb(CallbackData, prefix="my_bots"):
+    pass
+
+
+class ManageCb(CallbackData, prefix="manage"):
+    bot_id: int
+
+
+class SettingsCb(CallbackData, prefix="settings"):
+    bot_id: int
+
+
+class ShowTokenCb(CallbackData, prefix="show_token"):
+    bot_id: int
+
+
+class ToggleCb(CallbackData, prefix="toggle"):
+    bot_id: int
+    action: str
+
+
+class DoToggleCb(CallbackData, prefix="do_toggle"):
+    bot_id: int
+    action: str
+    value: Literal["on", "off"]
+
+
+class ActionCb(CallbackData, prefix="action"):
+    bot_id: int
+    action: str
+
+
+class ClearCb(CallbackData, prefix="clear"):
+    bot_id: int
+    action: str
+
+
+# ============ ПОПОЛНЕНИЕ ============
+
+class DepositCb(CallbackData, prefix="deposit"):
+    pass
+
+
+class DepositMethodCb(CallbackData, prefix="deposit"):
+    method: str
+
+
+class DepositAmountCb(CallbackData, prefix="deposit_amount"):
+    method: str
+    amount: float
+
+
+class DepositCustomCb(CallbackData, prefix="deposit_custom"):
+    method: str
+
+
+class CheckDepositCb(CallbackData, prefix="check_deposit"):
+    method: str
+    invoice_id: str
+
+
+# ============ АДМИН ============
+
+class AdminMenuCb(CallbackData, prefix="admin"):
+    pass
+
+
+class AdminCb(CallbackData, prefix="admin"):
+    action: str
+
+
+class AdminItemCb(CallbackData, prefix="admin"):
+    """Действие с сессией или ботом по id"""
+    action: str
+    id: int
+
+
+class AdminExportCb(CallbackData, prefix="admin"):
+    action: Literal["export"] = "export"
+    table: str
+
+
+class BroadcastCb(CallbackData, prefix="broadcast"):
+    action: str
@@ -1,7 +1,20 @@
+from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from bot.database.cache import CatalogItem
 from bot.database.models import Bot, Session
+from bot.keyboards.callbacks import (
+    StartCb, ProfileCb, DepositHistoryCb, OrderHistoryCb, FaqCb, SupportCb,
+    CatalogCb, CatalogPageCb, BotCb, BuyCb, NotEnoughCb, PayBalanceCb, PayCryptoCb, CheckPaymentCb,
+    MyBotsCb, ManageCb, SettingsCb, ShowTokenCb, ToggleCb, DoToggleCb, ActionCb, ClearCb,
+    DepositCb, DepositMethodCb, DepositAmountCb, DepositCustomCb, CheckDepositCb,
+    AdminMenuCb, AdminCb, AdminItemCb, AdminExportCb, BroadcastCb
+)
+
+
+def _pack(callback_data: str | CallbackData) -> str:
+    return callback_data.pack() if isinstance(callback_data, CallbackData) else callback_data
 
 
 # ============ ГЛАВНОЕ МЕНЮ ============
@@ -10,17 +23,17 @@ def main_menu_kb() -> InlineKeyboardMarkup:
     """Главное меню пользователя"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="🛒 Товары", callback_data="catalog")
+        InlineKeyboardButton(text="🛒 Товары", callback_data=CatalogCb().pack())
     )
     builder.row(
-        InlineKeyboardButton(text="💳 Пополнение", callback_data="deposit")
+        InlineKeyboardButton(text="💳 Пополнение", callback_data=DepositCb().pack())
     )
     builder.row(
-        InlineKeyboardButton(text="❓ FAQ", callback_data="faq"),
-        InlineKeyboardButton(text="💬 Поддержка", callback_data="support")
+        InlineKeyboardButton(text="❓ FAQ", callback_data=FaqCb().pack()),
+        InlineKeyboardButton(text="💬 Поддержка", callback_data=SupportCb().pack())
     )
     builder.row(
-        InlineKeyboardButton(text="👤 Профиль", callback_data="profile")
+        InlineKeyboardButton(text="👤 Профиль", callback_data=ProfileCb().pack())
     )
     return builder.as_markup()
 
@@ -29,14 +42,14 @@ def profile_kb() -> InlineKeyboardMarkup:
     """Клавиатура профиля"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="💳 Пополнить баланс", callback_data="deposit")
+        InlineKeyboardButton(text="💳 Пополнить баланс", callback_data=DepositCb().pack())
     )
     builder.row(
-        InlineKeyboardButton(text="📥 История пополнений", callback_data="deposit_history"),
-        InlineKeyboardButton(text="📦 История заказов", callback_data="order_history")
+        InlineKeyboardButton(text="📥 История пополнений", callback_data=DepositHistoryCb().pack()),
+        InlineKeyboardButton(text="📦 История заказов", callback_data=OrderHistoryCb().pack())
     )
     builder.row(
-        InlineKeyboardButton(text="« Главное меню", callback_data="start")
+        InlineKeyboardButton(text="« Главное меню", callback_data=StartCb().pack())
     )
     return builder.as_markup()
 
@@ -45,13 +58,13 @@ def deposit_kb() -> InlineKeyboardMarkup:
     """Клавиатура выбора способа пополнения"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="🤖 CryptoBot", callback_data="deposit:cryptobot")
+        InlineKeyboardButton(text="🤖 CryptoBot", callback_data=DepositMethodCb(method="cryptobot").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="💎 Lolz", callback_data="deposit:lolz")
+        InlineKeyboardButton(text="💎 Lolz", callback_data=DepositMethodCb(method="lolz").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="start")
+        InlineKeyboardButton(text="« Назад", callback_data=StartCb().pack())
     )
     return builder.as_markup()
 
@@ -63,14 +76,14 @@ def deposit_amount_kb(method: str) -> InlineKeyboardMarkup:
     for i in range(0, len(amounts), 3):
         row = amounts[i:i+3]
         builder.row(*[
-            InlineKeyboardButton(text=f"💵 {amt} USDT", callback_data=f"deposit_amount:{method}:{amt}")
+            InlineKeyboardButton(text=f"💵 {amt} USDT", callback_data=DepositAmountCb(method=method, amount=amt).pack())
             for amt in row
         ])
     builder.row(
-        InlineKeyboardButton(text="✏️ Своя сумма", callback_data=f"deposit_custom:{method}")
+        InlineKeyboardButton(text="✏️ Своя сумма", callback_data=DepositCustomCb(method=method).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="deposit")
+        InlineKeyboardButton(text="« Назад", callback_data=DepositCb().pack())
     )
     return builder.as_markup()
 
@@ -83,10 +96,10 @@ def check_deposit_kb(method: str, invoice_id: str, pay_url: str = None) -> Inlin
             InlineKeyboardButton(text="💳 Оплатить", url=pay_url)
         )
     builder.row(
-        InlineKeyboardButton(text="🔄 Проверить оплату", callback_data=f"check_deposit:{method}:{invoice_id}")
+        InlineKeyboardButton(text="🔄 Проверить оплату", callback_data=CheckDepositCb(method=method, invoice_id=invoice_id).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="❌ Отмена", callback_data="deposit")
+        InlineKeyboardButton(text="❌ Отмена", callback_data=DepositCb().pack())
     )
     return builder.as_markup()
 
@@ -95,56 +108,54 @@ def admin_menu_kb() -> InlineKeyboardMarkup:
     """Меню администратора"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="➕ Добавить бота", callback_data="admin:add_bot")
+        InlineKeyboardButton(text="➕ Добавить бота", callback_data=AdminCb(action="add_bot").pack()),
+        InlineKeyboardButton(text="📥 Импорт ботов", callback_data=AdminCb(action="import_bots").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="📱 Сессии", callback_data="admin:sessions"),
-        InlineKeyboardButton(text="🤖 Все боты", callback_data="admin:all_bots")
+        InlineKeyboardButton(text="📱 Сессии", callback_data=AdminCb(action="sessions").pack()),
+        InlineKeyboardButton(text="🤖 Все боты", callback_data=AdminCb(action="all_bots").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="💰 Начислить баланс", callback_data="admin:add_balance")
+        InlineKeyboardButton(text="💰 Начислить баланс", callback_data=AdminCb(action="add_balance").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="📢 Рассылка", callback_data="admin:broadcast")
+        InlineKeyboardButton(text="📢 Рассылка", callback_data=AdminCb(action="broadcast").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="📊 Статистика", callback_data="admin:stats")
+        InlineKeyboardButton(text="📊 Статистика", callback_data=AdminCb(action="stats").pack()),
+        InlineKeyboardButton(text="📤 Экспорт", callback_data=AdminCb(action="export").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="start")
+        InlineKeyboardButton(text="« Назад", callback_data=StartCb().pack())
     )
     return builder.as_markup()
 
 
 # ============ КАТАЛОГ ============
 
-def catalog_kb(bots: list[Bot], page: int = 0, per_page: int = 5) -> InlineKeyboardMarkup:
-    """Каталог ботов с пагинацией"""
+def catalog_kb(bots: list[CatalogItem], page: int = 0, has_next: bool = False) -> InlineKeyboardMarkup:
+    """Страница каталога ботов (см. get_catalog_page)"""
     builder = InlineKeyboardBuilder()
 
-    start = page * per_page
-    end = start + per_page
-    page_bots = bots[start:end]
-
-    for bot in page_bots:
+    for bot in bots:
         builder.row(
             InlineKeyboardButton(
                 text=f"🤖 @{bot.username} — {bot.price} {bot.currency}",
-                callback_data=f"bot:{bot.id}"
+                callback_data=BotCb(bot_id=bot.id).pack()
             )
         )
 
     # Пагинация
     nav_buttons = []
     if page > 0:
-        nav_buttons.append(InlineKeyboardButton(text="◀️", callback_data=f"catalog:{page-1}"))
-    if end < len(bots):
-        nav_buttons.append(InlineKeyboardButton(text="▶️", callback_data=f"catalog:{page+1}"))
+        nav_buttons.append(InlineKeyboardButton(text="◀️", callback_data=CatalogPageCb(page=page - 1).pack()))
+    if has_next:
+        nav_buttons.append(InlineKeyboardButton(text="▶️", callback_data=CatalogPageCb(page=page + 1).pack()))
     if nav_buttons:
         builder.row(*nav_buttons)
 
     builder.row(
-        InlineKeyboardButton(text="« Главное меню", callback_data="start")
+        InlineKeyboardButton(text="« Главное меню", callback_data=StartCb().pack())
     )
 
     return builder.as_markup()
@@ -154,10 +165,10 @@ def bot_detail_kb(bot: Bot) -> InlineKeyboardMarkup:
     """Детали бота"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text=f"💳 Купить за {bot.price} {bot.currency}", callback_data=f"buy:{bot.id}")
+        InlineKeyboardButton(text=f"💳 Купить за {bot.price} {bot.currency}", callback_data=BuyCb(bot_id=bot.id).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="catalog")
+        InlineKeyboardButton(text="« Назад", callback_data=CatalogCb().pack())
     )
     return builder.as_markup()
 
@@ -169,10 +180,10 @@ def payment_kb(pay_url: str, bot_id: int, invoice_id: str) -> InlineKeyboardMark
         InlineKeyboardButton(text="💳 Оплатить", url=pay_url)
     )
     builder.row(
-        InlineKeyboardButton(text="🔄 Проверить оплату", callback_data=f"check_payment:{bot_id}:{invoice_id}")
+        InlineKeyboardButton(text="🔄 Проверить оплату", callback_data=CheckPaymentCb(bot_id=bot_id, invoice_id=invoice_id).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="❌ Отмена", callback_data="catalog")
+        InlineKeyboardButton(text="❌ Отмена", callback_data=CatalogCb().pack())
     )
     return builder.as_markup()
 
@@ -183,18 +194,18 @@ def payment_options_kb(bot_id: int, price: float, balance: float) -> InlineKeybo
 
     if balance >= price:
         builder.row(
-            InlineKeyboardButton(text=f"💰 Оплатить с баланса ({balance:.2f} USDT)", callback_data=f"pay_balance:{bot_id}")
+            InlineKeyboardButton(text=f"💰 Оплатить с баланса ({balance:.2f} USDT)", callback_data=PayBalanceCb(bot_id=bot_id).pack())
         )
     else:
         builder.row(
-            InlineKeyboardButton(text=f"💰 Баланс: {balance:.2f} USDT (недостаточно)", callback_data="not_enough")
+            InlineKeyboardButton(text=f"💰 Баланс: {balance:.2f} USDT (недостаточно)", callback_data=NotEnoughCb().pack())
         )
 
     builder.row(
-        InlineKeyboardButton(text="💳 Оплатить через CryptoBot", callback_data=f"pay_crypto:{bot_id}")
+        InlineKeyboardButton(text="💳 Оплатить через CryptoBot", callback_data=PayCryptoCb(bot_id=bot_id).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="❌ Отмена", callback_data="catalog")
+        InlineKeyboardButton(text="❌ Отмена", callback_data=CatalogCb().pack())
     )
     return builder.as_markup()
 
@@ -207,11 +218,11 @@ def my_bots_kb(bots: list[Bot]) -> InlineKeyboardMarkup:
 
     for bot in bots:
         builder.row(
-            InlineKeyboardButton(text=f"🤖 @{bot.username}", callback_data=f"manage:{bot.id}")
+            InlineKeyboardButton(text=f"🤖 @{bot.username}", callback_data=ManageCb(bot_id=bot.id).pack())
         )
 
     builder.row(
-        InlineKeyboardButton(text="« Главное меню", callback_data="start")
+        InlineKeyboardButton(text="« Главное меню", callback_data=StartCb().pack())
     )
     return builder.as_markup()
 
@@ -222,37 +233,37 @@ def bot_manage_kb(bot_id: int) -> InlineKeyboardMarkup:
 
     # Первый ряд
     builder.row(
-        InlineKeyboardButton(text="✏️ Имя", callback_data=f"action:{bot_id}:setname"),
-        InlineKeyboardButton(text="📝 About", callback_data=f"action:{bot_id}:setabouttext")
+        InlineKeyboardButton(text="✏️ Имя", callback_data=ActionCb(bot_id=bot_id, action="setname").pack()),
+        InlineKeyboardButton(text="📝 About", callback_data=ActionCb(bot_id=bot_id, action="setabouttext").pack())
     )
     # Второй ряд
     builder.row(
-        InlineKeyboardButton(text="📄 Описание", callback_data=f"action:{bot_id}:setdescription"),
-        InlineKeyboardButton(text="🖼 Фото описания", callback_data=f"action:{bot_id}:setdescriptionpic")
+        InlineKeyboardButton(text="📄 Описание", callback_data=ActionCb(bot_id=bot_id, action="setdescription").pack()),
+        InlineKeyboardButton(text="🖼 Фото описания", callback_data=ActionCb(bot_id=bot_id, action="setdescriptionpic").pack())
     )
     # Третий ряд
     builder.row(
-        InlineKeyboardButton(text="👤 Аватарка", callback_data=f"action:{bot_id}:setuserpic"),
-        InlineKeyboardButton(text="📋 Команды", callback_data=f"action:{bot_id}:setcommands")
+        InlineKeyboardButton(text="👤 Аватарка", callback_data=ActionCb(bot_id=bot_id, action="setuserpic").pack()),
+        InlineKeyboardButton(text="📋 Команды", callback_data=ActionCb(bot_id=bot_id, action="setcommands").pack())
     )
     # Четвёртый ряд
     builder.row(
-        InlineKeyboardButton(text="🔒 Privacy Policy", callback_data=f"action:{bot_id}:setprivacypolicy")
+        InlineKeyboardButton(text="🔒 Privacy Policy", callback_data=ActionCb(bot_id=bot_id, action="setprivacypolicy").pack())
     )
 
     # Настройки
     builder.row(
-        InlineKeyboardButton(text="⚙️ Настройки", callback_data=f"settings:{bot_id}")
+        InlineKeyboardButton(text="⚙️ Настройки", callback_data=SettingsCb(bot_id=bot_id).pack())
     )
 
     # Опасные действия
     builder.row(
-        InlineKeyboardButton(text="🔑 Показать токен", callback_data=f"show_token:{bot_id}"),
-        InlineKeyboardButton(text="🔄 Новый токен", callback_data=f"action:{bot_id}:revoke")
+        InlineKeyboardButton(text="🔑 Показать токен", callback_data=ShowTokenCb(bot_id=bot_id).pack()),
+        InlineKeyboardButton(text="🔄 Новый токен", callback_data=ActionCb(bot_id=bot_id, action="revoke").pack())
     )
 
     builder.row(
-        InlineKeyboardButton(text="« Мои боты", callback_data="my_bots")
+        InlineKeyboardButton(text="« Мои боты", callback_data=MyBotsCb().pack())
     )
 
     return builder.as_markup()
@@ -263,31 +274,31 @@ def bot_settings_kb(bot_id: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     builder.row(
-        InlineKeyboardButton(text="🔗 Inline Mode", callback_data=f"toggle:{bot_id}:inline"),
-        InlineKeyboardButton(text="💼 Business Mode", callback_data=f"toggle:{bot_id}:business")
+        InlineKeyboardButton(text="🔗 Inline Mode", callback_data=ToggleCb(bot_id=bot_id, action="inline").pack()),
+        InlineKeyboardButton(text="💼 Business Mode", callback_data=ToggleCb(bot_id=bot_id, action="business").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="👥 Allow Groups", callback_data=f"toggle:{bot_id}:groups"),
-        InlineKeyboardButton(text="🔐 Group Privacy", callback_data=f"toggle:{bot_id}:privacy")
+        InlineKeyboardButton(text="👥 Allow Groups", callback_data=ToggleCb(bot_id=bot_id, action="groups").pack()),
+        InlineKeyboardButton(text="🔐 Group Privacy", callback_data=ToggleCb(bot_id=bot_id, action="privacy").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="👑 Group Admin Rights", callback_data=f"action:{bot_id}:setgroupadminrights"),
-        InlineKeyboardButton(text="📢 Channel Admin Rights", callback_data=f"action:{bot_id}:setchanneladminrights")
+        InlineKeyboardButton(text="👑 Group Admin Rights", callback_data=ActionCb(bot_id=bot_id, action="setgroupadminrights").pack()),
+        InlineKeyboardButton(text="📢 Channel Admin Rights", callback_data=ActionCb(bot_id=bot_id, action="setchanneladminrights").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="💰 Payments", callback_data=f"action:{bot_id}:setpayments"),
-        InlineKeyboardButton(text="🌐 Domain", callback_data=f"action:{bot_id}:setdomain")
+        InlineKeyboardButton(text="💰 Payments", callback_data=ActionCb(bot_id=bot_id, action="setpayments").pack()),
+        InlineKeyboardButton(text="🌐 Domain", callback_data=ActionCb(bot_id=bot_id, action="setdomain").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="📱 Menu Button", callback_data=f"action:{bot_id}:setmenubutton"),
-        InlineKeyboardButton(text="🎮 Mini App", callback_data=f"action:{bot_id}:setminiapp")
+        InlineKeyboardButton(text="📱 Menu Button", callback_data=ActionCb(bot_id=bot_id, action="setmenubutton").pack()),
+        InlineKeyboardButton(text="🎮 Mini App", callback_data=ActionCb(bot_id=bot_id, action="setminiapp").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="📣 Paid Broadcast", callback_data=f"action:{bot_id}:paidbroadcast")
+        InlineKeyboardButton(text="📣 Paid Broadcast", callback_data=ActionCb(bot_id=bot_id, action="paidbroadcast").pack())
     )
 
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data=f"manage:{bot_id}")
+        InlineKeyboardButton(text="« Назад", callback_data=ManageCb(bot_id=bot_id).pack())
     )
 
     return builder.as_markup()
@@ -297,29 +308,29 @@ def toggle_kb(bot_id: int, action: str) -> InlineKeyboardMarkup:
     """Кнопки включения/выключения"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="✅ Включить", callback_data=f"do_toggle:{bot_id}:{action}:on"),
-        InlineKeyboardButton(text="❌ Выключить", callback_data=f"do_toggle:{bot_id}:{action}:off")
+        InlineKeyboardButton(text="✅ Включить", callback_data=DoToggleCb(bot_id=bot_id, action=action, value="on").pack()),
+        InlineKeyboardButton(text="❌ Выключить", callback_data=DoToggleCb(bot_id=bot_id, action=action, value="off").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data=f"settings:{bot_id}")
+        InlineKeyboardButton(text="« Назад", callback_data=SettingsCb(bot_id=bot_id).pack())
     )
     return builder.as_markup()
 
 
-def cancel_kb(callback_data: str = "start") -> InlineKeyboardMarkup:
+def cancel_kb(callback_data: str | CallbackData = StartCb()) -> InlineKeyboardMarkup:
     """Кнопка отмены"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="❌ Отмена", callback_data=callback_data)
+        InlineKeyboardButton(text="❌ Отмена", callback_data=_pack(callback_data))
     )
     return builder.as_markup()
 
 
-def back_kb(callback_data: str) -> InlineKeyboardMarkup:
+def back_kb(callback_data: str | CallbackData) -> InlineKeyboardMarkup:
     """Кнопка назад"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data=callback_data)
+        InlineKeyboardButton(text="« Назад", callback_data=_pack(callback_data))
     )
     return builder.as_markup()
 
@@ -328,10 +339,10 @@ def skip_kb(bot_id: int, action: str) -> InlineKeyboardMarkup:
     """Кнопка пропустить/очистить"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="🗑 Очистить", callback_data=f"clear:{bot_id}:{action}")
+        InlineKeyboardButton(text="🗑 Очистить", callback_data=ClearCb(bot_id=bot_id, action=action).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="« Отмена", callback_data=f"manage:{bot_id}")
+        InlineKeyboardButton(text="« Отмена", callback_data=ManageCb(bot_id=bot_id).pack())
     )
     return builder.as_markup()
 
@@ -343,19 +354,19 @@ def admin_sessions_kb(sessions: list[Session]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
     builder.row(
-        InlineKeyboardButton(text="➕ Добавить сессию", callback_data="admin:add_session")
+        InlineKeyboardButton(text="➕ Добавить сессию", callback_data=AdminCb(action="add_session").pack())
     )
 
     for session in sessions:
         builder.row(
             InlineKeyboardButton(
                 text=f"📱 {session.phone}",
-                callback_data=f"admin:session:{session.id}"
+                callback_data=AdminItemCb(action="session", id=session.id).pack()
             )
         )
 
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="admin")
+        InlineKeyboardButton(text="« Назад", callback_data=AdminMenuCb().pack())
     )
     return builder.as_markup()
 
@@ -364,10 +375,10 @@ def admin_session_detail_kb(session_id: int) -> InlineKeyboardMarkup:
     """Детали сессии"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="🗑 Удалить", callback_data=f"admin:delete_session:{session_id}")
+        InlineKeyboardButton(text="🗑 Удалить", callback_data=AdminItemCb(action="delete_session", id=session_id).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="admin:sessions")
+        InlineKeyboardButton(text="« Назад", callback_data=AdminCb(action="sessions").pack())
     )
     return builder.as_markup()
 
@@ -381,12 +392,29 @@ def admin_all_bots_kb(bots: list[Bot]) -> InlineKeyboardMarkup:
         builder.row(
             InlineKeyboardButton(
                 text=f"{status} @{bot.username} — {bot.price} {bot.currency}",
-                callback_data=f"admin:bot:{bot.id}"
+                callback_data=AdminItemCb(action="bot", id=bot.id).pack()
             )
         )
 
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="admin")
+        InlineKeyboardButton(text="« Назад", callback_data=AdminMenuCb().pack())
+    )
+    return builder.as_markup()
+
+
+def admin_export_kb() -> InlineKeyboardMarkup:
+    """Выбор таблицы для выгрузки в CSV"""
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="📦 Покупки", callback_data=AdminExportCb(table="purchases").pack()),
+        InlineKeyboardButton(text="📥 Пополнения", callback_data=AdminExportCb(table="deposits").pack())
+    )
+    builder.row(
+        InlineKeyboardButton(text="💳 Платежи", callback_data=AdminExportCb(table="payments").pack()),
+        InlineKeyboardButton(text="👥 Пользователи", callback_data=AdminExportCb(table="users").pack())
+    )
+    builder.row(
+        InlineKeyboardButton(text="« Назад", callback_data=AdminMenuCb().pack())
     )
     return builder.as_markup()
 
@@ -397,14 +425,14 @@ def admin_bot_detail_kb(bot: Bot) -> InlineKeyboardMarkup:
 
     if not bot.is_sold:
         builder.row(
-            InlineKeyboardButton(text="✏️ Изменить цену", callback_data=f"admin:edit_price:{bot.id}")
+            InlineKeyboardButton(text="✏️ Изменить цену", callback_data=AdminItemCb(action="edit_price", id=bot.id).pack())
         )
         builder.row(
-            InlineKeyboardButton(text="🗑 Удалить", callback_data=f"admin:delete_bot:{bot.id}")
+            InlineKeyboardButton(text="🗑 Удалить", callback_data=AdminItemCb(action="delete_bot", id=bot.id).pack())
         )
 
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="admin:all_bots")
+        InlineKeyboardButton(text="« Назад", callback_data=AdminCb(action="all_bots").pack())
     )
     return builder.as_markup()
 
@@ -414,7 +442,7 @@ def select_session_kb(sessions: list[Session], bot_id: int = None) -> InlineKeyb
     builder = InlineKeyboardBuilder()
 
     for session in sessions:
-        cb = f"admin:select_session:{session.id}"
+        cb = AdminItemCb(action="select_session", id=session.id).pack()
         if bot_id:
             cb = f"admin:link_session:{bot_id}:{session.id}"
         builder.row(
@@ -422,17 +450,17 @@ def select_session_kb(sessions: list[Session], bot_id: int = None) -> InlineKeyb
         )
 
     builder.row(
-        InlineKeyboardButton(text="« Отмена", callback_data="admin:add_bot" if not bot_id else "admin:all_bots")
+        InlineKeyboardButton(text="« Отмена", callback_data=AdminCb(action="add_bot" if not bot_id else "all_bots").pack())
     )
     return builder.as_markup()
 
 
-def confirm_kb(yes_callback: str, no_callback: str) -> InlineKeyboardMarkup:
+def confirm_kb(yes_callback: str | CallbackData, no_callback: str | CallbackData) -> InlineKeyboardMarkup:
     """Подтверждение"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="✅ Да", callback_data=yes_callback),
-        InlineKeyboardButton(text="❌ Нет", callback_data=no_callback)
+        InlineKeyboardButton(text="✅ Да", callback_data=_pack(yes_callback)),
+        InlineKeyboardButton(text="❌ Нет", callback_data=_pack(no_callback))
     )
     return builder.as_markup()
 
@@ -441,10 +469,10 @@ def broadcast_photo_kb() -> InlineKeyboardMarkup:
     """Клавиатура для рассылки - добавить/пропустить фото"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="⏭ Пропустить фото", callback_data="broadcast:skip_photo")
+        InlineKeyboardButton(text="⏭ Пропустить фото", callback_data=BroadcastCb(action="skip_photo").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="❌ Отмена", callback_data="admin")
+        InlineKeyboardButton(text="❌ Отмена", callback_data=AdminMenuCb().pack())
     )
     return builder.as_markup()
 
@@ -453,9 +481,9 @@ def broadcast_confirm_kb() -> InlineKeyboardMarkup:
     """Подтверждение рассылки"""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="✅ Начать рассылку", callback_data="broadcast:start")
+        InlineKeyboardButton(text="✅ Начать рассылку", callback_data=BroadcastCb(action="start").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="❌ Отмена", callback_data="admin")
+        InlineKeyboardButton(text="❌ Отмена", callback_data=AdminMenuCb().pack())
     )
     return builder.as_markup()
@@ -4,19 +4,36 @@ import sys
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.memory import SimpleEventIsolation
 
 from bot.config import config
-from bot.database import init_db
+from bot.database import init_db, write_queue
+from bot.fsm_storage import create_storage
 from bot.handlers import get_main_router
-from bot.services import session_manager
+from bot.middlewares import (
+    DbSessionMiddleware, DbCommitMiddleware, QueryStatsMiddleware, HandlerMetricsMiddleware, BotApiMetricsMiddleware,
+    ThrottlingMiddleware, parse_limit, parse_limits
+)
+from bot.services import session_manager, expiry_sweeper, metrics
+from bot.webhook import run_webhook, run_worker
 
 
 async def on_startup(bot: Bot):
     """Действия при запуске бота"""
-    logging.info("Инициализация базы данных...")
-    await init_db()
+    # Воркеры supervisor.py: миграции уже применил supervisor, чистку и уведомления делает воркер 0
+    if config.WORKER_INDEX < 0:
+        logging.info("Инициализация базы данных...")
+        await init_db()
+    if config.DB_WRITE_QUEUE:
+        write_queue.start()
+    await metrics.start()
+    if config.WORKER_INDEX > 0:
+        logging.info(f"Воркер {config.WORKER_INDEX} запущен")
+        return
+    expiry_sweeper.start()
 
     # Уведомляем админов о запуске
     for admin_id in config.ADMIN_IDS:
@@ -32,6 +49,11 @@ async def on_shutdown(bot: Bot):
     """Действия при остановке бота"""
     logging.info("Отключение сессий...")
     await session_manager.disconnect_all()
+    await expiry_sweeper.stop()
+    await write_queue.stop()
+    await metrics.stop()
+    if config.WORKER_INDEX > 0:
+        return
 
     # Уведомляем админов
     for admin_id in config.ADMIN_IDS:
@@ -43,6 +65,60 @@ async def on_shutdown(bot: Bot):
     logging.info("Бот остановлен")
 
 
+def create_bot() -> Bot:
+    session = None
+    if config.BOT_API_SERVER:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.BOT_API_SERVER))
+    bot = Bot(
+        token=config.BOT_TOKEN,
+        session=session,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+    # Коммит сессии апдейта хендлеров с флагом commit_before_api, потом запрос (в метрики Bot API коммит не входит)
+    bot.session.middleware(DbCommitMiddleware())
+    if config.METRICS_ENABLED:
+        bot.session.middleware(BotApiMetricsMiddleware())
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    # Апдейты одного пользователя обрабатываются по очереди (FSM не гоняется сам с собой)
+    dp = Dispatcher(storage=create_storage(), events_isolation=SimpleEventIsolation())
+
+    # Антифлуд — до фильтров и сессии БД; один экземпляр, чтобы общий лимит считал и сообщения, и нажатия
+    if config.THROTTLE_ENABLED:
+        throttling = ThrottlingMiddleware(
+            parse_limit(config.THROTTLE_DEFAULT),
+            parse_limits(config.THROTTLE_CALLBACKS),
+            config.THROTTLE_CACHE_SIZE,
+            exempt=config.ADMIN_IDS
+        )
+        dp.message.outer_middleware(throttling)
+        dp.callback_query.outer_middleware(throttling)
+
+    # Время и ошибки хендлеров для /metrics (первым — чтобы учитывать всё, включая коммит)
+    if config.METRICS_ENABLED:
+        dp.message.middleware(HandlerMetricsMiddleware())
+        dp.callback_query.middleware(HandlerMetricsMiddleware())
+
+    # Замеры запросов по хендлерам (снаружи сессии — чтобы учитывать и коммит)
+    if config.DB_QUERY_STATS or config.DB_NPLUS1_THRESHOLD > 0:
+        dp.message.middleware(QueryStatsMiddleware(config.DB_NPLUS1_THRESHOLD))
+        dp.callback_query.middleware(QueryStatsMiddleware(config.DB_NPLUS1_THRESHOLD))
+
+    # Одна сессия БД на апдейт (только для апдейтов, дошедших до хендлера)
+    dp.message.middleware(DbSessionMiddleware())
+    dp.callback_query.middleware(DbSessionMiddleware())
+
+    # Регистрация роутеров
+    dp.include_router(get_main_router())
+
+    # Регистрация событий
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return dp
+
+
 async def main():
     # Настройка логирования
     logging.basicConfig(
@@ -63,24 +139,21 @@ async def main():
         logging.warning("ADMIN_IDS не указаны - админ-панель будет недоступна!")
 
     # Создание бота и диспетчера
-    bot = Bot(
-        token=config.BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
-
-    dp = Dispatcher(storage=MemoryStorage())
-
-    # Регистрация роутеров
-    dp.include_router(get_main_router())
-
-    # Регистрация событий
-    dp.startup.register(on_startup)
-    dp.shutdown.register(on_shutdown)
+    bot = create_bot()
+    dp = create_dispatcher()
 
     # Запуск
     try:
-        logging.info("Запуск бота...")
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if config.WORKER_INDEX >= 0:
+            await run_worker(dp, bot)
+        elif config.WEBHOOK_URL:
+            logging.info("Запуск бота (webhook)...")
+            await run_webhook(dp, bot)
+        else:
+            logging.info("Запуск бота...")
+            # Вебхук, оставшийся от запуска в режиме webhook, не даёт получать апдейты через getUpdates
+            await bot.delete_webhook()
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
         await bot.session.close()
 
@@ -0,0 +1,7 @@
+from bot.middlewares.database import DbSessionMiddleware, DbCommitMiddleware
+from bot.middlewares.query_stats import QueryStatsMiddleware
+from bot.middlewares.metrics import HandlerMetricsMiddleware, BotApiMetricsMiddleware
+from bot.middlewares.throttling import ThrottlingMiddleware, parse_limit, parse_limits
+
+__all__ = ["DbSessionMiddleware", "DbCommitMiddleware", "QueryStatsMiddleware", "HandlerMetricsMiddleware", "BotApiMetricsMiddleware",
+           "ThrottlingMiddleware", "parse_limit", "parse_limits"]
@@ -0,0 +1,67 @@
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.dispatcher.flags import get_flag
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database import unit_of_work
+
+# Сессия апдейта, который сейчас обрабатывается в этой задаче
+current_db_session: ContextVar[AsyncSession | None] = ContextVar("current_db_session", default=None)
+
+# Флаг хендлера: коммитить транзакцию апдейта перед каждым запросом к Bot API
+COMMIT_BEFORE_API = "commit_before_api"
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Открывает одну сессию БД на апдейт и передаёт её в хендлер как db_session.
+
+    По умолчанию апдейт атомарен: всё, что записал хендлер, коммитится при выходе
+    или целиком откатывается при ошибке. Хендлер с флагом commit_before_api
+    (flags={"commit_before_api": True}) отказывается от этого: DbCommitMiddleware
+    коммитит его записи перед каждым запросом к Bot API, и откат затрагивает
+    только записанное после последнего такого запроса.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        async with unit_of_work() as session:
+            session.info[COMMIT_BEFORE_API] = bool(get_flag(data, COMMIT_BEFORE_API))
+            data["db_session"] = session
+            token = current_db_session.set(session)
+            try:
+                return await handler(event, data)
+            finally:
+                current_db_session.reset(token)
+
+
+class DbCommitMiddleware(BaseRequestMiddleware):
+    """
+    Коммит транзакции апдейта перед запросом к Bot API — только для хендлеров
+    с флагом commit_before_api.
+
+    Запрос к Telegram идёт сотни миллисекунд, и всё это время хендлер держит
+    блокировку записи SQLite и соединение из пула. Флаг ставят там, где запись
+    уже нельзя откатывать (внешнее действие выполнено) или она независима от ответа.
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        session = current_db_session.get()
+        if session is not None and session.info.get(COMMIT_BEFORE_API) and session.in_transaction():
+            await session.commit()
+        return await make_request(bot, method)
@@ -0,0 +1,56 @@
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import CallbackQuery, TelegramObject
+
+from bot.services import metrics
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время, число апдейтов в обработке и исключения по хендлеру и префиксу callback_data"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else type(event).__name__
+        prefix = (event.data or "").split(":", 1)[0][:64] if isinstance(event, CallbackQuery) else ""
+
+        key = metrics.handler_started(name)
+        started = time.perf_counter()
+        error = None
+        try:
+            return await handler(event, data)
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            metrics.handler_finished(key)
+            metrics.observe_handler(name, prefix, (time.perf_counter() - started) * 1000, error)
+
+
+class BotApiMetricsMiddleware(BaseRequestMiddleware):
+    """Время и ошибки запросов к Bot API по методу (sendMessage, editMessageText, answerCallbackQuery...)"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        started = time.perf_counter()
+        error = None
+        try:
+            return await make_request(bot, method)
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            metrics.observe_api(method.__api_method__, (time.perf_counter() - started) * 1000, error)
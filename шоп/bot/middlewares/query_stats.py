@@ -0,0 +1,40 @@
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.database.instrumentation import current_handler, update_queries, short_shape
+
+
+class QueryStatsMiddleware(BaseMiddleware):
+    """
+    Помечает запросы к БД именем хендлера. При threshold > 0 (разработка) предупреждает,
+    если за один апдейт одна и та же форма запроса выполнилась больше threshold раз.
+    """
+
+    def __init__(self, threshold: int = 0):
+        self.threshold = threshold
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else type(event).__name__
+        counter = Counter() if self.threshold > 0 else None
+
+        handler_token = current_handler.set(name)
+        counter_token = update_queries.set(counter)
+        try:
+            return await handler(event, data)
+        finally:
+            current_handler.reset(handler_token)
+            update_queries.reset(counter_token)
+            if counter:
+                for shape, count in counter.items():
+                    if count > self.threshold:
+                        logging.warning(f"Возможный N+1 в {name}: {count} раз за апдейт — {short_shape(shape, 300)}")
@@ -0,0 +1,94 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject
+
+Limit = tuple[int, float]  # (сколько запросов, за сколько секунд)
+
+
+def parse_limit(spec: str) -> Limit:
+    """'5/10' -> (5, 10.0): не больше 5 запросов за 10 секунд, всплеск до 5 подряд"""
+    count, period = spec.split("/")
+    return int(count), float(period)
+
+
+def parse_limits(spec: str) -> dict[str, Limit]:
+    """'check_payment=2/10,catalog=5/2' -> {префикс callback_data: лимит}"""
+    limits = {}
+    for item in spec.split(","):
+        if item.strip():
+            prefix, limit = item.split("=")
+            limits[prefix.strip()] = parse_limit(limit.strip())
+    return limits
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничение частоты апдейтов от одного пользователя (token bucket).
+
+    Общий лимит default — на все сообщения и нажатия пользователя, для префиксов
+    callback_data (часть до первого «:») — свои лимиты поверх общего. Нажатие сверх
+    лимита сразу получает ответ «слишком часто» без вызова хендлера, лишние сообщения
+    молча отбрасываются. Счётчики — в памяти, не больше cache_size ключей (самые давние
+    вытесняются, то есть просто начинают с полного лимита); при нескольких воркерах
+    апдейты пользователя приходят в один процесс, так что лимит остаётся точным.
+    """
+
+    def __init__(self, default: Limit, callbacks: dict[str, Limit] | None = None,
+                 cache_size: int = 50000, exempt: list[int] | None = None):
+        self.default = default
+        self.callbacks = callbacks or {}
+        self.cache_size = cache_size
+        self.exempt = set(exempt or [])
+        self.throttled = 0
+        self._buckets: OrderedDict[tuple[int, str], tuple[float, float]] = OrderedDict()
+
+    def _tokens(self, key: tuple[int, str], limit: Limit, now: float) -> float:
+        count, period = limit
+        tokens, updated = self._buckets.get(key, (count, now))
+        return min(count, tokens + (now - updated) * count / period)
+
+    def _remember(self, key: tuple[int, str], tokens: float, now: float):
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.cache_size:
+            self._buckets.popitem(last=False)
+
+    def acquire(self, user_id: int, prefix: str | None = None) -> float:
+        """Списать запрос; 0 — можно, иначе через сколько секунд появится свободный"""
+        now = time.monotonic()
+        limits = [((user_id, ""), self.default)]
+        if prefix in self.callbacks:
+            limits.append(((user_id, prefix), self.callbacks[prefix]))
+
+        levels = [(key, limit, self._tokens(key, limit, now)) for key, limit in limits]
+        wait = max((1 - tokens) * limit[1] / limit[0] for _, limit, tokens in levels)
+        allowed = wait <= 0
+        for key, _, tokens in levels:
+            self._remember(key, tokens - 1 if allowed else tokens, now)
+        return 0 if allowed else wait
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None or user.id in self.exempt:
+            return await handler(event, data)
+
+        is_callback = isinstance(event, CallbackQuery)
+        prefix = (event.data or "").split(":", 1)[0] if is_callback else None
+        wait = self.acquire(user.id, prefix)
+        if not wait:
+            return await handler(event, data)
+
+        self.throttled += 1
+        logging.debug(f"Флуд от {user.id}: {prefix or type(event).__name__}, ждать {wait:.1f} с")
+        if is_callback:
+            await event.answer(f"⏳ Слишком часто, попробуйте через {max(1, round(wait))} с")
+        return None
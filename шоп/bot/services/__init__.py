@@ -1,5 +1,10 @@
 from bot.services.session_manager import session_manager
 from bot.services.botfather import botfather_service
 from bot.services.cryptobot import cryptobot_service
+from bot.services.bot_import import bot_import_service
+from bot.services.export import export_service
+from bot.services.sweeper import expiry_sweeper
+from bot.services.metrics import metrics
 
-__all__ = ["session_manager", "botfather_service", "cryptobot_service"]
+__all__ = ["session_manager", "botfather_service", "cryptobot_service", "bot_import_service", "export_service",
+           "expiry_sweeper", "metrics"]
@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+import math
+from dataclasses import dataclass, field
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database import find_existing_bots, add_bots_bulk, get_all_sessions
+
+REQUIRED_FIELDS = ("username", "token", "name", "price")
+
+
+@dataclass
+class ImportReport:
+    """Итог импорта: сколько добавлено и ошибки по строкам (номер строки, причина)"""
+    total: int = 0
+    added: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+
+class BotImportService:
+    """Массовое добавление ботов из CSV/JSON файла"""
+
+    def _read_rows(self, filename: str, content: bytes) -> list[tuple[int, dict]]:
+        """Строки файла с номерами (для CSV — номер строки в файле, для JSON — номер элемента)"""
+        text = content.decode("utf-8-sig")
+
+        if filename.lower().endswith(".json"):
+            data = json.loads(text)
+            if not isinstance(data, list):
+                raise ValueError("JSON должен содержать список объектов")
+            return [(i, item if isinstance(item, dict) else {}) for i, item in enumerate(data, start=1)]
+
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+        reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+        missing = [name for name in REQUIRED_FIELDS if name not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"В заголовке CSV нет колонок: {', '.join(missing)}")
+        return [(reader.line_num, row) for row in reader]
+
+    def _validate(self, row: dict, session_ids: set[int]) -> dict:
+        """Проверить строку и привести к полям модели Bot (ValueError — причина отказа)"""
+        username = str(row.get("username") or "").strip().lstrip("@")
+        token = str(row.get("token") or "").strip()
+        name = str(row.get("name") or "").strip()
+        currency = str(row.get("currency") or "USDT").strip().upper()
+        description = str(row.get("description") or "").strip() or None
+
+        if not username or len(username) > 64:
+            raise ValueError("пустой или слишком длинный username")
+        if ":" not in token or len(token) > 64:
+            raise ValueError("неверный формат токена")
+        if not name or len(name) > 64:
+            raise ValueError("пустое или слишком длинное название")
+        if len(currency) > 10:
+            raise ValueError("неверная валюта")
+
+        try:
+            price = float(str(row.get("price")).strip().replace(",", "."))
+        except ValueError:
+            raise ValueError("цена должна быть числом")
+        if not math.isfinite(price) or price <= 0:
+            raise ValueError("цена должна быть больше нуля")
+
+        session_id = row.get("session_id")
+        if session_id in (None, ""):
+            session_id = None
+        else:
+            try:
+                session_id = int(session_id)
+            except (TypeError, ValueError):
+                raise ValueError("session_id должен быть числом")
+            if session_id not in session_ids:
+                raise ValueError(f"сессия #{session_id} не найдена")
+
+        return {
+            "username": username,
+            "token": token,
+            "name": name,
+            "price": price,
+            "currency": currency,
+            "description": description,
+            "session_id": session_id,
+        }
+
+    async def import_file(self, filename: str, content: bytes,
+                          session: AsyncSession | None = None) -> ImportReport:
+        """
+        Разобрать файл, проверить строки и добавить валидные одной пачкой.
+
+        CSV: заголовок username,token,name,price[,currency,description,session_id]
+        JSON: список объектов с теми же полями
+        """
+        report = ImportReport()
+        try:
+            rows = self._read_rows(filename, content)
+        except (ValueError, csv.Error) as e:
+            report.errors.append((0, f"не удалось прочитать файл: {e}"))
+            return report
+
+        report.total = len(rows)
+        session_ids = {s.id for s in await get_all_sessions(session=session)}
+
+        # Проверка полей и дублей внутри файла
+        valid: list[tuple[int, dict]] = []
+        seen_usernames, seen_tokens = set(), set()
+        for line, row in rows:
+            try:
+                bot = self._validate(row, session_ids)
+            except ValueError as e:
+                report.errors.append((line, str(e)))
+                continue
+            if bot["username"].lower() in seen_usernames:
+                report.errors.append((line, f"@{bot['username']} повторяется в файле"))
+                continue
+            if bot["token"] in seen_tokens:
+                report.errors.append((line, "токен повторяется в файле"))
+                continue
+            seen_usernames.add(bot["username"].lower())
+            seen_tokens.add(bot["token"])
+            valid.append((line, bot))
+
+        # Дубли с уже существующими ботами — одним проходом по уникальным колонкам
+        taken_usernames, taken_tokens = await find_existing_bots(
+            [bot["username"] for _, bot in valid],
+            [bot["token"] for _, bot in valid],
+            session=session
+        )
+        to_insert = []
+        for line, bot in valid:
+            if bot["username"] in taken_usernames:
+                report.errors.append((line, f"@{bot['username']} уже есть в базе"))
+            elif bot["token"] in taken_tokens:
+                report.errors.append((line, "токен уже есть в базе"))
+            else:
+                to_insert.append(bot)
+
+        report.added = await add_bots_bulk(to_insert, session=session)
+        report.errors.sort()
+        return report
+
+
+bot_import_service = BotImportService()
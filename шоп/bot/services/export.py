@@ -0,0 +1,31 @@
+import csv
+import os
+import tempfile
+
+from bot.database import stream_table, EXPORT_TABLES
+
+
+class ExportService:
+    """Выгрузка таблиц в CSV без загрузки всей таблицы в память"""
+
+    async def export_csv(self, table: str, chunk_size: int = 1000) -> tuple[str, int]:
+        """Записать таблицу во временный CSV файл, вернуть (путь, кол-во строк). Файл удаляет вызывающий"""
+        columns = [column.name for column in EXPORT_TABLES[table].__table__.columns]
+        fd, path = tempfile.mkstemp(prefix=f"{table}_", suffix=".csv")
+        count = 0
+
+        try:
+            with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                async for rows in stream_table(table, chunk_size):
+                    writer.writerows(rows)
+                    count += len(rows)
+        except Exception:
+            os.remove(path)
+            raise
+
+        return path, count
+
+
+export_service = ExportService()
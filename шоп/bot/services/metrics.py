@@ -0,0 +1,155 @@
+import logging
+
+from aiohttp import web
+
+from bot.config import config
+from bot.database.instrumentation import BUCKETS_MS, StatementStats, query_stats
+
+OTHER = "<прочие>"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metrics:
+    """
+    Метрики бота в памяти процесса и их отдача в текстовом формате Prometheus.
+
+    Гистограммы — те же StatementStats, что у замеров SQL (корзины BUCKETS_MS), запись —
+    поиск в словаре и прибавление к счётчикам. Число наборов меток на каждую метрику (и счётчики
+    ошибок, и апдейты в обработке) ограничено max_keys: сверх него всё пишется в «<прочие>»
+    (callback_data приходит от клиента).
+    """
+
+    def __init__(self, max_keys: int = 2000):
+        self.max_keys = max_keys
+        self.handler_seconds: dict[tuple[str, str], StatementStats] = {}
+        self.handler_errors: dict[tuple[str, str, str], int] = {}
+        self.in_progress: dict[str, int] = {}
+        self.api_seconds: dict[str, StatementStats] = {}
+        self.api_errors: dict[tuple[str, str], int] = {}
+        self._runner: web.AppRunner | None = None
+
+    def _key(self, items: dict, key, other):
+        """Ключ для записи: сам key, если он уже есть или есть место, иначе other"""
+        if key in items or len(items) < self.max_keys:
+            return key
+        return other
+
+    def _stats(self, items: dict, key, other) -> StatementStats:
+        key = self._key(items, key, other)
+        stats = items.get(key)
+        if stats is None:
+            stats = items[key] = StatementStats()
+        return stats
+
+    def _count(self, items: dict, key, other):
+        key = self._key(items, key, other)
+        items[key] = items.get(key, 0) + 1
+        return key
+
+    def handler_started(self, handler: str) -> str:
+        """+1 к апдейтам в обработке; вернуть ключ для handler_finished"""
+        return self._count(self.in_progress, handler, OTHER)
+
+    def handler_finished(self, key: str):
+        self.in_progress[key] -= 1
+
+    def observe_handler(self, handler: str, prefix: str, ms: float, error: str | None = None):
+        self._stats(self.handler_seconds, (handler, prefix), (handler, OTHER)).add(ms, 0)
+        if error is not None:
+            self._count(self.handler_errors, (handler, prefix, error), (OTHER, OTHER, OTHER))
+
+    def observe_api(self, method: str, ms: float, error: str | None = None):
+        self._stats(self.api_seconds, method, OTHER).add(ms, 0)
+        if error is not None:
+            self._count(self.api_errors, (method, error), (OTHER, OTHER))
+
+    # ============ PROMETHEUS ============
+
+    @staticmethod
+    def _histogram(lines: list[str], name: str, help_text: str, label_names: tuple[str, ...], items):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for values, stats in items:
+            cumulative = 0
+            for bound, count in zip(BUCKETS_MS, stats.buckets):
+                cumulative += count
+                le = 'le="%g"' % (bound / 1000)
+                lines.append(f"{name}_bucket{_labels(label_names, values, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_labels(label_names, values, le)} {stats.count}")
+            lines.append(f"{name}_sum{_labels(label_names, values)} {stats.total_ms / 1000:.6f}")
+            lines.append(f"{name}_count{_labels(label_names, values)} {stats.count}")
+
+    @staticmethod
+    def _simple(lines: list[str], name: str, kind: str, help_text: str, label_names: tuple[str, ...], items):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for values, value in items:
+            lines.append(f"{name}{_labels(label_names, values)} {value}")
+
+    def render(self) -> str:
+        lines = []
+        self._histogram(
+            lines, "shop_handler_duration_seconds", "Время обработки апдейта хендлером (с сессией БД и коммитом)",
+            ("handler", "prefix"), list(self.handler_seconds.items())
+        )
+        self._simple(
+            lines, "shop_handler_in_progress", "gauge", "Апдейтов в обработке",
+            ("handler",), [((name,), count) for name, count in list(self.in_progress.items())]
+        )
+        self._simple(
+            lines, "shop_handler_errors_total", "counter", "Исключения в хендлерах",
+            ("handler", "prefix", "error"), list(self.handler_errors.items())
+        )
+        self._histogram(
+            lines, "shop_bot_api_duration_seconds", "Время запросов к Bot API",
+            ("method",), [((method,), stats) for method, stats in list(self.api_seconds.items())]
+        )
+        self._simple(
+            lines, "shop_bot_api_errors_total", "counter", "Ошибки запросов к Bot API",
+            ("method", "error"), list(self.api_errors.items())
+        )
+        self._histogram(
+            lines, "shop_db_query_duration_seconds", "Время SQL-запросов по хендлерам (DB_QUERY_STATS)",
+            ("handler",), [((name,), stats) for name, stats in query_stats.top_handlers(None)]
+        )
+        return "\n".join(lines) + "\n"
+
+    # ============ HTTP ============
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render(), content_type="text/plain", headers={"Cache-Control": "no-store"})
+
+    @staticmethod
+    def port() -> int:
+        """Порт /metrics; воркеры supervisor.py слушают METRICS_PORT + номер воркера"""
+        return config.METRICS_PORT + max(config.WORKER_INDEX, 0)
+
+    async def start(self):
+        if not config.METRICS_ENABLED or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, config.METRICS_HOST, self.port()).start()
+        logging.info(f"Метрики: http://{config.METRICS_HOST}:{self.port()}/metrics")
+
+    async def stop(self):
+        if self._runner is None:
+            return
+        await self._runner.cleanup()
+        self._runner = None
+
+
+metrics = Metrics()
@@ -5,13 +5,66 @@ from telethon.sessions import StringSession
 
 from bot.config import config
 
+try:
+    import fcntl
+except ImportError:  # Windows: межпроцессного лока нет, воркеры не поддерживаются
+    fcntl = None
+
+
+class SessionLock:
+    """
+    Лок файла сессии: asyncio.Lock внутри процесса, а при нескольких воркерах ещё и
+    flock на <файл сессии>.lock. Воркер отключает клиента, отпуская лок, — файл сессии
+    Telethon (SQLite) не бывает открыт в двух процессах одновременно.
+    """
+
+    def __init__(self, manager: "SessionManager", session_file: str):
+        self.manager = manager
+        self.session_file = session_file
+        self._lock = asyncio.Lock()
+        self._fd: int | None = None
+
+    async def __aenter__(self):
+        await self._lock.acquire()
+        try:
+            if self.manager.shared and fcntl is not None:
+                self._fd = os.open(self.session_file + ".lock", os.O_CREAT | os.O_RDWR, 0o600)
+                while True:
+                    try:
+                        fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        # Сессией занят другой воркер — ждём, не блокируя цикл событий
+                        await asyncio.sleep(0.05)
+        except BaseException:
+            self._release_file()
+            self._lock.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        try:
+            if self.manager.shared:
+                await self.manager.disconnect(self.session_file)
+        finally:
+            self._release_file()
+            self._lock.release()
+
+    def _release_file(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
 
 class SessionManager:
     """Менеджер Telegram сессий"""
 
     def __init__(self):
         self.clients: dict[str, TelegramClient] = {}
-        self._locks: dict[str, asyncio.Lock] = {}
+        self._locks: dict[str, SessionLock] = {}
+        # Процесс — один из воркеров supervisor.py: сессии делятся с другими процессами
+        self.shared = config.WORKER_INDEX >= 0
 
     def _get_session_path(self, phone: str) -> str:
         """Путь к файлу сессии"""
@@ -32,10 +85,21 @@ class SessionManager:
         self.clients[phone] = client
         return client, sent.phone_code_hash
 
+    async def _pending_client(self, phone: str) -> TelegramClient | None:
+        """
+        Клиент, начавший вход по номеру. Если бот перезапускался после send_code,
+        клиент поднимается заново из файла сессии — код привязан к ключу из этого файла.
+        """
+        client = self.clients.get(phone)
+        if client is None and os.path.exists(self._get_session_path(phone) + ".session"):
+            client = await self.create_session(phone)
+            self.clients[phone] = client
+        return client
+
     async def sign_in(self, phone: str, code: str, phone_code_hash: str,
                       password: str = None) -> tuple[bool, str]:
         """Авторизация по коду"""
-        client = self.clients.get(phone)
+        client = await self._pending_client(phone)
         if not client:
             return False, "Сессия не найдена"
 
@@ -57,7 +121,7 @@ class SessionManager:
 
     async def sign_in_2fa(self, phone: str, password: str) -> tuple[bool, str]:
         """Авторизация с 2FA"""
-        client = self.clients.get(phone)
+        client = await self._pending_client(phone)
         if not client:
             return False, "Сессия не найдена"
 
@@ -95,10 +159,10 @@ class SessionManager:
             self.clients[session_file] = client
         return client
 
-    def get_lock(self, session_file: str) -> asyncio.Lock:
-        """Получение лока для сессии (для предотвращения конфликтов)"""
+    def get_lock(self, session_file: str) -> SessionLock:
+        """Получение лока для сессии (для предотвращения конфликтов, в том числе между воркерами)"""
         if session_file not in self._locks:
-            self._locks[session_file] = asyncio.Lock()
+            self._locks[session_file] = SessionLock(self, session_file)
         return self._locks[session_file]
 
     async def disconnect_all(self):
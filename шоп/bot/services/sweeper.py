@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from bot.config import config
+from bot.database import (
+    get_stale_pending, expire_pending, archive_terminal, incremental_vacuum, delete_stale_fsm_records
+)
+from bot.database.models import Payment, Deposit
+from bot.services.cryptobot import cryptobot_service
+
+
+@dataclass
+class SweepReport:
+    """Итог одного прохода чистки"""
+    expired: int = 0
+    invoices_deleted: int = 0
+    paid_pending: int = 0
+    archived: int = 0
+    fsm_expired: int = 0
+    vacuumed_pages: int = 0
+
+
+class ExpirySweeper:
+    """
+    Фоновая чистка платежей и пополнений.
+
+    1. Неоплаченные счета CryptoBot старше срока жизни (+ запас) сверяются с API пачками:
+       истёкшие помечаются expired и удаляются в CryptoBot, оплаченные остаются pending,
+       чтобы пользователь получил их по кнопке «Проверить оплату».
+    2. Завершённые записи старше ARCHIVE_AFTER_DAYS переносятся в архивные таблицы.
+    3. Удаляются состояния FSM старше FSM_STATE_TTL (FSM_STORAGE=sql).
+    4. SQLite возвращает освободившиеся страницы (incremental_vacuum).
+
+    Каждый шаг идёт пачками по SWEEP_CHUNK, не больше SWEEP_MAX_CHUNKS пачек за проход.
+    """
+
+    def __init__(self, delete_concurrency: int = 10):
+        self.delete_concurrency = delete_concurrency
+        self._task: asyncio.Task | None = None
+
+    async def _remote_statuses(self, invoice_ids: list[str]) -> dict[str, str]:
+        """Статусы счетов в CryptoBot: invoice_id -> status (неизвестных счетов в ответе нет)"""
+        numeric = [int(invoice_id) for invoice_id in invoice_ids if invoice_id and invoice_id.isdigit()]
+        if not numeric:
+            return {}
+        result = await cryptobot_service.get_invoices(invoice_ids=numeric, count=len(numeric))
+        return {str(item["invoice_id"]): item.get("status") for item in result.get("items", [])}
+
+    async def _delete_invoices(self, invoice_ids: list[str]) -> int:
+        """Удалить счета в CryptoBot, не больше delete_concurrency запросов одновременно"""
+        semaphore = asyncio.Semaphore(self.delete_concurrency)
+
+        async def delete(invoice_id: str) -> bool:
+            async with semaphore:
+                return await cryptobot_service.delete_invoice(int(invoice_id))
+
+        results = await asyncio.gather(*(delete(invoice_id) for invoice_id in invoice_ids))
+        return sum(results)
+
+    async def _expire(self, model: type[Payment] | type[Deposit], report: SweepReport):
+        before = datetime.utcnow() - timedelta(seconds=config.INVOICE_EXPIRES_IN + config.SWEEP_GRACE)
+        after_id = 0
+        for _ in range(config.SWEEP_MAX_CHUNKS):
+            rows = await get_stale_pending(model, before, after_id=after_id, limit=config.SWEEP_CHUNK)
+            if not rows:
+                return
+            after_id = rows[-1][0]
+
+            statuses = await self._remote_statuses([invoice_id for _, invoice_id in rows])
+            expired = [(row_id, invoice_id) for row_id, invoice_id in rows if statuses.get(invoice_id) != "paid"]
+            report.paid_pending += len(rows) - len(expired)
+            report.expired += await expire_pending(model, [row_id for row_id, _ in expired])
+            report.invoices_deleted += await self._delete_invoices(
+                [invoice_id for _, invoice_id in expired if invoice_id in statuses]
+            )
+
+    async def _archive(self, model: type[Payment] | type[Deposit], report: SweepReport):
+        before = datetime.utcnow() - timedelta(days=config.ARCHIVE_AFTER_DAYS)
+        for _ in range(config.SWEEP_MAX_CHUNKS):
+            moved = await archive_terminal(model, before, limit=config.SWEEP_CHUNK)
+            report.archived += moved
+            if moved < config.SWEEP_CHUNK:
+                return
+
+    async def run_once(self) -> SweepReport:
+        report = SweepReport()
+        for model in (Payment, Deposit):
+            if config.CRYPTOBOT_TOKEN:
+                try:
+                    await self._expire(model, report)
+                except Exception as e:
+                    # Без ответа CryptoBot пачка не помечается — попробуем в следующий проход
+                    logging.warning(f"Просрочка {model.__tablename__} прервана: {e}")
+            await self._archive(model, report)
+        if config.FSM_STORAGE.lower() == "sql":
+            report.fsm_expired = await delete_stale_fsm_records(
+                datetime.utcnow() - timedelta(seconds=config.FSM_STATE_TTL)
+            )
+        report.vacuumed_pages = await incremental_vacuum(config.SWEEP_VACUUM_PAGES)
+        return report
+
+    async def _loop(self):
+        while True:
+            try:
+                report = await self.run_once()
+                if report.expired or report.archived or report.vacuumed_pages:
+                    logging.info(f"Чистка платежей: {report}")
+            except Exception:
+                logging.exception("Ошибка чистки платежей")
+            await asyncio.sleep(config.SWEEP_INTERVAL)
+
+    def start(self):
+        if config.SWEEP_INTERVAL > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+expiry_sweeper = ExpirySweeper()
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+import secrets
+import signal
+import sys
+from contextlib import suppress
+from pathlib import Path
+
+from bot.config import config
+from bot.database import init_db
+from bot.database.db import engine
+from bot.main import create_bot, create_dispatcher
+from bot.webhook import FrontDoor, serve, set_webhook
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+class WorkerProcess:
+    """Процесс-воркер (run.py с WORKER_INDEX); упавший перезапускается"""
+
+    def __init__(self, index: int, worker_secret: str):
+        self.index = index
+        self.worker_secret = worker_secret
+        self.restarts = 0
+        self.process: asyncio.subprocess.Process | None = None
+        self._stopping = False
+
+    async def _spawn(self):
+        env = {**os.environ, "WORKER_INDEX": str(self.index), "WORKER_SECRET": self.worker_secret}
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, str(PROJECT_DIR / "run.py"), cwd=PROJECT_DIR, env=env
+        )
+
+    async def run(self):
+        while True:
+            await self._spawn()
+            code = await self.process.wait()
+            # Ctrl+C приходит всей группе процессов — даём supervisor'у заметить остановку
+            await asyncio.sleep(1)
+            if self._stopping:
+                return
+            self.restarts += 1
+            logging.warning(f"Воркер {self.index} завершился с кодом {code}, перезапуск")
+
+    async def stop(self, timeout: float = 60):
+        self._stopping = True
+        if self.process is None or self.process.returncode is not None:
+            return
+        with suppress(ProcessLookupError):
+            self.process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Воркер {self.index} не остановился за {timeout} с, kill")
+            with suppress(ProcessLookupError):
+                self.process.kill()
+
+
+async def _wait_port(port: int, timeout: float = 30) -> bool:
+    """Дождаться, пока воркер откроет порт"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            await asyncio.sleep(0.2)
+            continue
+        writer.close()
+        return True
+    return False
+
+
+async def supervise(workers: int):
+    """
+    Применить миграции, поднять workers воркеров и входную точку вебхука на
+    WEBHOOK_HOST:WEBHOOK_PORT, зарегистрировать вебхук и работать до SIGINT/SIGTERM.
+    """
+    logging.info("Инициализация базы данных...")
+    await init_db()
+    await engine.dispose()
+
+    worker_secret = secrets.token_urlsafe(32)
+    secret_token = config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    processes = [WorkerProcess(i, worker_secret) for i in range(workers)]
+    tasks = [asyncio.create_task(process.run()) for process in processes]
+
+    for i in range(workers):
+        if not await _wait_port(config.WORKER_BASE_PORT + i):
+            logging.error(f"Воркер {i} не открыл порт {config.WORKER_BASE_PORT + i}")
+
+    bot = create_bot()
+    # Список типов апдейтов — тот же, что у диспетчера воркеров
+    allowed_updates = create_dispatcher().resolve_used_update_types()
+    front_door = FrontDoor(workers, secret_token, worker_secret)
+    logging.info(f"Воркеров: {workers}, порты {config.WORKER_BASE_PORT}..{config.WORKER_BASE_PORT + workers - 1}")
+
+    try:
+        await serve(
+            front_door.create_app(),
+            config.WEBHOOK_HOST,
+            config.WEBHOOK_PORT,
+            on_started=lambda: set_webhook(bot, secret_token, allowed_updates)
+        )
+    finally:
+        logging.info(f"Остановка воркеров (переслано апдейтов: {front_door.forwarded})...")
+        await asyncio.gather(*(process.stop() for process in processes))
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await bot.session.close()
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import logging
+import secrets
+import signal
+from contextlib import suppress
+from typing import Awaitable, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web, ClientError, ClientSession, ClientTimeout, TCPConnector
+
+from bot.config import config
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class DrainingRequestHandler(SimpleRequestHandler):
+    """
+    Приём апдейтов от Telegram с проверкой X-Telegram-Bot-Api-Secret-Token.
+
+    По умолчанию апдейты обрабатываются в фоне (Telegram сразу получает 200). При
+    остановке сервер сначала ждёт, пока допишутся уже принятые апдейты, и только потом
+    закрывает сессию бота и вызывает on_shutdown.
+
+    При обработке до ответа ошибка хендлера только логируется и апдейт подтверждается:
+    повторная доставка запустила бы хендлер ещё раз (второй счёт в CryptoBot) и держала
+    бы очередь апдейтов пользователя, пока Telegram не сдастся.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str,
+                 handle_in_background: bool = True, drain_timeout: float = 30):
+        super().__init__(
+            dispatcher=dispatcher, bot=bot, secret_token=secret_token, handle_in_background=handle_in_background
+        )
+        self.drain_timeout = drain_timeout
+
+    async def _handle_request(self, bot: Bot, request: web.Request) -> web.Response:
+        try:
+            return await super()._handle_request(bot, request)
+        except Exception:
+            logging.exception("Ошибка обработки апдейта")
+            return web.json_response({})
+
+    async def close(self):
+        pending = set(self._background_feed_update_tasks)
+        if pending:
+            logging.info(f"Ожидание {len(pending)} апдейтов в обработке...")
+            _, not_done = await asyncio.wait(pending, timeout=self.drain_timeout)
+            if not_done:
+                logging.warning(f"Не дождались {len(not_done)} апдейтов за {self.drain_timeout} с")
+        await super().close()
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, secret_token: str,
+                       handle_in_background: bool = True) -> web.Application:
+    """aiohttp-приложение: POST WEBHOOK_PATH -> диспетчер, startup/shutdown диспетчера — вместе с приложением"""
+    app = web.Application()
+    DrainingRequestHandler(dp, bot, secret_token, handle_in_background).register(app, path=config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def serve(app: web.Application, host: str, port: int,
+                on_started: Callable[[], Awaitable[None]] | None = None):
+    """Поднять приложение и работать до SIGINT/SIGTERM; on_started — после открытия порта"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    # Без access-лога: строка на каждый апдейт
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()  # on_startup
+    try:
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        if on_started is not None:
+            await on_started()
+        await stop.wait()
+        logging.info("Остановка сервера...")
+    finally:
+        await runner.cleanup()  # дождаться апдейтов в обработке, затем on_shutdown
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with suppress(NotImplementedError):
+                loop.remove_signal_handler(sig)
+
+
+async def set_webhook(bot: Bot, secret_token: str, allowed_updates: list[str]):
+    url = config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH
+    await bot.set_webhook(
+        url,
+        secret_token=secret_token,
+        allowed_updates=allowed_updates,
+        max_connections=config.WEBHOOK_MAX_CONNECTIONS
+    )
+    logging.info(f"Вебхук {url}, слушаем {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}")
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Поднять сервер, зарегистрировать вебхук и работать до SIGINT/SIGTERM"""
+    # Без заданного секрета — случайный на каждый запуск (set_webhook всё равно вызывается при старте)
+    secret_token = config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    # Вебхук в Telegram при остановке не удаляем: пока бот перезапускается, апдейты копятся на стороне Telegram
+    await serve(
+        create_webhook_app(dp, bot, secret_token),
+        config.WEBHOOK_HOST,
+        config.WEBHOOK_PORT,
+        on_started=lambda: set_webhook(bot, secret_token, dp.resolve_used_update_types())
+    )
+
+
+async def run_worker(dp: Dispatcher, bot: Bot):
+    """
+    Воркер supervisor.py: апдейты приходят от входной точки на 127.0.0.1, вебхук ставит supervisor.
+    Апдейт обрабатывается до ответа — в работе не больше апдейтов, чем держит соединений входная
+    точка, и транзакция не ждёт своей очереди в перегруженном цикле событий с блокировкой записи.
+    """
+    port = config.WORKER_BASE_PORT + config.WORKER_INDEX
+    logging.info(f"Воркер {config.WORKER_INDEX} слушает 127.0.0.1:{port}")
+    app = create_webhook_app(dp, bot, config.WORKER_SECRET, handle_in_background=False)
+    await serve(app, "127.0.0.1", port)
+
+
+# ============ FRONT DOOR ============
+
+def route_key(update: dict) -> int:
+    """Ключ маршрутизации: id отправителя апдейта, без отправителя — id чата, иначе 0"""
+    for name, event in update.items():
+        if name == "update_id" or not isinstance(event, dict):
+            continue
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return 0
+
+
+class FrontDoor:
+    """
+    Входная точка вебхука для нескольких воркеров.
+
+    Проверяет секрет Telegram и пересылает тело апдейта воркеру user_id % workers —
+    все апдейты одного пользователя обрабатывает один процесс (его FSM, кэш и очередь
+    апдейтов). Воркер отвечает после обработки, и его ответ (в том числе метод Bot API
+    в теле) уходит Telegram как есть, так что число апдейтов в работе ограничено
+    WEBHOOK_MAX_CONNECTIONS. Если воркер недоступен, Telegram получает 503 и повторит доставку;
+    любой другой ответ воркера (он уже принял апдейт) подтверждается, чтобы не обработать его дважды.
+    """
+
+    def __init__(self, workers: int, secret_token: str, worker_secret: str):
+        self.workers = workers
+        self.secret_token = secret_token
+        self.worker_secret = worker_secret
+        self.urls = [
+            f"http://127.0.0.1:{config.WORKER_BASE_PORT + i}{config.WEBHOOK_PATH}" for i in range(workers)
+        ]
+        self.forwarded = [0] * workers
+        self._session: ClientSession | None = None
+
+    def worker_for(self, update: dict) -> int:
+        return route_key(update) % self.workers
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret_token):
+            return web.Response(body="Unauthorized", status=401)
+        body = await request.read()
+        try:
+            worker = self.worker_for(json.loads(body))
+        except (ValueError, TypeError, KeyError):
+            return web.Response(body="Bad update", status=400)
+
+        try:
+            async with self._session.post(
+                self.urls[worker],
+                data=body,
+                headers={SECRET_HEADER: self.worker_secret, "Content-Type": "application/json"}
+            ) as response:
+                status = response.status
+                body = await response.read()
+                content_type = response.headers.get("Content-Type", "application/json")
+        except (ClientError, asyncio.TimeoutError) as e:
+            logging.warning(f"Воркер {worker} недоступен: {e}")
+            return web.Response(status=503)
+        if status >= 300:
+            logging.warning(f"Воркер {worker} ответил {status}, апдейт подтверждён без повтора")
+            return web.json_response({})
+        self.forwarded[worker] += 1
+        return web.Response(body=body, headers={"Content-Type": content_type})
+
+    async def _open(self, app: web.Application):
+        self._session = ClientSession(
+            connector=TCPConnector(limit_per_host=config.WEBHOOK_MAX_CONNECTIONS),
+            # Диспетчер воркера сам уводит апдейт в фон через 55 с
+            timeout=ClientTimeout(total=65)
+        )
+
+    async def _close(self, app: web.Application):
+        await self._session.close()
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(config.WEBHOOK_PATH, self.handle)
+        app.on_startup.append(self._open)
+        app.on_cleanup.append(self._close)
+        return app
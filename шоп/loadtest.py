@@ -0,0 +1,213 @@
+"""
+Нагрузочный тест нескольких воркеров (supervisor.py)
+
+Поднимает локальный фейковый Bot API, временную базу с каталогом и supervisor.py
+с разным числом воркеров. На входную точку вебхука шлются синтетические апдейты
+(/start, каталог, карточка бота) от множества пользователей. Меряется пропускная
+способность: сколько апдейтов в секунду доходит до ответа бота (sendMessage /
+editMessageText в фейковый Bot API).
+
+Использование:
+    python loadtest.py
+    python loadtest.py --workers 1 2 4 --updates 3000 --users 500 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aiohttp import web, ClientSession, TCPConnector
+
+PROJECT_DIR = Path(__file__).resolve().parent
+TOKEN = "123456:LOADTEST"
+SECRET = "loadtest"
+
+
+class FakeBotApi:
+    """Bot API, который отвечает «ok» на всё и считает ответы бота пользователям"""
+
+    def __init__(self):
+        self.replies = 0
+        self.webhook_set = asyncio.Event()
+        self._message_id = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        form = await request.post()
+        if method == "setwebhook":
+            self.webhook_set.set()
+        if method in ("sendmessage", "editmessagetext"):
+            self.replies += 1
+            self._message_id += 1
+            chat_id = int(form.get("chat_id") or 0)
+            return web.json_response({"ok": True, "result": {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": form.get("text", ""),
+            }})
+        return web.json_response({"ok": True, "result": True})
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+
+def make_update(update_id: int, user_id: int, kind: str, bot_id: int) -> dict:
+    user = {"id": user_id, "is_bot": False, "first_name": f"User {user_id}", "username": f"load{user_id}"}
+    chat = {"id": user_id, "type": "private"}
+    if kind == "start":
+        return {"update_id": update_id, "message": {
+            "message_id": update_id, "date": int(time.time()), "chat": chat, "from": user, "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        }}
+    message = {"message_id": 1, "date": int(time.time()), "chat": chat, "text": "menu"}
+    data = "catalog" if kind == "catalog" else f"bot:{bot_id}"
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": user, "chat_instance": str(user_id), "message": message, "data": data,
+    }}
+
+
+async def seed(bots: int):
+    from bot.database import init_db, add_bots_bulk
+    from bot.database.db import engine
+
+    await init_db()
+    await add_bots_bulk([
+        {"username": f"load_bot{i}", "token": f"{i}:load", "name": f"Load {i}", "price": 5.0}
+        for i in range(1, bots + 1)
+    ])
+    await engine.dispose()
+
+
+async def wait_port(port: int, timeout: float = 60) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            await asyncio.sleep(0.2)
+            continue
+        writer.close()
+        return True
+    return False
+
+
+async def run_once(workers: int, args, api: FakeBotApi, env: dict) -> dict:
+    api.webhook_set.clear()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, str(PROJECT_DIR / "supervisor.py"), "--workers", str(workers),
+        cwd=PROJECT_DIR, env=env,
+        stdout=asyncio.subprocess.DEVNULL if not args.verbose else None,
+        stderr=asyncio.subprocess.STDOUT if not args.verbose else None,
+    )
+    try:
+        await asyncio.wait_for(api.webhook_set.wait(), 120)
+        url = f"http://127.0.0.1:{args.port}/webhook"
+        rng = random.Random(args.seed)
+        kinds = ["start", "catalog", "bot"]
+
+        async with ClientSession(connector=TCPConnector(limit=args.concurrency)) as http:
+            async def post(update: dict):
+                async with http.post(url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as r:
+                    if r.status != 200:
+                        raise RuntimeError(f"входная точка ответила {r.status}")
+
+            async def send(count: int, first_id: int):
+                queue = asyncio.Queue()
+                for i in range(count):
+                    queue.put_nowait(make_update(
+                        first_id + i, rng.randint(1, args.users), rng.choice(kinds), rng.randint(1, args.bots)
+                    ))
+
+                async def sender():
+                    while not queue.empty():
+                        await post(queue.get_nowait())
+
+                await asyncio.gather(*(sender() for _ in range(args.concurrency)))
+
+            async def wait_replies(target: int):
+                deadline = time.monotonic() + 300
+                while api.replies < target and time.monotonic() < deadline:
+                    await asyncio.sleep(0.01)
+
+            # Прогрев: кэши, соединения с БД, JIT pydantic-моделей
+            start_replies = api.replies
+            await send(200, 1)
+            await wait_replies(start_replies + 200)
+
+            start_replies = api.replies
+            started = time.perf_counter()
+            await send(args.updates, 1000)
+            acked = time.perf_counter() - started
+            await wait_replies(start_replies + args.updates)
+            elapsed = time.perf_counter() - started
+            done = api.replies - start_replies
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), 90)
+        except asyncio.TimeoutError:
+            process.kill()
+    return {"workers": workers, "done": done, "seconds": elapsed, "acked": acked, "rate": done / elapsed}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест supervisor.py")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--bots", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=18443, help="порт входной точки")
+    parser.add_argument("--api-port", type=int, default=18081, help="порт фейкового Bot API")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="показывать логи supervisor и воркеров")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="shop_load_")
+    env = {
+        **os.environ,
+        "DATABASE_PATH": os.path.join(workdir, "load.db"),
+        "BOT_TOKEN": TOKEN,
+        "BOT_API_SERVER": f"http://127.0.0.1:{args.api_port}",
+        "WEBHOOK_URL": f"http://127.0.0.1:{args.port}",
+        "WEBHOOK_HOST": "127.0.0.1",
+        "WEBHOOK_PORT": str(args.port),
+        "WEBHOOK_SECRET": SECRET,
+        "ADMIN_IDS": "",
+        "CRYPTOBOT_TOKEN": "",
+        "SWEEP_INTERVAL": "0",
+    }
+    env.pop("DATABASE_URL", None)
+    env.pop("DATABASE_READ_URL", None)
+    os.environ.update({key: env[key] for key in ("DATABASE_PATH",)})
+    await seed(args.bots)
+
+    api = FakeBotApi()
+    runner = web.AppRunner(api.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.api_port).start()
+
+    print(f"CPU: {os.cpu_count()}, апдейтов: {args.updates}, пользователей: {args.users}, "
+          f"параллельно: {args.concurrency}")
+    base = None
+    try:
+        for workers in args.workers:
+            result = await run_once(workers, args, api, env)
+            base = base or result["rate"]
+            print(f"воркеров {workers}: {result['done']}/{args.updates} за {result['seconds']:.2f} с — "
+                  f"{result['rate']:.0f} апд/с (x{result['rate'] / base:.2f}), "
+                  f"приём входной точкой {result['acked']:.2f} с")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
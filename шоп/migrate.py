@@ -0,0 +1,36 @@
+"""
+Применение миграций и проверка планов горячих запросов (EXPLAIN QUERY PLAN)
+
+Использование:
+    python migrate.py
+    python migrate.py --vacuum   # SQLite: VACUUM с включением auto_vacuum=INCREMENTAL для старой базы
+"""
+import asyncio
+import sys
+
+from bot.database import init_db
+from bot.database.db import engine, set_auto_vacuum
+from bot.database.migrations import get_schema_version, explain_hot_queries
+
+
+async def main():
+    await init_db()
+    if "--vacuum" in sys.argv:
+        mode = await set_auto_vacuum(existing=True)
+        print(f"VACUUM выполнен, auto_vacuum={mode}")
+    async with engine.connect() as conn:
+        version = await conn.run_sync(get_schema_version)
+        if engine.dialect.name != "sqlite":
+            print(f"Версия схемы: {version}")
+            return
+        report = await conn.run_sync(explain_hot_queries)
+
+    print(f"Версия схемы: {version}")
+    for name, (uses_index, plan) in report.items():
+        print(f"\n{'✅' if uses_index else '❌'} {name}")
+        for line in plan:
+            print(f"    {line}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,21 @@
+"""
+Пересчёт счётчиков покупок пользователей (total_spent, orders_count, last_purchase_at)
+и дневной сводки продаж sales_daily по истории покупок
+
+Использование:
+    python recompute.py
+"""
+import asyncio
+from bot.database import init_db, recompute_user_stats, rebuild_sales_daily
+
+
+async def main():
+    await init_db()
+    updated = await recompute_user_stats()
+    print(f"Пересчитано пользователей: {updated}")
+    days = await rebuild_sales_daily()
+    print(f"Строк в sales_daily: {days}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+"""
+Запуск бота в нескольких процессах
+
+Поднимает WORKERS воркеров (run.py с WORKER_INDEX) и входную точку вебхука:
+апдейты одного пользователя всегда попадают в один и тот же воркер.
+Нужен режим webhook (WEBHOOK_URL в .env).
+
+Использование:
+    python supervisor.py
+    python supervisor.py --workers 4
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from bot.config import config
+from bot.supervisor import supervise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бот в нескольких процессах")
+    parser.add_argument("--workers", type=int, default=config.WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+        stream=sys.stdout
+    )
+    if not config.BOT_TOKEN:
+        logging.error("BOT_TOKEN не указан в .env файле!")
+        return
+    if not config.WEBHOOK_URL:
+        logging.error("WEBHOOK_URL не указан: несколько воркеров работают только через вебхук")
+        return
+
+    asyncio.run(supervise(max(1, args.workers)))
+
+
+if __name__ == "__main__":
+    main()
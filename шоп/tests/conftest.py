@@ -0,0 +1,52 @@
+"""
+Общие фикстуры тестов
+
+Тесты работают со своей временной базой SQLite и без админов из .env: переменные
+окружения задаются до импорта bot.config, который читает их при импорте.
+"""
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+_workdir = tempfile.mkdtemp(prefix="shop_tests_")
+os.environ["DATABASE_PATH"] = os.path.join(_workdir, "test.db")
+os.environ["DATABASE_URL"] = ""
+os.environ["DATABASE_READ_URL"] = ""
+os.environ["DB_WRITE_QUEUE"] = "false"
+os.environ["METRICS_ENABLED"] = "false"
+os.environ["ADMIN_IDS"] = ""
+
+from sqlalchemy import text  # noqa: E402
+
+from bot.database import init_db, catalog_cache  # noqa: E402
+from bot.database.db import engine, read_engine  # noqa: E402
+from bot.database.models import Base  # noqa: E402
+
+
+@pytest.fixture
+def run():
+    """Выполнить корутину в новом цикле событий; пулы БД закрываются вместе с ним"""
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await engine.dispose()
+                await read_engine.dispose()
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def db(run):
+    """Пустая база с актуальной схемой"""
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.execute(text("DROP TABLE IF EXISTS schema_version"))
+        await init_db()
+
+    run(reset())
+    catalog_cache.invalidate()
@@ -0,0 +1,78 @@
+import json
+
+from sqlalchemy import event, select
+
+from bot.database import add_bot, add_session
+from bot.database.db import async_session, engine
+from bot.database.models import Bot
+from bot.services import bot_import_service
+
+CSV = """username,token,name,price,session_id
+good_one,1:good,Good,5,{session}
+@good_two,2:good,Good,"2,5",
+good_one,3:dup,Dup username,5,
+dup_token,1:good,Dup token,5,
+taken,4:taken,Taken,5,
+unknown_session,5:s,Unknown session,5,999
+text_price,6:p,Text,abc,
+zero_price,7:p,Zero,0,
+nan_price,8:p,NaN,nan,
+inf_price,9:p,Inf,inf,
+huge_price,10:p,Huge,1e400,
+"""
+
+
+def import_file(run, filename: str, content: str):
+    """Импорт с записью INSERT в bots; возвращает отчёт, эти INSERT и username в базе"""
+    inserts = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO bots"):
+            inserts.append(statement)
+
+    async def main():
+        session = await add_session("+70000000001", "import.session")
+        await add_bot("taken", "0:taken", "Taken", 1.0)
+        event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            report = await bot_import_service.import_file(
+                filename, content.replace("{session}", str(session.id)).encode()
+            )
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        async with async_session() as db_session:
+            usernames = set(await db_session.scalars(select(Bot.username)))
+        return report, inserts, usernames
+
+    return run(main())
+
+
+def check(report, inserts: list[str], usernames: set[str], line):
+    errors = dict(report.errors)
+    assert report.total == 11
+    assert report.added == 2
+    assert len(inserts) == 1
+    assert usernames == {"taken", "good_one", "good_two"}
+    assert "повторяется" in errors[line(3)] and "повторяется" in errors[line(4)]
+    assert "уже есть в базе" in errors[line(5)]
+    assert "не найдена" in errors[line(6)]
+    assert "числом" in errors[line(7)]
+    for row in (8, 9, 10, 11):
+        assert "больше нуля" in errors[line(row)]
+    assert len(errors) == 9
+
+
+def test_csv_import_reports_bad_rows(db, run):
+    # Номер строки CSV — с учётом заголовка
+    check(*import_file(run, "bots.csv", CSV), line=lambda row: row + 1)
+
+
+def test_json_import_reports_bad_rows(db, run):
+    lines = CSV.strip().splitlines()
+    header = lines[0].split(",")
+    items = []
+    for line in lines[1:]:
+        # Цена «2,5» в кавычках — единственное поле с запятой
+        line = line.replace('"2,5"', "2.5")
+        items.append(dict(zip(header, line.split(","))))
+    check(*import_file(run, "bots.json", json.dumps(items)), line=lambda row: row)
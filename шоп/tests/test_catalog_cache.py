@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+
+from bot.database import (
+    add_bot, archive_terminal, catalog_cache, checkout_with_balance, create_purchase, get_catalog_page,
+    get_or_create_user, unit_of_work
+)
+from bot.database.cache import CatalogCache
+from bot.database.db import engine
+from bot.database.models import Bot, Deposit, User
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("bot.database.cache.time.monotonic", clock)
+    cache = CatalogCache(ttl=2)
+    cache.set(cache.version, "counts", (1, 0))
+
+    clock.now += 1.9
+    assert cache.get("counts") == (1, 0)
+    clock.now += 0.2
+    assert cache.get("counts") is None
+
+
+def test_page_sees_other_process_write_after_ttl(db, run, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("bot.database.cache.time.monotonic", clock)
+    monkeypatch.setattr(catalog_cache, "ttl", 2)
+
+    async def main():
+        bot = await add_bot("cached_bot", "1:cached", "Cached", 5.0)
+        first, _ = await get_catalog_page(0)
+        # Продажа в другом процессе: версия кэша этого процесса не меняется
+        async with engine.begin() as conn:
+            await conn.execute(update(Bot).where(Bot.id == bot.id).values(is_sold=True))
+        stale, _ = await get_catalog_page(0)
+        clock.now += 3
+        fresh, _ = await get_catalog_page(0)
+        return [item.id for item in first], [item.id for item in stale], [item.id for item in fresh], bot.id
+
+    first, stale, fresh, bot_id = run(main())
+    assert first == stale == [bot_id]
+    assert fresh == []
+
+
+async def page_ids() -> list[int]:
+    return [item.id for item in (await get_catalog_page(0))[0]]
+
+
+def test_catalog_writes_bump_version_on_commit(db, run):
+    async def main():
+        await get_or_create_user(7, None, "Test")
+        async with engine.begin() as conn:
+            await conn.execute(update(User).where(User.id == 7).values(balance=100.0))
+        seen = []
+
+        async def step(write):
+            # Страница прогрета до записи; после коммита — новая версия и свежая выборка
+            await page_ids()
+            version = catalog_cache.version
+            result = await write()
+            seen.append((catalog_cache.version > version, await page_ids()))
+            return result
+
+        first = await step(lambda: add_bot("first_bot", "1:first", "First", 5.0))
+        second = await step(lambda: add_bot("second_bot", "2:second", "Second", 5.0))
+        await step(lambda: create_purchase(7, first.id, "invoice_1"))
+        await step(lambda: checkout_with_balance(7, second.id))
+        return first.id, second.id, seen
+
+    first_id, second_id, seen = run(main())
+    assert seen == [
+        (True, [first_id]),
+        (True, [second_id, first_id]),
+        (True, [second_id]),
+        (True, []),
+    ]
+
+
+def test_rollback_does_not_bump_version(db, run):
+    async def main():
+        await add_bot("kept_bot", "1:kept", "Kept", 5.0)
+        before = await page_ids()
+        version = catalog_cache.version
+        try:
+            async with unit_of_work() as session:
+                await add_bot("rolled_back", "2:rolled", "Rolled back", 5.0, session=session)
+                raise RuntimeError("handler failed")
+        except RuntimeError:
+            pass
+        return before, version, catalog_cache.version, await page_ids()
+
+    before, version_before, version_after, after = run(main())
+    assert version_after == version_before
+    assert after == before and len(after) == 1
+
+
+def test_archive_run_keeps_catalog_cached(db, run):
+    # Архив переносит только платежи и пополнения: каталог не меняется, кэш остаётся тёплым
+    async def main():
+        bot = await add_bot("catalog_bot", "1:catalog", "Catalog", 5.0)
+        await page_ids()
+        async with engine.begin() as conn:
+            await conn.execute(insert(Deposit), [{
+                "user_id": 7, "amount": 1.0, "method": "cryptobot", "status": "paid",
+                "created_at": datetime.utcnow() - timedelta(days=60),
+            }])
+        version = catalog_cache.version
+        moved = await archive_terminal(Deposit, datetime.utcnow() - timedelta(days=30))
+        return bot.id, moved, catalog_cache.version - version, await page_ids()
+
+    bot_id, moved, bumps, after = run(main())
+    assert moved == 1
+    assert bumps == 0
+    assert after == [bot_id]
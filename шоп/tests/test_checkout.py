@@ -0,0 +1,61 @@
+import asyncio
+
+from sqlalchemy import func, insert, select
+
+from bot.database import CheckoutStatus, add_bot, checkout_with_balance
+from bot.database.db import async_session, engine
+from bot.database.models import Bot, Purchase, User
+
+BUYERS = 300
+TAPS = 100
+
+
+async def add_users(count: int, balance: float):
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [
+            {"id": user_id, "full_name": f"User {user_id}", "balance": balance} for user_id in range(1, count + 1)
+        ])
+
+
+async def snapshot() -> tuple[int, int, dict[int, float]]:
+    """Покупок, проданных ботов и балансы пользователей"""
+    async with async_session() as session:
+        purchases = await session.scalar(select(func.count(Purchase.id)))
+        sold = await session.scalar(select(func.count(Bot.id)).where(Bot.is_sold == True))
+        balances = dict((await session.execute(select(User.id, User.balance))).all())
+    return purchases, sold, balances
+
+
+def test_concurrent_checkouts_sell_bot_once(db, run):
+    async def main():
+        await add_users(BUYERS, 10.0)
+        bot = await add_bot("hot_bot", "1:hot", "Hot", 7.5)
+        results = await asyncio.gather(*(
+            checkout_with_balance(user_id, bot.id) for user_id in range(1, BUYERS + 1)
+        ))
+        return results, await snapshot()
+
+    results, (purchases, sold, balances) = run(main())
+    statuses = [result.status for result in results]
+    assert statuses.count(CheckoutStatus.OK) == 1
+    assert statuses.count(CheckoutStatus.SOLD) == BUYERS - 1
+    assert purchases == sold == 1
+    winner = next(result.purchase.user_id for result in results if result.ok)
+    assert balances.pop(winner) == 2.5
+    assert set(balances.values()) == {10.0}
+
+
+def test_concurrent_taps_cannot_overdraw_balance(db, run):
+    async def main():
+        await add_users(1, 10.0)
+        bot_ids = [(await add_bot(f"tap_bot{i}", f"{i}:tap", "Tap", 7.5)).id for i in range(TAPS)]
+        results = await asyncio.gather(*(checkout_with_balance(1, bot_id) for bot_id in bot_ids))
+        return results, await snapshot()
+
+    results, (purchases, sold, balances) = run(main())
+    statuses = [result.status for result in results]
+    assert statuses.count(CheckoutStatus.OK) == 1
+    assert statuses.count(CheckoutStatus.INSUFFICIENT_FUNDS) == TAPS - 1
+    # Брони ботов, на которые не хватило денег, сняты
+    assert purchases == sold == 1
+    assert balances == {1: 2.5}
@@ -0,0 +1,45 @@
+import csv
+import os
+from datetime import datetime
+
+from sqlalchemy import insert
+
+import bot.services.export
+from bot.database import stream_table
+from bot.database.db import engine
+from bot.database.models import Deposit
+from bot.services import export_service
+
+ROWS = 25
+
+
+def test_export_streams_table_in_chunks(db, run, monkeypatch):
+    chunks = []
+
+    async def recording_stream(name: str, chunk_size: int = 1000):
+        async for rows in stream_table(name, chunk_size):
+            chunks.append(len(rows))
+            yield rows
+
+    monkeypatch.setattr(bot.services.export, "stream_table", recording_stream)
+
+    async def main():
+        async with engine.begin() as conn:
+            await conn.execute(insert(Deposit), [
+                {"user_id": i, "amount": float(i), "method": "cryptobot", "invoice_id": str(i),
+                 "status": "paid", "created_at": datetime(2024, 1, 1)}
+                for i in range(1, ROWS + 1)
+            ])
+        return await export_service.export_csv("deposits", chunk_size=10)
+
+    path, count = run(main())
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+    finally:
+        os.remove(path)
+
+    assert count == ROWS
+    assert chunks == [10, 10, 5]
+    assert rows[0] == [column.name for column in Deposit.__table__.columns]
+    assert [row[rows[0].index("invoice_id")] for row in rows[1:]] == [str(i) for i in range(1, ROWS + 1)]
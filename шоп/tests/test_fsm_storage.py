@@ -0,0 +1,36 @@
+from aiogram.fsm.storage.base import StorageKey
+
+from bot.fsm_storage import SQLStorage
+
+
+def key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=42, chat_id=user_id, user_id=user_id)
+
+
+def test_dirty_keys_survive_eviction_and_are_flushed(db, run):
+    async def main():
+        # Фоновая запись не успеет сработать — пишем только явным flush()/close()
+        storage = SQLStorage(cache_size=2, flush_interval=60)
+        for user_id in range(1, 6):
+            await storage.set_state(key(user_id), f"state_{user_id}")
+            await storage.set_data(key(user_id), {"step": user_id})
+        cached_dirty = len(storage._items)
+
+        await storage.flush()
+        # После записи ключи можно вытеснять
+        await storage.set_state(key(6), "state_6")
+        cached_after_flush = len(storage._items)
+        await storage.close()
+
+        fresh = SQLStorage()
+        saved = [
+            (await fresh.get_state(key(user_id)), await fresh.get_data(key(user_id)))
+            for user_id in range(1, 7)
+        ]
+        return cached_dirty, cached_after_flush, storage.flushes, saved
+
+    cached_dirty, cached_after_flush, flushes, saved = run(main())
+    assert cached_dirty == 5
+    assert cached_after_flush == 2
+    assert flushes == 2
+    assert saved == [(f"state_{user_id}", {"step": user_id}) for user_id in range(1, 6)] + [("state_6", {})]
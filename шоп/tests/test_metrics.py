@@ -0,0 +1,26 @@
+from bot.services.metrics import Metrics, OTHER
+
+
+def test_label_sets_are_capped():
+    metrics = Metrics(max_keys=2)
+
+    for prefix in ("a", "b", "c", "d"):
+        metrics.observe_handler("catalog", prefix, 1.0, error="ValueError")
+    keys = [metrics.handler_started(f"handler_{i}") for i in range(4)]
+    for i in range(4):
+        metrics.observe_api(f"method_{i}", 1.0, error="TelegramBadRequest")
+
+    assert set(metrics.handler_seconds) == {("catalog", "a"), ("catalog", "b"), ("catalog", OTHER)}
+    assert metrics.handler_errors == {
+        ("catalog", "a", "ValueError"): 1,
+        ("catalog", "b", "ValueError"): 1,
+        (OTHER, OTHER, OTHER): 2,
+    }
+    assert metrics.in_progress == {"handler_0": 1, "handler_1": 1, OTHER: 2}
+    assert len(metrics.api_errors) == 3 and metrics.api_errors[(OTHER, OTHER)] == 2
+
+    # Завершение уменьшает тот же ключ, в который попал старт
+    for key in keys:
+        metrics.handler_finished(key)
+    assert set(metrics.in_progress.values()) == {0}
+    assert "<прочие>" in metrics.render()
@@ -0,0 +1,70 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, insert
+
+from bot.database import get_user_bots, get_user_orders, get_user_purchases, get_user_total_orders
+from bot.database.db import engine
+from bot.database.models import Bot, Purchase, Session, User
+
+READS = {
+    "get_user_purchases": get_user_purchases,
+    "get_user_orders": get_user_orders,
+    "get_user_bots": get_user_bots,
+    "get_user_total_orders": get_user_total_orders,
+}
+
+
+@contextmanager
+def count_statements():
+    """Список SQL, выполненных движком внутри блока"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def add_purchases(user_id: int, count: int):
+    """Пользователь с count покупками; у каждого бота своя сессия Telegram"""
+    async with engine.begin() as conn:
+        await conn.execute(insert(User).values(id=user_id, full_name=f"User {user_id}"))
+        await conn.execute(insert(Session), [
+            {"id": user_id * 1000 + i, "phone": f"+{user_id}{i:05d}", "session_file": f"{user_id}_{i}.session"}
+            for i in range(count)
+        ])
+        await conn.execute(insert(Bot), [
+            {"id": user_id * 1000 + i, "username": f"bot{user_id}_{i}", "token": f"{user_id}_{i}:t",
+             "name": "Bot", "price": 5.0, "is_sold": True, "session_id": user_id * 1000 + i}
+            for i in range(count)
+        ])
+        await conn.execute(insert(Purchase), [
+            {"user_id": user_id, "bot_id": user_id * 1000 + i, "amount": 5.0, "currency": "USDT"}
+            for i in range(count)
+        ])
+
+
+@pytest.mark.parametrize("name", READS)
+def test_statement_count_does_not_depend_on_rows(db, run, name):
+    read = READS[name]
+
+    async def main():
+        await add_purchases(1, 2)
+        await add_purchases(2, 60)
+        counts = {}
+        for user_id in (1, 2):
+            with count_statements() as statements:
+                rows = await read(user_id)
+                # Связи загружены заранее: обращение к ним не ходит в БД
+                for item in rows if isinstance(rows, list) else []:
+                    _ = item.bot.username if isinstance(item, Purchase) else item.session.phone
+            counts[user_id] = len(statements)
+        return counts
+
+    counts = run(main())
+    assert counts[1] == counts[2] == 1
@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.exc import OperationalError
+
+from bot.database import create_purchase, stream_table
+from bot.database.db import engine, read_engine
+from bot.database.models import Bot, Purchase, User
+
+SEEDED = 20_000
+WRITES = 30
+
+
+async def seed():
+    """SEEDED старых покупок и WRITES непроданных ботов для новых"""
+    async with engine.begin() as conn:
+        await conn.execute(insert(User).values(id=1, full_name="Buyer"))
+        await conn.execute(insert(Bot), [
+            {"id": i, "username": f"bot{i}", "token": f"{i}:t", "name": "Bot", "price": 5.0, "is_sold": i <= SEEDED}
+            for i in range(1, SEEDED + WRITES + 1)
+        ])
+        await conn.execute(insert(Purchase), [
+            {"user_id": 1, "bot_id": i, "amount": 5.0, "currency": "USDT"} for i in range(1, SEEDED + 1)
+        ])
+
+
+def test_report_scan_does_not_block_purchases(db, run):
+    async def scan(started: asyncio.Event) -> tuple[int, float]:
+        """Выгрузка purchases медленными пачками — долгая транзакция чтения"""
+        rows = 0
+        async for chunk in stream_table("purchases", chunk_size=200):
+            started.set()
+            rows += len(chunk)
+            await asyncio.sleep(0.01)
+        return rows, time.perf_counter()
+
+    async def write(started: asyncio.Event) -> tuple[list[float], float]:
+        await started.wait()
+        latencies = []
+        for bot_id in range(SEEDED + 1, SEEDED + WRITES + 1):
+            t = time.perf_counter()
+            await create_purchase(1, bot_id, f"during_scan_{bot_id}")
+            latencies.append(time.perf_counter() - t)
+        return latencies, time.perf_counter()
+
+    async def main():
+        await seed()
+        started = asyncio.Event()
+        return await asyncio.gather(scan(started), write(started))
+
+    (rows, scan_finished), (latencies, writes_finished) = run(main())
+    # Все покупки записаны, пока отчёт ещё читал, и ни одна не ждала блокировку
+    assert writes_finished < scan_finished
+    assert max(latencies) < 0.5
+    # Отчёт читает согласованный снимок — без покупок, сделанных во время выгрузки
+    assert rows == SEEDED
+
+
+def test_read_engine_rejects_writes(db, run):
+    async def main():
+        async with read_engine.begin() as conn:
+            await conn.execute(text("INSERT INTO users (id, full_name, balance) VALUES (1, 'x', 0)"))
+
+    with pytest.raises(OperationalError):
+        run(main())
@@ -0,0 +1,90 @@
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Update
+
+from bot.handlers.routing import CallbackRouter
+from bot.keyboards.callbacks import (
+    AdminCb, AdminExportCb, AdminItemCb, AdminMenuCb, BotCb, CatalogCb, CatalogPageCb
+)
+
+ADMIN_ID = 1
+USER_ID = 7
+
+SAMPLES = [
+    "catalog", "catalog:2", "catalog:x",
+    "admin", "admin:stats", "admin:sessions", "admin:session:3", "admin:export:users",
+    "noop", "bot:5", "late_plain", "unknown:1",
+]
+
+
+def callback_update(update_id: int, user_id: int, data: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "1",
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "data": data,
+        },
+    })
+
+
+def build(router_class: type[Router]) -> tuple[Dispatcher, Router, Router]:
+    """Дерево как в bot.handlers: админка с фильтром роутера, пользовательская часть и вложенный Router"""
+    admin = router_class()
+    admin.callback_query.filter(F.from_user.id == ADMIN_ID)
+    admin.callback_query.register(lambda callback: "admin_menu", AdminMenuCb.filter())
+    admin.callback_query.register(lambda callback: "admin_stats", AdminCb.filter(F.action == "stats"))
+    admin.callback_query.register(lambda callback: "admin_item", AdminItemCb.filter())
+    admin.callback_query.register(lambda callback: "admin_export", AdminExportCb.filter())
+    admin.callback_query.register(lambda callback: "admin_any", AdminCb.filter())
+
+    user = router_class()
+    user.callback_query.register(lambda callback: "catalog_page", CatalogPageCb.filter())
+    user.callback_query.register(lambda callback: "catalog", CatalogCb.filter())
+    # Без CallbackData — проверяется для любого префикса
+    user.callback_query.register(lambda callback: "noop", F.data == "noop")
+    plain = Router()
+    user.include_router(plain)
+
+    root = router_class()
+    root.include_router(admin)
+    root.include_router(user)
+    dp = Dispatcher()
+    dp.include_router(root)
+    return dp, user, plain
+
+
+async def dispatch(dp: Dispatcher) -> dict[tuple[int, str], str | None]:
+    """Имя сработавшего хендлера для каждого нажатия от админа и от пользователя"""
+    bot = Bot("42:TEST")
+    results = {}
+    for i, data in enumerate(SAMPLES):
+        for user_id in (ADMIN_ID, USER_ID):
+            result = await dp.feed_update(bot, callback_update(i, user_id, data))
+            results[(user_id, data)] = None if result is UNHANDLED else result
+    await bot.session.close()
+    return results
+
+
+def test_callback_router_routes_like_plain_router(run):
+    rounds = {}
+    for router_class in (Router, CallbackRouter):
+        dp, user, plain = build(router_class)
+        before = run(dispatch(dp))
+        # Хендлеры, зарегистрированные после первых нажатий
+        user.callback_query.register(lambda callback: "bot", BotCb.filter())
+        plain.callback_query.register(lambda callback: "late_plain", F.data == "late_plain")
+        after = run(dispatch(dp))
+        rounds[router_class] = (before, after)
+
+    assert rounds[CallbackRouter] == rounds[Router]
+    before, after = rounds[CallbackRouter]
+    assert before[(ADMIN_ID, "catalog:2")] == "catalog_page"
+    assert before[(USER_ID, "catalog")] == "catalog"
+    assert before[(ADMIN_ID, "admin:stats")] == "admin_stats"
+    assert before[(ADMIN_ID, "admin:sessions")] == "admin_any"
+    assert before[(USER_ID, "admin:stats")] is None
+    assert before[(USER_ID, "noop")] == "noop"
+    assert before[(USER_ID, "bot:5")] is None and after[(USER_ID, "bot:5")] == "bot"
+    assert after[(USER_ID, "late_plain")] == "late_plain"
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from bot.config import config
+from bot.database import expire_pending
+from bot.database.db import async_session, engine
+from bot.database.models import Deposit
+from bot.services import cryptobot_service, expiry_sweeper
+
+STALE = timedelta(hours=3)
+
+
+def test_sweep_expires_only_stale_pending_rows(db, run, monkeypatch):
+    now = datetime.utcnow()
+    rows = {
+        # invoice_id: (method, status, возраст)
+        "1": ("cryptobot", "pending", STALE),  # просрочен и не оплачен — expired
+        "2": ("cryptobot", "pending", STALE),  # просрочен, но оплачен в CryptoBot — остаётся pending
+        "3": ("cryptobot", "pending", timedelta(minutes=5)),  # счёт ещё действует
+        "4": ("cryptobot", "paid", STALE),
+        "5": ("cryptobot", "failed", STALE),
+        "6": ("lolz", "pending", STALE),  # не счёт CryptoBot
+    }
+    deleted = []
+
+    async def get_invoices(invoice_ids=None, count=None, **kwargs):
+        statuses = {1: "active", 2: "paid"}
+        return {"items": [{"invoice_id": i, "status": statuses[i]} for i in invoice_ids if i in statuses]}
+
+    async def delete_invoice(invoice_id: int) -> bool:
+        deleted.append(invoice_id)
+        return True
+
+    monkeypatch.setattr(config, "CRYPTOBOT_TOKEN", "test")
+    monkeypatch.setattr(cryptobot_service, "get_invoices", get_invoices)
+    monkeypatch.setattr(cryptobot_service, "delete_invoice", delete_invoice)
+
+    async def main():
+        async with engine.begin() as conn:
+            await conn.execute(insert(Deposit), [
+                {"user_id": 7, "amount": 1.0, "method": method, "invoice_id": invoice_id,
+                 "status": status, "created_at": now - age}
+                for invoice_id, (method, status, age) in rows.items()
+            ])
+        report = await expiry_sweeper.run_once()
+        async with async_session() as session:
+            statuses = dict((await session.execute(select(Deposit.invoice_id, Deposit.status))).all())
+        return report, statuses
+
+    report, statuses = run(main())
+    assert statuses == {"1": "expired", "2": "pending", "3": "pending", "4": "paid", "5": "failed", "6": "pending"}
+    assert (report.expired, report.paid_pending, report.archived) == (1, 1, 0)
+    assert deleted == [1]
+
+
+def test_expire_pending_skips_rows_changed_meanwhile(db, run):
+    async def main():
+        async with engine.begin() as conn:
+            await conn.execute(insert(Deposit), [
+                {"user_id": 7, "amount": 1.0, "method": "cryptobot", "invoice_id": str(i),
+                 "status": status, "created_at": datetime.utcnow() - STALE}
+                for i, status in enumerate(["pending", "paid"], start=1)
+            ])
+        async with async_session() as session:
+            ids = list(await session.scalars(select(Deposit.id).order_by(Deposit.id)))
+        # Второй оплачен между выборкой и пометкой
+        expired = await expire_pending(Deposit, ids)
+        async with async_session() as session:
+            return expired, list(await session.scalars(select(Deposit.status).order_by(Deposit.id)))
+
+    assert run(main()) == (1, ["expired", "paid"])
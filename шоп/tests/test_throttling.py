@@ -0,0 +1,95 @@
+from aiogram import Bot, Dispatcher, Router
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import CallbackQuery, Message, Update
+
+from bot.middlewares import ThrottlingMiddleware
+
+ADMIN_ID = 1
+USER_ID = 7
+
+
+def message_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": "/start",
+        },
+    }
+
+
+def callback_update(update_id: int, user_id: int, data: str) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "1",
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "data": data,
+            "message": message_update(update_id, user_id)["message"],
+        },
+    }
+
+
+def feed(run, updates: list[dict]) -> tuple[list[str], list[str]]:
+    """
+    Прогнать апдейты через антифлуд: 3 апдейта в минуту, check_payment — 1 в минуту.
+    Вернуть вызовы хендлеров и тексты ответов на нажатия.
+    """
+    handled, answers = [], []
+    router = Router()
+
+    @router.message()
+    async def on_message(message: Message):
+        handled.append(f"{message.from_user.id}:message")
+
+    @router.callback_query()
+    async def on_callback(callback: CallbackQuery):
+        handled.append(f"{callback.from_user.id}:{callback.data}")
+
+    async def fake_api(make_request, bot, method):
+        if isinstance(method, AnswerCallbackQuery):
+            answers.append(method.text)
+        return True
+
+    throttling = ThrottlingMiddleware((3, 60), {"check_payment": (1, 60)}, exempt=[ADMIN_ID])
+    dp = Dispatcher()
+    dp.message.outer_middleware(throttling)
+    dp.callback_query.outer_middleware(throttling)
+    dp.include_router(router)
+    bot = Bot("42:TEST")
+    bot.session.middleware(fake_api)
+
+    async def main():
+        for update in updates:
+            await dp.feed_update(bot, Update.model_validate(update))
+
+    run(main())
+    return handled, answers
+
+
+def test_admins_are_not_throttled(run):
+    updates = [message_update(i, ADMIN_ID) for i in range(10)]
+    updates += [callback_update(10 + i, ADMIN_ID, "check_payment:1") for i in range(5)]
+    handled, answers = feed(run, updates)
+    assert len(handled) == 15
+    assert answers == []
+
+
+def test_over_limit_updates_are_dropped_and_callbacks_answered(run):
+    updates = [
+        callback_update(1, USER_ID, "check_payment:1"),
+        callback_update(2, USER_ID, "check_payment:1"),  # лимит префикса
+        message_update(3, USER_ID),
+        message_update(4, USER_ID),
+        message_update(5, USER_ID),  # общий лимит
+        callback_update(6, USER_ID, "catalog:0"),  # общий лимит
+        message_update(7, 8),  # у другого пользователя свой лимит
+    ]
+    handled, answers = feed(run, updates)
+    assert handled == [f"{USER_ID}:check_payment:1", f"{USER_ID}:message", f"{USER_ID}:message", "8:message"]
+    assert len(answers) == 2
+    assert all(answer.startswith("⏳ Слишком часто") for answer in answers)
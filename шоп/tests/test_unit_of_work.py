@@ -0,0 +1,114 @@
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import CallbackQuery, Message, Update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database import (
+    add_balance, add_bot, get_or_create_user, get_payment_by_invoice, get_user_balance, unit_of_work
+)
+from bot.database.db import engine
+from bot.handlers.user.catalog import callback_pay_crypto
+from bot.keyboards.callbacks import PayCryptoCb
+from bot.middlewares import DbCommitMiddleware, DbSessionMiddleware
+from bot.services import cryptobot_service
+
+
+def message_update(text: str) -> Update:
+    return Update.model_validate({
+        "update_id": 1,
+        "message": {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": 7, "type": "private"},
+            "from": {"id": 7, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    })
+
+
+def create_bot(seen: list[float]) -> Bot:
+    """Бот, который вместо запроса в Telegram записывает баланс, видимый другим соединениям"""
+    async def fake_api(make_request, bot, method):
+        seen.append(await get_user_balance(7))
+        return True
+
+    bot = Bot("42:TEST")
+    bot.session.middleware(DbCommitMiddleware())
+    bot.session.middleware(fake_api)
+    return bot
+
+
+def create_dispatcher(commit_before_api: bool) -> Dispatcher:
+    router = Router()
+
+    @router.message(flags={"commit_before_api": commit_before_api})
+    async def on_message(message: Message, db_session: AsyncSession):
+        await add_balance(7, 10.0, session=db_session)
+        await message.answer("начислено")
+        await add_balance(7, 5.0, session=db_session)
+        if message.text == "fail":
+            raise RuntimeError("handler failed")
+
+    dp = Dispatcher()
+    dp.message.middleware(DbSessionMiddleware())
+    dp.include_router(router)
+    return dp
+
+
+def feed(run, text: str, commit_before_api: bool) -> tuple[float, list[float]]:
+    """Прогнать сообщение через хендлер; вернуть итоговый баланс и балансы, видимые при запросах к Bot API"""
+    seen = []
+
+    async def main():
+        await get_or_create_user(7, None, "Test")
+        try:
+            await create_dispatcher(commit_before_api).feed_update(create_bot(seen), message_update(text))
+        except RuntimeError:
+            pass
+        return await get_user_balance(7)
+
+    return run(main()), seen
+
+
+def test_update_is_atomic_by_default(db, run):
+    # Без флага запрос к Bot API не коммитит, ошибка откатывает все записи апдейта
+    assert feed(run, "ok", commit_before_api=False) == (15.0, [0.0])
+
+
+def test_rollback_undoes_whole_update_by_default(db, run):
+    assert feed(run, "fail", commit_before_api=False) == (0.0, [0.0])
+
+
+def test_flagged_handler_commits_before_bot_api_call(db, run):
+    assert feed(run, "ok", commit_before_api=True) == (15.0, [10.0])
+
+
+def test_flagged_handler_rollback_keeps_writes_made_before_bot_api_call(db, run):
+    assert feed(run, "fail", commit_before_api=True) == (10.0, [10.0])
+
+
+def test_pay_crypto_releases_connection_during_invoice_call(db, run, monkeypatch):
+    checked_out = []
+
+    async def create_invoice(**kwargs):
+        checked_out.append(engine.pool.checkedout())
+        return {"invoice_id": 555, "pay_url": "https://t.me/CryptoBot?start=555"}
+
+    monkeypatch.setattr(cryptobot_service, "create_invoice", create_invoice)
+
+    async def main():
+        await get_or_create_user(7, None, "Test")
+        bot_id = (await add_bot("crypto_bot", "1:crypto", "Crypto", 5.0)).id
+        callback = CallbackQuery.model_validate({
+            "id": "1",
+            "chat_instance": "1",
+            "from": {"id": 7, "is_bot": False, "first_name": "Test"},
+            "data": PayCryptoCb(bot_id=bot_id).pack(),
+            "message": message_update("").message.model_dump(by_alias=True),
+        }).as_(create_bot([]))
+        async with unit_of_work() as session:
+            await callback_pay_crypto(callback, PayCryptoCb(bot_id=bot_id), session)
+        return await get_payment_by_invoice("555")
+
+    payment = run(main())
+    assert checked_out == [0]
+    assert payment is not None and payment.amount == 5.0
@@ -0,0 +1,168 @@
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from bot.config import config
+from bot.database import get_user
+from bot.keyboards.callbacks import ProfileCb
+from bot.main import create_dispatcher
+from bot.middlewares import DbCommitMiddleware
+from bot.webhook import SECRET_HEADER, FrontDoor, create_webhook_app, route_key
+
+SECRET = "test_secret"
+
+
+def message_update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+def callback_update(update_id: int, user_id: int, data: str) -> dict:
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "chat_instance": "1",
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "data": data,
+            "message": message_update(update_id, user_id, "menu")["message"],
+        },
+    }
+
+
+def recording_bot(calls: list[str]) -> Bot:
+    """Бот как в create_bot(), но запросы к Bot API только записываются"""
+    async def fake_api(make_request, bot, method):
+        calls.append(method.__api_method__)
+        return True
+
+    bot = Bot("42:TEST")
+    bot.session.middleware(DbCommitMiddleware())
+    bot.session.middleware(fake_api)
+    return bot
+
+
+def failing_dispatcher(handled: list[str]) -> Dispatcher:
+    """Диспетчер, хендлер которого падает на тексте «fail»"""
+    router = Router()
+
+    @router.message()
+    async def on_message(message: Message):
+        handled.append(message.text)
+        if message.text == "fail":
+            raise RuntimeError("handler failed")
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+def test_worker_acknowledges_failed_update(run, caplog):
+    handled = []
+    app = create_webhook_app(failing_dispatcher(handled), Bot("42:TEST"), SECRET, handle_in_background=False)
+
+    async def main():
+        async with TestClient(TestServer(app)) as client:
+            response = await client.post(
+                config.WEBHOOK_PATH, json=message_update(1, 7, "fail"), headers={SECRET_HEADER: SECRET}
+            )
+            return response.status
+
+    assert run(main()) == 200
+    assert handled == ["fail"]
+    assert "Ошибка обработки апдейта" in caplog.text
+
+
+def test_front_door_retries_only_unreachable_worker(run):
+    handled = []
+    worker_app = create_webhook_app(failing_dispatcher(handled), Bot("42:TEST"), "worker", handle_in_background=False)
+
+    async def broken_worker(request: web.Request) -> web.Response:
+        return web.Response(status=500)
+
+    broken_app = web.Application()
+    broken_app.router.add_post(config.WEBHOOK_PATH, broken_worker)
+    door = FrontDoor(workers=1, secret_token=SECRET, worker_secret="worker")
+
+    async def post(url: str, update: dict) -> int:
+        door.urls = [url]
+        async with TestClient(TestServer(door.create_app())) as client:
+            response = await client.post(config.WEBHOOK_PATH, json=update, headers={SECRET_HEADER: SECRET})
+            return response.status
+
+    async def main():
+        statuses = {}
+        async with TestClient(TestServer(worker_app)) as worker, TestClient(TestServer(broken_app)) as broken:
+            statuses["failed"] = await post(str(worker.make_url(config.WEBHOOK_PATH)), message_update(1, 7, "fail"))
+            statuses["ok"] = await post(str(worker.make_url(config.WEBHOOK_PATH)), message_update(2, 7, "ok"))
+            statuses["error"] = await post(str(broken.make_url(config.WEBHOOK_PATH)), message_update(3, 7, "ok"))
+            url = str(broken.make_url(config.WEBHOOK_PATH))
+        statuses["unreachable"] = await post(url, message_update(4, 7, "ok"))
+        return statuses
+
+    assert run(main()) == {"failed": 200, "ok": 200, "error": 200, "unreachable": 503}
+    assert handled == ["fail", "ok"]
+
+
+def test_route_key_is_stable_per_user():
+    user_id = 123456789
+    callback = callback_update(2, user_id, ProfileCb().pack())
+    # Сообщение под кнопкой отправил бот — маршрут всё равно по нажавшему
+    callback["callback_query"]["message"]["from"] = {"id": 42, "is_bot": True, "first_name": "Shop"}
+    edited = message_update(3, user_id, "edited")
+    edited["edited_message"] = edited.pop("message")
+    updates = [
+        message_update(1, user_id, "/start"),
+        callback,
+        edited,
+        {"update_id": 4, "pre_checkout_query": {
+            "id": "1", "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "currency": "XTR", "total_amount": 1, "invoice_payload": "1",
+        }},
+        {"update_id": 5, "my_chat_member": {
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+        }},
+    ]
+    assert {route_key(update) for update in updates} == {user_id}
+
+    door = FrontDoor(workers=4, secret_token=SECRET, worker_secret="worker")
+    assert {door.worker_for(update) for update in updates} == {user_id % 4}
+    assert door.worker_for(message_update(6, user_id + 1, "/start")) == (user_id + 1) % 4
+
+
+def test_webhook_app_handles_synthetic_updates(db, run):
+    calls = []
+    dp = create_dispatcher()
+    lifecycle = []
+    dp.startup.register(lambda: lifecycle.append("startup"))
+    dp.shutdown.register(lambda: lifecycle.append("shutdown"))
+    app = create_webhook_app(dp, recording_bot(calls), SECRET)
+
+    async def main():
+        statuses = []
+        async with TestClient(TestServer(app)) as client:
+            for update, secret in (
+                (message_update(1, 7, "/start"), "wrong"),
+                (message_update(2, 7, "/start"), SECRET),
+                (callback_update(3, 7, ProfileCb().pack()), SECRET),
+            ):
+                response = await client.post(config.WEBHOOK_PATH, json=update, headers={SECRET_HEADER: secret})
+                statuses.append(response.status)
+        # Сервер остановлен только после того, как апдейты из фона обработаны
+        return statuses, await get_user(7)
+
+    statuses, user = run(main())
+    assert statuses == [401, 200, 200]
+    assert user is not None and user.full_name == "Test"
+    assert calls == ["sendMessage", "editMessageText", "answerCallbackQuery"]
+    assert lifecycle == ["startup", "shutdown"]